@@ -7,6 +7,24 @@ __author__ = 'Kemele M. Endris'
 
 import abc
 
+_fields = {}
+
+
+def node_fields(node):
+    """
+    The (name, value) pairs of the attributes of an AST node, kept in __slots__ or in __dict__
+    """
+    cls = type(node)
+    names = _fields.get(cls)
+    if names is None:
+        names = _fields[cls] = tuple(name for c in reversed(cls.__mro__) for name in c.__dict__.get('__slots__', ()))
+
+    fields = [(name, getattr(node, name)) for name in names if hasattr(node, name)]
+    if hasattr(node, '__dict__'):
+        fields.extend(vars(node).items())
+
+    return fields
+
 
 #########################################################
 ###############    SPARQL Query Abstract  #################
@@ -67,20 +85,7 @@ class Query:
         return sm
 
     def values_str(self):
-        if len(self.values_clause.variables) == 0 and len(self.values_clause.values) == 0:
-            return ''
-
-        vc = "VALUES "
-        if len(self.values_clause.variables) > 0:
-            vc += '(' + ' '.join([str(v) for v in self.values_clause.variables]) + ') '
-        else:
-            vc += '()'
-        if len(self.values_clause.values) > 0:
-            vc += "{(" + ") (".join([" ".join([str(v) for v in d]) for d in self.values_clause.values]) + ")}"
-        else:
-            vc += '{}'
-
-        return vc
+        return self.values_clause.to_str()
 
     def prefixes_str(self):
         prf = ''
@@ -226,6 +231,8 @@ class DescribeQuery(Query):
 ###############    GroupGraphPattern     #################
 #########################################################
 class GGP:
+    __slots__ = ('ggps',)
+
     def __init__(self, ggps):
         self.ggps = ggps
 
@@ -255,12 +262,57 @@ class GGP:
 ###############    Values Clause/InlineData     #################
 #########################################################
 class ValuesClause:
+    """
+    VALUES variables and data block. The rows are kept in a columnar ValuesTable
+    (awudima.sparql.values): values reads as a list of rows of RDFTerm (or 'UNDEF'), slices
+    of it are tables too, and rows can be appended and split in batches without building
+    the RDFTerm objects. The rows read are read-only: a block is changed through append()
+    or by setting values. The variables are those of the table (setting either sets both).
+    """
+    __slots__ = ('table',)
+
     def __init__(self, variables, values):
+        from awudima.sparql.values import ValuesTable
+
+        if not isinstance(values, ValuesTable):
+            values = ValuesTable.from_rows(variables, values)
+        self.table = values
         self.variables = variables
-        self.values = values
+
+    @property
+    def variables(self):
+        return self.table.variables
+
+    @variables.setter
+    def variables(self, variables):
+        self.table.set_variables(variables)
+
+    @property
+    def values(self):
+        return self.table
+
+    @values.setter
+    def values(self, values):
+        from awudima.sparql.values import ValuesTable
+
+        if not isinstance(values, ValuesTable):
+            values = ValuesTable.from_rows(self.variables, values)
+        self.table = values
+
+    def append(self, row):
+        """
+        Adds a row: one RDFTerm, 'UNDEF' or None (UNDEF) per variable
+        """
+        self.table.append(row)
+
+    def batches(self, size):
+        """
+        ValuesClauses of (at most) size consecutive rows each, sharing the term dictionary of this one
+        """
+        return [ValuesClause(self.variables, table) for table in self.table.batches(size)]
 
     def to_str(self):
-        if len(self.variables) == 0 and len(self.values) == 0:
+        if len(self.variables) == 0 and len(self.table) == 0:
             return ''
 
         vc = "VALUES "
@@ -268,8 +320,8 @@ class ValuesClause:
             vc += '(' + ' '.join([str(v) for v in self.variables]) + ') '
         else:
             vc += '()'
-        if len(self.values) > 0:
-            vc += "{(" + ") (".join([" ".join([str(v) for v in d]) for d in self.values]) + ")}"
+        if len(self.table) > 0:
+            vc += "{" + " ".join(self.table.rows_str()) + "}"
         else:
             vc += '{}'
 
@@ -285,14 +337,15 @@ class ValuesClause:
         return self.variables
 
     def expand_syntax_forms(self, prefixes):
-        for g in self.values:
-            g.expand_syntax_forms(prefixes)
+        self.table.dictionary.expand_syntax_forms(prefixes)
 
 
 #########################################################
 ###############       GRAPH            #################
 #########################################################
 class GraphGP:
+    __slots__ = ('var_or_iri', 'ggps')
+
     def __init__(self, var_or_iri, ggp):
         self.var_or_iri = var_or_iri
         self.ggps = ggp.ggps
@@ -324,6 +377,8 @@ class GraphGP:
 ###############       SERVICE         #################
 #########################################################
 class ServiceGP:
+    __slots__ = ('var_or_iri', 'ggps', 'silent')
+
     def __init__(self, var_or_iri, ggp, silent=False):
         self.var_or_iri = var_or_iri
         self.ggps = ggp.ggps
@@ -357,6 +412,8 @@ class ServiceGP:
 ###############       OPTIONAL              #################
 #########################################################
 class OptionalGP:
+    __slots__ = ('ggps',)
+
     def __init__(self, ggp):
         self.ggps = ggp.ggps
 
@@ -386,6 +443,8 @@ class OptionalGP:
 ###############       UNION              #################
 #########################################################
 class UnionGP:
+    __slots__ = ('ggps',)
+
     def __init__(self, ggps):
         self.ggps = ggps
 
@@ -415,6 +474,8 @@ class UnionGP:
 ###############       MINUS              #################
 #########################################################
 class MinusGP:
+    __slots__ = ('ggps',)
+
     def __init__(self, ggp):
         self.ggps = ggp.ggps
 
@@ -444,6 +505,8 @@ class MinusGP:
 ###############       BGP              #################
 #########################################################
 class BGP:
+    __slots__ = ('triples', 'filters')
+
     def __init__(self, triples=list(), filters=list()):
         self.triples = triples
         if filters is None:
@@ -484,6 +547,8 @@ class Bind:
     """
     Bind	  ::=  	'BIND' '(' Expression 'AS' Var ')'
     """
+    __slots__ = ('expression', 'as_var')
+
     def __init__(self, expression, var):
         self.expression = expression
         self.as_var = var
@@ -513,6 +578,8 @@ class Filter:
     Constraint	  ::=  	BrackettedExpression | BuiltInCall | FunctionCall
     FunctionCall	  ::=  	iri ArgList
     """
+    __slots__ = ('expression',)
+
     def __init__(self, expression):
         self.expression = expression
 
@@ -542,6 +609,8 @@ class TriplePattern:
     PropertyListNotEmpty ::=  	Verb ObjectList ( ';' ( Verb ObjectList )? )*
     """
 
+    __slots__ = ('subject', 'property', 'object')
+
     def __init__(self, subject, property, object_o):
         self.subject = subject
         self.property = property
@@ -584,6 +653,8 @@ class PropertyPath:
         PathAlternative	  ::=  	PathSequence ( '|' PathSequence )*
         PathSequence	  ::=  	PathEltOrInverse ( '/' PathEltOrInverse )*
     """
+    __slots__ = ('left_path', 'oper', 'right_path')
+
     def __init__(self, left_path, oper=None, right_path=None):
         self.left_path = left_path
         self.oper = oper  # |, /
@@ -618,6 +689,8 @@ class PropertyPath:
 ###############       PathTerm           ################
 #########################################################
 class PathTerm:
+    __slots__ = ('inverse', 'path_term', 'path_mode')
+
     def __init__(self, path_term, inverse=False, path_mode=None):
         self.inverse = inverse  # ^ = True, else False
         self.path_term = path_term  # RDFTerm, PathTerm, PropertyPath
@@ -653,6 +726,9 @@ class RDFTerm:
     VarOrTerm	  ::=  	Var | GraphTerm
     GraphTerm	::=  	iri | RDFLiteral | NumericLiteral | BooleanLiteral | BlankNode | NIL
     """
+    __slots__ = ('value', 'is_constant', 'is_iri', 'is_nil', 'prefix', 'is_bnode', 'lang_tag', 'xsd_datatype',
+                 'is_typed_literal', '_is_expanded')
+
     def __init__(self, value, is_const,
                  is_iri=False, is_bnode=False, is_nil=False,
                  prefix=None, lang_tag=None, xsd_datatype=None):
@@ -685,6 +761,8 @@ class RDFTerm:
                 res += "^^" + self.xsd_datatype
             if self.lang_tag is not None:
                 res += "@" + self.lang_tag
+        elif self.lang_tag is not None:
+            res += "@" + self.lang_tag
 
         return res
 
@@ -695,11 +773,15 @@ class RDFTerm:
         return self.to_str()
 
     def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, RDFTerm):
+            return NotImplemented
 
         return self.value == other.value \
                and self.is_constant == other.is_constant \
-               and self.lang_tag == self.lang_tag \
-               and self.xsd_datatype == self.xsd_datatype
+               and self.lang_tag == other.lang_tag \
+               and self.xsd_datatype == other.xsd_datatype
 
     def __ne__(self, other):
         return not self == other
@@ -733,6 +815,52 @@ class RDFTerm:
 
         self._is_expanded = True
 
+
+class SharedRDFTerm(RDFTerm):
+    """
+    The RDFTerm of every occurrence of the same term in a query parsed with
+    SparqlParser(intern_terms=True). It cannot be changed in place, as every occurrence would
+    change: another RDFTerm is to be put in the place of an occurrence instead (e.g., by a
+    NodeTransformer, awudima.sparql.visitor). expand_syntax_forms() still expands it, the
+    same way for every occurrence.
+    """
+    __slots__ = ()
+
+    def __init__(self, value, is_const,
+                 is_iri=False, is_bnode=False, is_nil=False,
+                 prefix=None, lang_tag=None, xsd_datatype=None):
+        self._set(RDFTerm(value, is_const, is_iri, is_bnode, is_nil, prefix, lang_tag, xsd_datatype))
+
+    def _set(self, term):
+        for name in RDFTerm.__slots__:
+            object.__setattr__(self, name, getattr(term, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is shared by all the occurrences of the term (intern_terms): put another RDFTerm '
+                             'in its place' % self.to_str())
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return _shared_term, (tuple(getattr(self, name) for name in RDFTerm.__slots__),)
+
+    def expand_syntax_forms(self, prefixes):
+        if self._is_expanded:
+            return
+
+        term = RDFTerm.__new__(RDFTerm)
+        for name in RDFTerm.__slots__:
+            setattr(term, name, getattr(self, name))
+        term.expand_syntax_forms(prefixes)
+        self._set(term)
+
+
+def _shared_term(values):
+    term = SharedRDFTerm.__new__(SharedRDFTerm)
+    for name, value in zip(RDFTerm.__slots__, values):
+        object.__setattr__(term, name, value)
+    return term
+
 #########################################################
 ###############       Expression      #################
 #########################################################
@@ -821,6 +949,8 @@ class Expression:
                             | 'GROUP_CONCAT' '(' 'DISTINCT'? Expression ( ';' 'SEPARATOR' '=' String )? ')'
  	iriOrFunction	  ::=  	iri ArgList?
     """
+    __slots__ = ('left_expr', 'oper', 'right_expr', 'ternary_expr', 'quaternary_expr')
+
     def __init__(self, left_expr, oper, right_expr=None, ternary_expr=None, quaternary_expr=None):
         self.left_expr = left_expr  # RDFTerm, Expression
         self.oper = oper.strip()
@@ -0,0 +1,665 @@
+# -*- coding: utf-8 -*-
+"""
+Binary encoding of query trees, to ship parsed queries (or parts of them) between
+processes without printing and parsing them again and without pickle:
+
+    data = dumps(query)         bytes
+    query = loads(data)         the same tree: same classes, same attribute values, and the
+                                nodes and lists shared in the tree (interned RDFTerms, the
+                                lists of solution_modifiers, ...) shared again
+
+The encoding is a table of values and the code that builds the tree from them. The values
+are None, True and False, the strings of the tree (joined with NUL characters, or given by
+their lengths if one of them has a NUL character), its RDFTerms (each term once, as a
+record of string ids and flags), its ints, and then every list, dict and node in the order
+the code builds them. A code instruction is a word with an opcode and a count, followed
+by the ids of the values it is built from (a node: one per slot): children come before
+their parents, so neither dumps nor loads recurses and any depth of nesting is encoded.
+Lists of triple patterns of terms become a single instruction, and the term id columns of
+VALUES tables are copied as they are.
+
+Frozen nodes (awudima.sparql.frozen) are written as the mutable node classes, as thaw()
+would give them back; values other than nodes, lists, tuples, dicts, strings, ints, bools
+and None cannot be encoded (TypeError). The encoding is the same on every platform.
+"""
+
+__author__ = 'Kemele M. Endris'
+
+import struct
+import sys
+from array import array
+from itertools import accumulate
+from operator import attrgetter
+
+from awudima.sparql import SelectQuery, ConstructQuery, AskQuery, DescribeQuery, GGP, ValuesClause, GraphGP, \
+    ServiceGP, OptionalGP, UnionGP, MinusGP, BGP, Bind, Filter, TriplePattern, PropertyPath, PathTerm, RDFTerm, \
+    Expression
+from awudima.sparql.values import ValuesTable, TermDictionary
+
+MAGIC = b'AWQB'
+VERSION = 2
+
+# magic, version, root value id, and the sizes of the sections: strings, string lengths, bytes
+# of the strings, words of the terms, ints, words of the code, words of the arrays
+_HEADER = struct.Struct('<4sBIIIIIIII')
+_SWAP = sys.byteorder != 'little'
+
+# Opcodes, in the low 4 bits of an instruction word; the count is the rest of the word
+_NODE = 0           # a _CLASSES[count] node, from the ids of its slot values
+_LIST = 1           # a list, from the ids of its count items
+_TRIPLES = 2        # a list of count triple patterns, from the ids of their subject, property and object
+_TUPLE = 3          # a tuple, from the ids of its count items
+_DICT = 4           # a dict, from the ids of its count keys and values, alternated
+_OBJECT = 5         # a _CLASSES[count] node (a query), from the id of the dict of its attributes
+_ARRAY = 6          # an array('i'), the next count words of the array section
+_DICTIONARY = 7     # a TermDictionary, from the ids of its texts, kinds and (term id, term) pairs
+_PARTIAL = 8        # a _NODE with slots that are not set (the id of _UNSET)
+
+# Returned by getattr for the slots of a node that are not set
+_UNSET = object()
+# The first values, their ids are fixed
+_CONSTANTS = (None, True, False, _UNSET)
+_NONE, _TRUE, _FALSE, _UNSET_ID = range(4)
+
+# Classes of the nodes, by id: the ids are part of the encoding (append only)
+_CLASSES = (SelectQuery, ConstructQuery, AskQuery, DescribeQuery, GGP, ValuesClause, GraphGP, ServiceGP,
+            OptionalGP, UnionGP, MinusGP, BGP, Bind, Filter, TriplePattern, PropertyPath, PathTerm, Expression,
+            ValuesTable)
+_CLASS_IDS = dict((cls, i) for i, cls in enumerate(_CLASSES))
+# id -> (class, names of its slots), None for the classes whose attributes are in __dict__
+_FIELDS = [(cls, cls.__dict__.get('__slots__')) for cls in _CLASSES]
+# id -> function giving the values of the slots of a node, as a tuple
+_GETTERS = [None if fields is None else attrgetter(*fields) if len(fields) > 1 else
+            (lambda get: lambda node: (get(node),))(attrgetter(fields[0])) for cls, fields in _FIELDS]
+
+# Flags of a term record
+_CONSTANT = 1
+_IRI = 2
+_NIL = 4
+_BNODE = 8
+_TYPED = 16
+_EXPANDED = 32
+_PREFIX_IRI = 64    # the prefix is a {name: iri} dict (an expanded prefixed name)
+# flags -> (is_constant, is_iri, is_nil, is_bnode, is_typed_literal, _is_expanded)
+_FLAG_VALUES = tuple(tuple(bool(flags & flag) for flag in (_CONSTANT, _IRI, _NIL, _BNODE, _TYPED, _EXPANDED))
+                     for flags in range(64))
+# Words of a term record: value, flags, prefix, prefix iri, lang tag, datatype (value ids of
+# strings, or of None)
+_TERM_SIZE = 6
+
+# Until dumps() has all the values, the ids of strings, terms, ints and built values are
+# written as ~(index << 2 | kind), and replaced by their final ids at the end
+_STRING, _TERM, _INT, _BUILT = range(4)
+_MAX_COUNT = 1 << 27
+
+# type -> class id (or None, not a node class), along the class hierarchy
+_class_ids = {}
+
+
+def _class_id(kind):
+    cid = _class_ids.get(kind, _UNSET)
+    if cid is _UNSET:
+        cid = None
+        for base in kind.__mro__:
+            if base in _CLASS_IDS:
+                cid = _CLASS_IDS[base]
+                break
+        _class_ids[kind] = cid
+
+    return cid
+
+
+class _Encoder(object):
+    """
+    State of one dumps(): the values found so far, by kind, and the code
+    """
+    def __init__(self):
+        self.strings = []
+        self.string_ids = {}
+        self.terms = []
+        self.ints = []
+        self.int_ids = {}
+        self.code = []
+        self.arrays = array('i')
+        self.built = 0
+        # id(value) -> value id, for the terms, the containers built, and the strings and
+        # ints met (keyed by value in string_ids and int_ids, as equal ones may be different
+        # objects)
+        self.ids = {id(None): _NONE, id(True): _TRUE, id(False): _FALSE, id(_UNSET): _UNSET_ID}
+
+    def value_id(self, value):
+        """
+        The id of a string, term, int, bool or None (met for the first time as this object)
+        """
+        if type(value) is str:
+            vid = self.string(value)
+        elif isinstance(value, RDFTerm):
+            vid = self.term(value)
+        elif type(value) is int:
+            vid = self.integer(value)
+        else:
+            raise TypeError('Cannot encode %s' % type(value).__name__)
+        self.ids[id(value)] = vid
+
+        return vid
+
+    def complete(self, ids, values):
+        # the ids missing from ids, of values met for the first time (maybe more than once)
+        missing = [i for i, vid in enumerate(ids) if vid is None]
+        texts = [values[i] for i in missing]
+        if set(map(type, texts)) == _STR_TYPE:
+            # only strings (the texts of a VALUES table, ...): given ids in bulk
+            string_ids = self.string_ids
+            new = [text for text in dict.fromkeys(texts) if text not in string_ids]
+            start = len(self.strings)
+            string_ids.update(zip(new, range(~(start << 2 | _STRING), ~((start + len(new)) << 2), -4)))
+            self.strings.extend(new)
+            for i, sid in zip(missing, map(string_ids.__getitem__, texts)):
+                ids[i] = sid
+            return
+
+        get = self.ids.get
+        for i, vid in enumerate(ids):
+            if vid is None:
+                value = values[i]
+                vid = get(id(value))
+                ids[i] = self.value_id(value) if vid is None else vid
+
+    def string(self, text):
+        sid = self.string_ids.get(text)
+        if sid is None:
+            sid = self.string_ids[text] = ~(len(self.strings) << 2 | _STRING)
+            self.strings.append(text)
+
+        return sid
+
+    def optional_string(self, text):
+        return _NONE if text is None else self.string(text)
+
+    def term(self, term):
+        tid = ~(len(self.terms) // _TERM_SIZE << 2 | _TERM)
+        prefix = term.prefix
+        flags = (_CONSTANT if term.is_constant else 0) | (_IRI if term.is_iri else 0) \
+            | (_NIL if term.is_nil else 0) | (_BNODE if term.is_bnode else 0) \
+            | (_TYPED if term.is_typed_literal else 0) | (_EXPANDED if term._is_expanded else 0)
+        if prefix is None or isinstance(prefix, str):
+            prefix_iri = None
+        else:
+            # {name: iri} of an expanded term, (name, iri) pairs once frozen
+            (prefix, prefix_iri), = dict(prefix).items()
+            flags |= _PREFIX_IRI
+        self.terms.extend((self.string(term.value), flags, self.optional_string(prefix),
+                           self.optional_string(prefix_iri), self.optional_string(term.lang_tag),
+                           self.optional_string(term.xsd_datatype)))
+
+        return tid
+
+    def integer(self, value):
+        iid = self.int_ids.get(value)
+        if iid is None:
+            if not -(1 << 63) <= value < 1 << 63:
+                raise ValueError('Cannot encode %d, ints are 64-bit' % value)
+            iid = self.int_ids[value] = ~(len(self.ints) << 2 | _INT)
+            self.ints.append(value)
+
+        return iid
+
+    def encode(self, root):
+        """
+        Writes the instructions building root and everything under it; gives the id of root
+        """
+        ids = self.ids
+        get = ids.get
+        code = self.code
+        for op, count, value, children in self.containers(root):
+            if count >= _MAX_COUNT:
+                raise ValueError('Cannot encode a list of %d items' % count)
+            code.append(count << 4 | op)
+            # the containers under value are built: only strings and ints met for the first
+            # time (as these objects) have no id yet
+            child_ids = list(map(get, map(id, children)))
+            if None in child_ids:
+                self.complete(child_ids, children)
+            code.extend(child_ids)
+            if op == _ARRAY:
+                self.arrays.extend(value)
+            ids[id(value)] = ~(self.built << 2 | _BUILT)
+            self.built += 1
+
+        vid = get(id(root))
+        return self.value_id(root) if vid is None else vid
+
+    def containers(self, root):
+        """
+        (op, count, container, children) for the lists, dicts and nodes under root (and root),
+        children first, each once
+        """
+        order = []
+        seen = set()
+        atoms = _ATOMS
+        expanders = _expanders
+        stack = [root]
+        pop, push, extend = stack.pop, stack.append, stack.extend
+        while stack:
+            value = pop()
+            if value is _BUILD:
+                order.append(pop())
+                continue
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+
+            expand = expanders.get(type(value))
+            if expand is None:
+                expand = _expander(type(value))
+            entry = expand(value)
+            if entry is not None:
+                push(entry)
+                push(_BUILD)
+                extend([child for child in reversed(entry[3]) if type(child) not in atoms])
+
+        # the values made here (the kinds of a TermDictionary, ...) are held by order until
+        # encode is done with their ids
+        return order
+
+
+def _list_entry(items):
+    terms = _triple_terms(items)
+    if terms is not None:
+        return _TRIPLES, len(items), items, terms
+    return _LIST, len(items), items, items
+
+
+def _tuple_entry(items):
+    return _TUPLE, len(items), items, items
+
+
+def _dict_entry(mapping):
+    items = []
+    for item in mapping.items():
+        items.extend(item)
+    return _DICT, len(items), mapping, items
+
+
+def _array_entry(words):
+    if words.typecode != 'i':
+        raise TypeError("Cannot encode array('%s')" % words.typecode)
+    return _ARRAY, len(words), words, ()
+
+
+def _dictionary_entry(dictionary):
+    objects = []
+    for tid in dictionary._objects:
+        objects.extend((tid, dictionary._terms[tid]))
+    return _DICTIONARY, 3, dictionary, (dictionary.texts, array('i', list(dictionary.kinds)), objects)
+
+
+def _term_entry(term):
+    # an RDFTerm subclass: a term, not a container
+    return None
+
+
+def _node_entry(cid):
+    get = _GETTERS[cid]
+    if get is None:
+        return lambda node: (_OBJECT, cid, node, (vars(node),))
+
+    def entry(node):
+        try:
+            return _NODE, cid, node, get(node)
+        except AttributeError:
+            return _PARTIAL, cid, node, [getattr(node, name, _UNSET) for name in _FIELDS[cid][1]]
+
+    return entry
+
+
+# type -> function giving the (op, count, value, children) of its values (None for terms)
+_expanders = {}
+
+
+def _expander(kind):
+    for base, expand in ((RDFTerm, _term_entry), (list, _list_entry), (tuple, _tuple_entry), (dict, _dict_entry),
+                         (array, _array_entry), (TermDictionary, _dictionary_entry)):
+        if issubclass(kind, base):
+            break
+    else:
+        cid = _class_id(kind)
+        if cid is None:
+            raise TypeError('Cannot encode %s' % kind.__name__)
+        expand = _node_entry(cid)
+    _expanders[kind] = expand
+
+    return expand
+
+
+def _triple_terms(triples):
+    """
+    The subject, property and object of every triple pattern of a list of triple patterns of
+    terms; None for other lists
+    """
+    if not triples or type(triples[0]) is not TriplePattern:
+        return None
+
+    terms = []
+    for triple in triples:
+        if type(triple) is not TriplePattern:
+            return None
+        terms.extend((triple.subject, triple.property, triple.object))
+    if set(map(type, terms)) != _TERM_TYPE:
+        return None
+
+    return terms
+
+
+# Values with no children (RDFTerm subclasses are told by _expander)
+_ATOMS = frozenset([str, int, bool, type(None), RDFTerm])
+_TERM_TYPE = {RDFTerm}
+_STR_TYPE = {str}
+# Marks the (op, count, value, children) under it on the stack of _Encoder.containers
+_BUILD = object()
+
+
+def dumps(node):
+    """
+    The binary encoding of a query, or of any part of one (a node, a list of nodes, ...)
+    """
+    encoder = _Encoder()
+    root = encoder.encode(node)
+
+    strings = encoder.strings
+    n_terms = len(encoder.terms) // _TERM_SIZE
+    # the values are the constants, then the strings, terms, ints and built values
+    offsets = (len(_CONSTANTS), len(_CONSTANTS) + len(strings), len(_CONSTANTS) + len(strings) + n_terms,
+               len(_CONSTANTS) + len(strings) + n_terms + len(encoder.ints))
+
+    def final(words):
+        return array('i', [w if w >= 0 else offsets[~w & 3] + (~w >> 2) for w in words])
+
+    code = final(encoder.code)
+    terms = final(encoder.terms)
+    ints = array('q', encoder.ints)
+    arrays = encoder.arrays
+    text = '\x00'.join(strings)
+    if text.count('\x00') == max(len(strings) - 1, 0):
+        lengths = array('i')
+    else:
+        lengths = array('i', map(len, strings))
+        text = ''.join(strings)
+    text = text.encode('utf-8', 'surrogatepass')
+    if _SWAP:
+        for words in (lengths, terms, ints, code, arrays):
+            words.byteswap()
+
+    header = _HEADER.pack(MAGIC, VERSION, final([root])[0], len(strings), len(lengths), len(text), len(terms),
+                          len(ints), len(code), len(arrays))
+    return b''.join((header, lengths.tobytes(), text, terms.tobytes(), ints.tobytes(), code.tobytes(),
+                     arrays.tobytes()))
+
+
+def loads(data):
+    """
+    The tree encoded in data (bytes, bytearray or memoryview), as dumps(tree) encoded it
+    """
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+        raise ValueError('Truncated query encoding')
+    magic, version, root, n_strings, n_lengths, text_size, n_terms, n_ints, n_code, n_arrays = \
+        _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a query encoding')
+    if version != VERSION:
+        raise ValueError('Unsupported query encoding version %d' % version)
+    offset = _HEADER.size
+    if len(data) != offset + 4 * (n_lengths + n_terms + n_code + n_arrays) + text_size + 8 * n_ints:
+        raise ValueError('Truncated query encoding')
+
+    lengths, offset = _section(data, offset, 'i', n_lengths)
+    text = str(data[offset:offset + text_size], 'utf-8', 'surrogatepass')
+    offset += text_size
+    if lengths:
+        ends = list(accumulate(lengths))
+        strings = list(map(text.__getitem__, map(slice, [0] + ends, ends)))
+    else:
+        strings = text.split('\x00') if n_strings else []
+    if len(strings) != n_strings:
+        raise ValueError('Invalid query encoding')
+    records, offset = _section(data, offset, 'i', n_terms)
+    ints, offset = _section(data, offset, 'q', n_ints)
+    code, offset = _section(data, offset, 'i', n_code)
+    arrays, offset = _section(data, offset, 'i', n_arrays)
+
+    values = list(_CONSTANTS)
+    values.extend(strings)
+    values.extend(_terms(records, values))
+    values.extend(ints)
+    _run(code, arrays, values)
+
+    return values[root]
+
+
+def _section(data, offset, typecode, count):
+    words = array(typecode)
+    end = offset + words.itemsize * count
+    words.frombytes(data[offset:end])
+    if _SWAP:
+        words.byteswap()
+
+    return words, end
+
+
+def _terms(records, values):
+    terms = []
+    new = RDFTerm.__new__
+    flag_values = _FLAG_VALUES
+    for value, flags, prefix, prefix_iri, lang_tag, datatype in zip(*[iter(records)] * _TERM_SIZE):
+        term = new(RDFTerm)
+        term.value = values[value]
+        term.is_constant, term.is_iri, term.is_nil, term.is_bnode, term.is_typed_literal, term._is_expanded = \
+            flag_values[flags & 63]
+        term.prefix = {values[prefix]: values[prefix_iri]} if flags & _PREFIX_IRI else values[prefix]
+        term.lang_tag = values[lang_tag]
+        term.xsd_datatype = values[datatype]
+        terms.append(term)
+
+    return terms
+
+
+def _run(code, arrays, values):
+    """
+    Appends to values what the instructions of code build
+    """
+    append = values.append
+    value_of = values.__getitem__
+    classes = _FIELDS
+    builders = _BUILDERS
+    new = object.__new__
+    i = 0
+    position = 0
+    n = len(code)
+    while i < n:
+        word = code[i]
+        op = word & 15
+        count = word >> 4
+        if op == _NODE:
+            build, arity = builders[count]
+            end = i + 1 + arity
+            append(build(*map(value_of, code[i + 1:end])))
+            i = end
+        elif op == _LIST:
+            end = i + 1 + count
+            append(list(map(value_of, code[i + 1:end])))
+            i = end
+        elif op == _TRIPLES:
+            end = i + 1 + 3 * count
+            subjects = map(value_of, code[i + 1:end:3])
+            properties = map(value_of, code[i + 2:end:3])
+            objects = map(value_of, code[i + 3:end:3])
+            append(list(map(TriplePattern, subjects, properties, objects)))
+            i = end
+        elif op == _DICT:
+            end = i + 1 + count
+            items = list(map(value_of, code[i + 1:end]))
+            append(dict(zip(items[0::2], items[1::2])))
+            i = end
+        elif op == _TUPLE:
+            end = i + 1 + count
+            append(tuple(map(value_of, code[i + 1:end])))
+            i = end
+        elif op == _OBJECT:
+            node = new(classes[count][0])
+            node.__dict__ = values[code[i + 1]]
+            append(node)
+            i += 2
+        elif op == _ARRAY:
+            append(arrays[position:position + count])
+            position += count
+            i += 1
+        elif op == _DICTIONARY:
+            append(_dictionary(*map(value_of, code[i + 1:i + 4])))
+            i += 4
+        elif op == _PARTIAL:
+            cls, fields = classes[count]
+            node = new(cls)
+            end = i + 1 + len(fields)
+            for name, value in zip(fields, map(value_of, code[i + 1:end])):
+                if value is not _UNSET:
+                    setattr(node, name, value)
+            append(node)
+            i = end
+        else:
+            raise ValueError('Invalid query encoding')
+
+
+def _dictionary(texts, kinds, objects):
+    dictionary = TermDictionary()
+    dictionary.texts = texts
+    dictionary.ids = dict(zip(texts, range(len(texts))))
+    dictionary.kinds = bytearray(kinds.tolist())
+    dictionary._terms = [None] * len(texts)
+    for tid, term in zip(objects[0::2], objects[1::2]):
+        dictionary._terms[tid] = term
+        dictionary._objects.append(tid)
+
+    return dictionary
+
+
+#########################################################
+###############    Node builders         #################
+#########################################################
+# The node of each class from the values of its slots, in the order of __slots__
+_new = object.__new__
+
+
+def _group(cls):
+    def build(ggps):
+        node = _new(cls)
+        node.ggps = ggps
+        return node
+
+    return build
+
+
+def _values_clause(table):
+    # (the variables are those of the table)
+    node = _new(ValuesClause)
+    node.table = table
+    return node
+
+
+def _graph(var_or_iri, ggps):
+    node = _new(GraphGP)
+    node.var_or_iri = var_or_iri
+    node.ggps = ggps
+    return node
+
+
+def _service(var_or_iri, ggps, silent):
+    node = _new(ServiceGP)
+    node.var_or_iri = var_or_iri
+    node.ggps = ggps
+    node.silent = silent
+    return node
+
+
+def _bgp(triples, filters):
+    node = _new(BGP)
+    node.triples = triples
+    node.filters = filters
+    return node
+
+
+def _bind(expression, as_var):
+    node = _new(Bind)
+    node.expression = expression
+    node.as_var = as_var
+    return node
+
+
+def _filter(expression):
+    node = _new(Filter)
+    node.expression = expression
+    return node
+
+
+def _triple_pattern(subject, property, object):
+    node = _new(TriplePattern)
+    node.subject = subject
+    node.property = property
+    node.object = object
+    return node
+
+
+def _property_path(left_path, oper, right_path):
+    node = _new(PropertyPath)
+    node.left_path = left_path
+    node.oper = oper
+    node.right_path = right_path
+    return node
+
+
+def _path_term(inverse, path_term, path_mode):
+    node = _new(PathTerm)
+    node.inverse = inverse
+    node.path_term = path_term
+    node.path_mode = path_mode
+    return node
+
+
+def _expression(left_expr, oper, right_expr, ternary_expr, quaternary_expr):
+    node = _new(Expression)
+    node.left_expr = left_expr
+    node.oper = oper
+    node.right_expr = right_expr
+    node.ternary_expr = ternary_expr
+    node.quaternary_expr = quaternary_expr
+    return node
+
+
+def _values_table(variables, dictionary, columns, size):
+    node = _new(ValuesTable)
+    node.variables = variables
+    node.dictionary = dictionary
+    node.columns = columns
+    node.size = size
+    return node
+
+
+_NODE_BUILDERS = {
+    GGP: _group(GGP),
+    ValuesClause: _values_clause,
+    GraphGP: _graph,
+    ServiceGP: _service,
+    OptionalGP: _group(OptionalGP),
+    UnionGP: _group(UnionGP),
+    MinusGP: _group(MinusGP),
+    BGP: _bgp,
+    Bind: _bind,
+    Filter: _filter,
+    TriplePattern: _triple_pattern,
+    PropertyPath: _property_path,
+    PathTerm: _path_term,
+    Expression: _expression,
+    ValuesTable: _values_table,
+}
+# class id -> (builder, number of slots)
+_BUILDERS = [(_NODE_BUILDERS.get(cls), len(fields or ())) for cls, fields in _FIELDS]
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing query logs on every core: the queries are sent in chunks to a pool of worker
+processes, each with its own SparqlParser (grammar tables loaded once per worker), and
+the parsed queries come back pickled (for the small queries of logs, pickle costs less than
+awudima.sparql.binary), or encoded with awudima.sparql.binary, which does not recurse, if
+they are too deeply nested to pickle.
+
+    with BulkParser(processes=8) as bulk:
+        for result in bulk.parse(read_log(['queries.log'])):
+            if result.error is None:
+                use(result.index, result.query)
+        print(bulk.stats())     # queries, parsed, failed, seconds, per_second
+
+A query that fails to parse (or to be sent back from its worker) gives a result with its
+error (the message of the exception) and no query; the others are not affected. Results come in the order of the queries, or,
+with ordered=False, as soon as their chunk is parsed. Only a few chunks per worker are
+read ahead, so a log of any size is parsed in bounded memory.
+
+    python -m awudima.sparql.bulk queries.log [--processes N] [--unordered] [--errors FILE]
+"""
+
+__author__ = 'Kemele M. Endris'
+
+import os
+import pickle
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+class ParseResult(object):
+    """
+    A query of the log (index, its position, from 0; text) with its parsed query, or the
+    error it failed with
+    """
+    __slots__ = ('index', 'text', 'query', 'error')
+
+    def __init__(self, index, text, query=None, error=None):
+        self.index = index
+        self.text = text
+        self.query = query
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return '<ParseResult %d: %s>' % (self.index, self.error)
+        return '<ParseResult %d: %s>' % (self.index, type(self.query).__name__)
+
+
+# The parser of a worker process
+_worker_parser = None
+
+
+def _start_worker(options):
+    global _worker_parser
+    from awudima.sparql.parser import SparqlParser
+
+    if options.get('profile') is not None:
+        # counts the parses of this worker only, sent back with each chunk
+        options = dict(options, profile=type(options['profile'])())
+    _worker_parser = SparqlParser(**options)
+
+
+def _encoded(query):
+    """
+    The query as bytes, to send it back from a worker: pickled, or encoded with
+    awudima.sparql.binary if it is too deeply nested to pickle
+    """
+    try:
+        return pickle.dumps(query, pickle.HIGHEST_PROTOCOL)
+    except RecursionError:
+        from awudima.sparql import binary
+        return binary.dumps(query)
+
+
+def _decoded(data):
+    from awudima.sparql import binary
+
+    if data[:len(binary.MAGIC)] == binary.MAGIC:
+        return binary.loads(data)
+    return pickle.loads(data)
+
+
+def _parse_chunk(start, texts):
+    """
+    (start, [(encoded query, None) or (None, error) for every text], the report of the
+    profile of these parses or None), in a worker
+    """
+    start, outcomes = _parse_texts(_worker_parser, start, texts, _encoded)
+    profile = _worker_parser.profile
+    if profile is None:
+        return start, outcomes, None
+    report = profile.report()
+    profile.reset()
+    return start, outcomes, report
+
+
+def _parse_texts(parser, start, texts, encode=None):
+    outcomes = []
+    for text in texts:
+        try:
+            query = parser.parse(text)
+            outcomes.append((query if encode is None else encode(query), None))
+        except Exception as e:
+            outcomes.append((None, '%s: %s' % (type(e).__name__, e)))
+
+    return start, outcomes
+
+
+def _decode_chunk(start, outcomes, report):
+    """
+    The result of _parse_chunk with the queries decoded
+    """
+    decoded = []
+    for data, error in outcomes:
+        if error is not None:
+            decoded.append((None, error))
+            continue
+        try:
+            decoded.append((_decoded(data), None))
+        except Exception as e:
+            decoded.append((None, '%s: %s' % (type(e).__name__, e)))
+
+    return start, decoded, report
+
+
+class BulkParser(object):
+    """
+    Parses iterables of query texts with a pool of processes (os.cpu_count() of them by
+    default; with processes=0, in this process). The other options are those of SparqlParser;
+    the pool is started on the first parse and lasts until close(). A profile
+    (awudima.sparql.profiling.ParseProfile) counts the parses of every worker.
+    """
+    def __init__(self, processes=None, chunksize=256, **options):
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes < 0 or chunksize < 1:
+            raise ValueError('processes must be 0 or more and chunksize 1 or more')
+        self.processes = processes
+        self.chunksize = chunksize
+        self.options = options
+        self.queries = 0
+        self.parsed = 0
+        self.failed = 0
+        self.seconds = 0.0
+        self._executor = None
+
+    def _chunks(self, queries):
+        chunk = []
+        start = 0
+        for text in queries:
+            chunk.append(text)
+            if len(chunk) == self.chunksize:
+                yield start, chunk
+                start += len(chunk)
+                chunk = []
+        if chunk:
+            yield start, chunk
+
+    def _results(self, texts, start, outcomes, report=None):
+        if report is not None:
+            self.options['profile'].update(report)
+        for i, (query, error) in enumerate(outcomes):
+            if error is None:
+                self.parsed += 1
+                yield ParseResult(start + i, texts[i], query)
+            else:
+                self.failed += 1
+                yield ParseResult(start + i, texts[i], error=error)
+        self.queries += len(outcomes)
+
+    def parse(self, queries, ordered=True):
+        """
+        A ParseResult for every query text of queries
+        """
+        started = time.perf_counter()
+        try:
+            if not self.processes:
+                yield from self._parse_here(queries)
+            elif ordered:
+                yield from self._parse_ordered(queries)
+            else:
+                yield from self._parse_unordered(queries)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def _parse_here(self, queries):
+        from awudima.sparql.parser import SparqlParser
+
+        parser = SparqlParser(**self.options)
+        for start, texts in self._chunks(queries):
+            yield from self._results(texts, *_parse_texts(parser, start, texts))
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.processes, initializer=_start_worker,
+                                                 initargs=(self.options,))
+        return self._executor
+
+    def _parse_ordered(self, queries):
+        pool = self._pool()
+        window = 4 * self.processes
+        pending = deque()
+        for start, texts in self._chunks(queries):
+            pending.append((texts, pool.submit(_parse_chunk, start, texts)))
+            if len(pending) >= window:
+                texts, future = pending.popleft()
+                yield from self._results(texts, *_decode_chunk(*future.result()))
+        while pending:
+            texts, future = pending.popleft()
+            yield from self._results(texts, *_decode_chunk(*future.result()))
+
+    def _parse_unordered(self, queries):
+        pool = self._pool()
+        window = 4 * self.processes
+        # future -> the texts of its chunk
+        pending = {}
+        for start, texts in self._chunks(queries):
+            pending[pool.submit(_parse_chunk, start, texts)] = texts
+            while len(pending) >= window:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._results(pending.pop(future), *_decode_chunk(*future.result()))
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from self._results(pending.pop(future), *_decode_chunk(*future.result()))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stats(self):
+        return {'queries': self.queries,
+                'parsed': self.parsed,
+                'failed': self.failed,
+                'seconds': self.seconds,
+                'per_second': self.queries / self.seconds if self.seconds else 0.0}
+
+
+def parse_all(queries, processes=None, ordered=True, **options):
+    """
+    A ParseResult for every query text of queries, parsed by a BulkParser of its own
+    """
+    with BulkParser(processes, **options) as bulk:
+        yield from bulk.parse(queries, ordered)
+
+
+def read_log(paths):
+    """
+    The queries of query logs, one per line; blank lines are skipped and - reads stdin
+    """
+    for path in paths:
+        f = sys.stdin if path == '-' else open(path, encoding='utf-8', errors='surrogateescape')
+        try:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    argparser = argparse.ArgumentParser(prog='python -m awudima.sparql.bulk',
+                                        description='Parses query logs (one query per line) with a pool of processes '
+                                                    'and reports the throughput')
+    argparser.add_argument('logs', nargs='+', help='query log files, - for stdin')
+    argparser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per core, '
+                                                                       '0: parse in this process)')
+    argparser.add_argument('--chunksize', type=int, default=256, help='queries sent to a worker at once')
+    argparser.add_argument('--tokenizer', choices=('ply', 'scanner'), default='ply')
+    argparser.add_argument('--unordered', action='store_true', help='take results as they come')
+    argparser.add_argument('--errors', help='file to write the queries that fail to parse to, with their errors')
+    args = argparser.parse_args()
+
+    errors = open(args.errors, 'w', encoding='utf-8', errors='surrogateescape') if args.errors else None
+    try:
+        with BulkParser(args.processes, args.chunksize, tokenizer=args.tokenizer) as bulk:
+            for result in bulk.parse(read_log(args.logs), ordered=not args.unordered):
+                if result.error is not None and errors is not None:
+                    errors.write('%d\t%s\t%s\n' % (result.index, result.error.replace('\n', ' '), result.text))
+            stats = bulk.stats()
+    finally:
+        if errors is not None:
+            errors.close()
+    print('%d queries: %d parsed, %d failed, in %.1f s (%.0f queries/s, %d processes)'
+          % (stats['queries'], stats['parsed'], stats['failed'], stats['seconds'], stats['per_second'],
+             bulk.processes))
@@ -0,0 +1,482 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Kemele M. Endris'
+
+import hashlib
+import mmap
+import os
+import pickle
+import re
+import struct
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# IRIs in angle brackets, as parser.t_IRIREF reads them; a '<' not followed by one is an operator
+_IRIREF = re.compile(r"<([^<>\"{}|\^`\\\]\[\x00-\x20])*>")
+
+
+def normalize_query(text):
+    """
+    Cache key of a query text: leading/trailing whitespace removed and runs of
+    whitespace outside string literals collapsed to a single space (or a single
+    newline, so that '#' comments keep ending where they did). IRIs in angle brackets
+    and comments are kept as they are: quotes in them do not start string literals.
+    """
+    out = []
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        iri = _IRIREF.match(text, i) if c == '<' else None
+        if c in ' \t\n':
+            j = i
+            newline = False
+            while j < n and text[j] in ' \t\n':
+                newline = newline or text[j] == '\n'
+                j += 1
+            out.append('\n' if newline else ' ')
+            i = j
+        elif c == '"' or c == "'":
+            if text.startswith(c * 3, i):
+                end = text.find(c * 3, i + 3)
+                while end != -1 and text[end - 1] == '\\':
+                    end = text.find(c * 3, end + 1)
+                j = n if end == -1 else end + 3
+            else:
+                j = i + 1
+                while j < n and text[j] != c and text[j] != '\n':
+                    j += 2 if text[j] == '\\' else 1
+                j = min(j + 1, n)
+            out.append(text[i:j])
+            i = j
+        elif iri is not None:
+            j = iri.end()
+            out.append(text[i:j])
+            i = j
+        elif c == '#':
+            j = text.find('\n', i)
+            j = n if j == -1 else j
+            out.append(text[i:j])
+            i = j
+        else:
+            j = i + 1
+            while j < n and text[j] not in ' \t\n"\'<#':
+                j += 1
+            out.append(text[i:j])
+            i = j
+
+    return ''.join(out).strip(' \n')
+
+
+class ParseCache(object):
+    """
+    Bounded LRU cache of parsed queries, keyed on the normalized query text.
+
+    Queries are stored pickled, so every hit returns a fresh copy of the tree and callers
+    can mutate it (e.g., expand_syntax_forms) without affecting the cached entry.
+    The cache holds at most maxsize entries and, if maxbytes is given, at most maxbytes
+    bytes of pickled queries. It is safe to share between threads.
+    """
+    def __init__(self, maxsize=1024, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.currbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return pickle.loads(blob)
+
+    def put(self, key, query):
+        blob = pickle.dumps(query, pickle.HIGHEST_PROTOCOL)
+        if self.maxbytes is not None and len(blob) > self.maxbytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.currbytes -= len(old)
+            self._entries[key] = blob
+            self.currbytes += len(blob)
+            while len(self._entries) > self.maxsize \
+                    or (self.maxbytes is not None and self.currbytes > self.maxbytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.currbytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.currbytes = 0
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'bytes': self.currbytes}
+
+
+# File layout of a DiskParseCache: a header, an index of n_slots slots (open addressing,
+# linear probing), then the encoded queries one after the other
+_DISK_MAGIC = b'AWQC'
+_DISK_VERSION = 1
+# magic, version, retired, n_slots, max_entries, count, max_bytes, data_end, clock
+_DISK_HEADER = struct.Struct('<4sBB2xIIIQQQ')
+_HEADER_SIZE = 64
+_RETIRED_AT = 5
+_CLOCK_AT = _DISK_HEADER.size - 8
+# key digest, offset of the query in the file, its length (0: empty slot), last use
+_SLOT = struct.Struct('<16sQQQ')
+_STAMP_AT = 32
+
+
+def _digest(key):
+    return hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class DiskParseCache(object):
+    """
+    Parsed queries kept in a file, keyed on the normalized query text, so that they outlive
+    the process and are shared between the processes that open the same file.
+
+    Queries are stored encoded with awudima.sparql.binary, and the file is memory-mapped:
+    a lookup hashes the key, probes the index in the mapping and decodes the query straight
+    from it, without reading the file. Every hit returns a fresh copy of the tree.
+
+    The cache holds at most max_entries queries and max_bytes bytes of encoded queries (both
+    fixed when the file is created; an existing file keeps its own). The index of the file
+    is written in full when it is created, 40 bytes per slot and at least 4/3 of a slot per
+    entry: a new file takes 5 MB with the default max_entries (65536). When a put would go past
+    either, the least recently used queries are evicted: the file is rewritten with the most
+    recently used ones, down to half of the limits, and replaces the old one (processes that
+    have the old one open move to the new one on their next call). Recency is kept in the
+    file, shared by all the processes; lookups and puts are serialized between threads, and
+    puts between processes with a lock file (path + '.lock') on systems that have fcntl.
+
+    It can be given to SparqlParser as its cache; python -m awudima.sparql.cache fills one
+    from query logs.
+    """
+    def __init__(self, path, max_entries=1 << 16, max_bytes=1 << 30):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError('max_entries and max_bytes must be positive')
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._lock_file = open(path + '.lock', 'a+b') if fcntl is not None else None
+        self._file = None
+        self._map = None
+        try:
+            with self._locked():
+                if not os.path.exists(path) or os.path.getsize(path) == 0:
+                    self._create(path, max_entries, max_bytes)
+                self._open()
+        except BaseException:
+            self.close()
+            raise
+
+    def _locked(self):
+        return _FileLock(self._lock, self._lock_file)
+
+    @staticmethod
+    def _create(path, max_entries, max_bytes, entries=(), source=None):
+        """
+        Writes a cache file with entries, (digest, offset, length, stamp) of queries in source
+        """
+        n_slots = 1
+        while n_slots < max_entries + max_entries // 3 + 1:
+            n_slots <<= 1
+        data_start = _HEADER_SIZE + n_slots * _SLOT.size
+        index = bytearray(n_slots * _SLOT.size)
+        mask = n_slots - 1
+        offset = data_start
+        clock = 0
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.seek(data_start)
+            for digest, old_offset, length, stamp in entries:
+                f.write(source[old_offset:old_offset + length])
+                i = int.from_bytes(digest[:8], 'little') & mask
+                while _SLOT.unpack_from(index, i * _SLOT.size)[2]:
+                    i = (i + 1) & mask
+                _SLOT.pack_into(index, i * _SLOT.size, digest, offset, length, stamp)
+                offset += length
+                clock = max(clock, stamp)
+            f.truncate(offset)
+            f.seek(0)
+            f.write(_DISK_HEADER.pack(_DISK_MAGIC, _DISK_VERSION, 0, n_slots, max_entries, len(entries), max_bytes,
+                                      offset - data_start, clock))
+            f.seek(_HEADER_SIZE)
+            f.write(index)
+        os.replace(tmp, path)
+
+    def _open(self):
+        self._unmap()
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, _, n_slots, self.max_entries, _, self.max_bytes, _, _ = _DISK_HEADER.unpack_from(self._map)
+        if magic != _DISK_MAGIC:
+            self._unmap()
+            raise ValueError("'%s' is not a parse cache file" % self.path)
+        if version != _DISK_VERSION:
+            self._unmap()
+            raise ValueError("Unsupported parse cache version %d in '%s'" % (version, self.path))
+        self._n_slots = n_slots
+        self._data_start = _HEADER_SIZE + n_slots * _SLOT.size
+
+    def _remap(self):
+        # the whole file, with what other processes appended to it since it was mapped
+        old, self._map = self._map, mmap.mmap(self._file.fileno(), 0)
+        old.close()
+        return self._map
+
+    def _current(self):
+        """
+        The mapping of the cache file, after moving to the new file if another process (or
+        thread) replaced it
+        """
+        if self._map is None:
+            raise ValueError('The parse cache is closed')
+        if self._map[_RETIRED_AT]:
+            self._open()
+        return self._map
+
+    def _find(self, mapping, digest):
+        """
+        Position of the slot of digest in the index, and whether it holds digest (if not, it
+        is the empty slot where digest goes)
+        """
+        mask = self._n_slots - 1
+        i = int.from_bytes(digest[:8], 'little') & mask
+        while True:
+            position = _HEADER_SIZE + i * _SLOT.size
+            slot_digest, offset, length, _ = _SLOT.unpack_from(mapping, position)
+            if not length:
+                return position, False
+            if slot_digest == digest:
+                return position, True
+            i = (i + 1) & mask
+
+    def __len__(self):
+        with self._lock:
+            return _DISK_HEADER.unpack_from(self._current())[5]
+
+    def __contains__(self, key):
+        digest = _digest(key)
+        with self._lock:
+            return self._find(self._current(), digest)[1]
+
+    def get(self, key):
+        from awudima.sparql.binary import loads
+
+        digest = _digest(key)
+        # (the thread lock only: put() and clear() may move self to another mapping)
+        with self._lock:
+            mapping = self._current()
+            position, found = self._find(mapping, digest)
+            if not found:
+                self.misses += 1
+                return None
+            _, offset, length, _ = _SLOT.unpack_from(mapping, position)
+            if offset + length > len(mapping):
+                # written by another process since the file was mapped: map the same file again
+                # (the path may be another file by now, where the offset means nothing)
+                mapping = self._remap()
+            with memoryview(mapping) as view, view[offset:offset + length] as data:
+                query = loads(data)
+            # without the file lock: concurrent hits of other processes may lose a tick, which
+            # only blurs the eviction order
+            clock = struct.unpack_from('<Q', mapping, _CLOCK_AT)[0] + 1
+            struct.pack_into('<Q', mapping, _CLOCK_AT, clock)
+            struct.pack_into('<Q', mapping, position + _STAMP_AT, clock)
+            self.hits += 1
+
+        return query
+
+    def put(self, key, query):
+        from awudima.sparql.binary import dumps
+
+        blob = dumps(query)
+        digest = _digest(key)
+        with self._locked():
+            mapping = self._current()
+            if len(blob) > self.max_bytes or self._find(mapping, digest)[1]:
+                return
+            header = list(_DISK_HEADER.unpack_from(mapping))
+            if header[5] + 1 > self.max_entries or header[7] + len(blob) > self.max_bytes:
+                self._evict(len(blob))
+                mapping = self._map
+                header = list(_DISK_HEADER.unpack_from(mapping))
+            count, data_end = header[5], header[7]
+
+            offset = self._data_start + data_end
+            self._file.seek(offset)
+            self._file.write(blob)
+            self._file.flush()
+            clock = struct.unpack_from('<Q', mapping, _CLOCK_AT)[0] + 1
+            position = self._find(mapping, digest)[0]
+            # the slot is filled once the query is in the file; the digest goes last, so that
+            # readers never take a slot for digest with no query behind it
+            _SLOT.pack_into(mapping, position, bytes(16), offset, len(blob), clock)
+            mapping[position:position + 16] = digest
+            header[5], header[7], header[8] = count + 1, data_end + len(blob), clock
+            _DISK_HEADER.pack_into(mapping, 0, *header)
+
+    def _entries(self, mapping):
+        entries = []
+        for position in range(_HEADER_SIZE, self._data_start, _SLOT.size):
+            entry = _SLOT.unpack_from(mapping, position)
+            if entry[2]:
+                entries.append(entry)
+        return entries
+
+    def _evict(self, incoming):
+        """
+        Rewrites the file with the most recently used queries, down to half of the limits
+        """
+        mapping = self._remap()
+        entries = sorted(self._entries(mapping), key=lambda entry: entry[3], reverse=True)
+        kept = []
+        size = incoming
+        for entry in entries:
+            if len(kept) + 1 > self.max_entries // 2 or size + entry[2] > self.max_bytes // 2:
+                break
+            kept.append(entry)
+            size += entry[2]
+        self._replace(sorted(kept, key=lambda entry: entry[1]))
+        self.evictions += len(entries) - len(kept)
+
+    def _replace(self, entries):
+        self._create(self.path, self.max_entries, self.max_bytes, entries, self._remap())
+        self._map[_RETIRED_AT] = 1
+        self._open()
+
+    def clear(self):
+        with self._locked():
+            self._current()
+            self._replace(())
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stats(self):
+        with self._lock:
+            header = _DISK_HEADER.unpack_from(self._current())
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': header[5],
+                'bytes': header[7]}
+
+
+class _FileLock(object):
+    """
+    A thread lock, together with an exclusive lock on a file when there is one
+    """
+    def __init__(self, lock, lock_file):
+        self.lock = lock
+        self.lock_file = lock_file
+
+    def __enter__(self):
+        self.lock.acquire()
+        if self.lock_file is not None:
+            try:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self.lock.release()
+                raise
+
+    def __exit__(self, *exc_info):
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+        self.lock.release()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    argparser = argparse.ArgumentParser(prog='python -m awudima.sparql.cache',
+                                        description='Builds and inspects on-disk parse caches (DiskParseCache)')
+    commands = argparser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='parses the queries of query logs (one query per line) into a cache')
+    build.add_argument('cache', help='cache file, created if missing')
+    build.add_argument('logs', nargs='+', help='query log files, - for stdin')
+    build.add_argument('--max-entries', type=int, default=1 << 16, help='for a new cache file')
+    build.add_argument('--max-bytes', type=int, default=1 << 30, help='for a new cache file')
+    stats = commands.add_parser('stats', help='prints the size of a cache')
+    stats.add_argument('cache')
+    args = argparser.parse_args()
+
+    if args.command == 'stats':
+        if not os.path.exists(args.cache):
+            sys.exit("No cache file '%s'" % args.cache)
+        with DiskParseCache(args.cache) as cache:
+            stats = cache.stats()
+            print('%s: %d queries, %d bytes (at most %d queries, %d bytes)'
+                  % (args.cache, stats['size'], stats['bytes'], cache.max_entries, cache.max_bytes))
+        sys.exit(0)
+
+    from awudima.sparql.bulk import read_log
+    from awudima.sparql.parser import sparql
+
+    start = time.perf_counter()
+    n_lines = n_parsed = n_cached = n_failed = 0
+    with DiskParseCache(args.cache, args.max_entries, args.max_bytes) as cache:
+        for text in read_log(args.logs):
+            n_lines += 1
+            key = normalize_query(text)
+            if key in cache:
+                n_cached += 1
+                continue
+            try:
+                query = sparql(text)
+            except Exception:
+                n_failed += 1
+                continue
+            cache.put(key, query)
+            n_parsed += 1
+        stats = cache.stats()
+    print('%d queries: %d parsed, %d already cached, %d failed to parse (%.1f s)'
+          % (n_lines, n_parsed, n_cached, n_failed, time.perf_counter() - start))
+    print('%s: %d queries, %d bytes, %d evicted' % (args.cache, stats['size'], stats['bytes'], cache.evictions))
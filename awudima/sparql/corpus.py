@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+Query corpus shared by the benchmarks (benchmarks/) and the tests: fixed queries, seeded
+workloads, and token soups for comparing the tokenizer with the PLY lexer.
+"""
+
+QUERIES = [
+    "SELECT DISTINCT * WHERE {?s ?p ?o} ORDER BY ?s LIMIT 10 ",
+    """PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    SELECT ?s ?label WHERE {
+        ?s a <http://xmlns.com/foaf/0.1/Person> ;
+           rdfs:label ?label .
+        OPTIONAL { ?s rdfs:comment ?c }
+        FILTER(LANG(?label) = 'en' && ?s != ?label)
+    } LIMIT 100""",
+    """PREFIX owl: <http://www.w3.org/2002/07/owl#>
+    SELECT ?a ?b WHERE {
+        { ?a owl:sameAs ?b } UNION { ?b owl:sameAs ?a }
+        FILTER ( ?a != ?b )
+    }""",
+    "ASK { ?s ?p 42 }",
+    """PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    PREFIX owl: <http://www.w3.org/2002/07/owl#>
+    SELECT ?path ?link ?label
+    FROM <http://purl.obolibrary.org/obo/merged/CL>
+    WHERE {
+            ?s ?p ?o.
+            OPTIONAL {?s1 ?p2 ?o2}
+              { ?s rdfs:subClassOf ?o .
+                    OPTIONAL {
+                        ?o rdfs:label ?label .
+                        FILTER(LANG(?label) = "" && LANG(?label) = 'en')
+                    }
+                } UNION {
+                    ?s owl:equivalentClass ?s1 .
+                    ?s1 owl:intersectionOf ?s2 .
+                    ?s2 rdf:first ?o  .
+                }
+                FILTER ( ?s != ?o )
+    }""",
+    """PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+    CONSTRUCT { ?s foaf:name ?name } WHERE { ?s foaf:name ?name ; foaf:age ?age . FILTER(?age >= 18) }""",
+    "DESCRIBE ?s WHERE { ?s ?p \"x\"@en }",
+    """PREFIX ex: <http://example.org/>
+    SELECT (COUNT(DISTINCT ?s) AS ?n) ?t WHERE {
+        ?s a ?t ; ex:value ?v ; ex:path/ex:next* ?x .
+        FILTER(regex(str(?v), "^abc", "i"))
+        FILTER(?v > -1.5e3 && ?v < +2.0)
+        BIND (?v * 2 AS ?w)
+        VALUES (?t ?x) { (ex:A 1) (UNDEF "b") }
+    } GROUP BY ?t ORDER BY DESC(?n) LIMIT 10 OFFSET 5""",
+]
+
+
+def large_query(n_patterns, n_values=0, filter_every=25):
+    """
+    A generated SELECT query with n_patterns triple patterns, a filter after every
+    filter_every patterns (none if 0), and an optional VALUES block of n_values rows
+    (~70 bytes per triple pattern).
+    """
+    lines = ["PREFIX ex: <http://example.org/ontology/>",
+             "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>",
+             "SELECT DISTINCT ?s0 ?label WHERE {"]
+    for i in range(n_patterns):
+        if i % 3 == 0:
+            lines.append('  ?s%d ex:property%d <http://example.org/resource/r%d> .' % (i, i % 50, i))
+        elif i % 3 == 1:
+            lines.append('  ?s%d rdfs:label "label number %d"@en .' % (i - 1, i))
+        else:
+            lines.append('  ?s%d ex:value%d %d.5 .' % (i - 2, i % 20, i))
+        if filter_every and i % filter_every == filter_every - 1:
+            lines.append('  FILTER(?s%d != ?s%d && ?s%d != <http://example.org/x>)' % (i - 2, i - 5, i - 2))
+    if n_values > 0:
+        lines.append('  VALUES (?s0 ?label) {')
+        for i in range(n_values):
+            lines.append('    (<http://example.org/resource/r%d> "value %d")' % (i, i))
+        lines.append('  }')
+    lines.append('} LIMIT 1000')
+    return '\n'.join(lines)
+
+
+def nested_query(depth, chain=0):
+    """
+    A generated SELECT query of depth groups nested in one another, alternately through
+    OPTIONAL and UNION, and (if chain) a filter on a sum of chain terms, an expression as
+    deep as the chain is long.
+    """
+    text = '?s%d <http://example.org/p> ?o%d' % (depth, depth)
+    for i in range(depth - 1, -1, -1):
+        if i % 2:
+            text = '?s%d <http://example.org/p> ?o%d OPTIONAL { %s }' % (i, i, text)
+        else:
+            text = '{ ?s%d <http://example.org/p> ?o%d } UNION { %s }' % (i, i, text)
+    if chain:
+        text += ' FILTER(?o0 + %s > 0)' % ' + '.join('?o%d' % (i % (depth + 1)) for i in range(chain))
+    return 'SELECT * WHERE { %s }' % text
+
+
+def query_log(n_queries, seed=0):
+    """
+    n_queries generated one-line queries, as in a query log: the corpus queries and small
+    queries of 1 to 12 triple patterns with varied constants, repeated as in real logs, and
+    about one in a hundred that does not parse.
+    """
+    import random
+
+    rng = random.Random(seed)
+    corpus = [' '.join(q.split()) for q in QUERIES]
+    for i in range(n_queries):
+        kind = rng.random()
+        if kind < 0.3:
+            yield rng.choice(corpus)
+        elif kind < 0.99:
+            n = rng.randint(1, 12)
+            patterns = ' . '.join('?s%d <http://example.org/p%d> %s' % (j // 3, rng.randrange(100),
+                                                                        '"v%d"' % rng.randrange(1000) if j % 2
+                                                                        else '?o%d' % j) for j in range(n))
+            yield 'SELECT * WHERE { %s } LIMIT %d' % (patterns, rng.choice((10, 100, 1000)))
+        else:
+            yield 'SELECT * WHERE { ?s ?p ?o'
+
+
+_BSBM_PREFIXES = """PREFIX bsbm-inst: <http://www4.wiwiss.fu-berlin.de/bizer/bsbm/v01/instances/>
+PREFIX bsbm: <http://www4.wiwiss.fu-berlin.de/bizer/bsbm/v01/vocabulary/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+PREFIX rev: <http://purl.org/stuff/rev#>
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+PREFIX dc: <http://purl.org/dc/elements/1.1/>
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+"""
+
+# The queries of the BSBM explore use case (Q6 is a regex on labels, as in Q8 here);
+# %(product)s, %(offer)s, %(review)s are IRIs, the others numbers
+_BSBM = [
+    """SELECT DISTINCT ?product ?label WHERE {
+    ?product rdfs:label ?label .
+    ?product a bsbm-inst:ProductType%(type)d .
+    ?product bsbm:productFeature bsbm-inst:ProductFeature%(f1)d .
+    ?product bsbm:productFeature bsbm-inst:ProductFeature%(f2)d .
+    ?product bsbm:productPropertyNumeric1 ?value1 .
+    FILTER (?value1 > %(x)d)
+} ORDER BY ?label LIMIT 10""",
+    """SELECT ?label ?comment ?producer ?productFeature ?propertyTextual1 ?propertyNumeric1 ?propertyTextual4 WHERE {
+    %(product)s rdfs:label ?label .
+    %(product)s rdfs:comment ?comment .
+    %(product)s bsbm:producer ?p .
+    ?p rdfs:label ?producer .
+    %(product)s dc:publisher ?p .
+    %(product)s bsbm:productFeature ?f .
+    ?f rdfs:label ?productFeature .
+    %(product)s bsbm:productPropertyTextual1 ?propertyTextual1 .
+    %(product)s bsbm:productPropertyNumeric1 ?propertyNumeric1 .
+    OPTIONAL { %(product)s bsbm:productPropertyTextual4 ?propertyTextual4 }
+}""",
+    """SELECT ?product ?label WHERE {
+    ?product rdfs:label ?label .
+    ?product a bsbm-inst:ProductType%(type)d .
+    ?product bsbm:productFeature bsbm-inst:ProductFeature%(f1)d .
+    ?product bsbm:productPropertyNumeric1 ?p1 .
+    FILTER ( ?p1 > %(x)d )
+    ?product bsbm:productPropertyNumeric3 ?p3 .
+    FILTER (?p3 < %(y)d )
+    OPTIONAL {
+        ?product bsbm:productFeature bsbm-inst:ProductFeature%(f2)d .
+        ?product rdfs:label ?testVar }
+    FILTER (!bound(?testVar))
+} ORDER BY ?label LIMIT 10""",
+    """SELECT DISTINCT ?product ?label ?propertyTextual WHERE {
+    {
+        ?product rdfs:label ?label .
+        ?product rdf:type bsbm-inst:ProductType%(type)d .
+        ?product bsbm:productFeature bsbm-inst:ProductFeature%(f1)d .
+        ?product bsbm:productPropertyTextual1 ?propertyTextual .
+        ?product bsbm:productPropertyNumeric1 ?p1 .
+        FILTER ( ?p1 > %(x)d )
+    } UNION {
+        ?product rdfs:label ?label .
+        ?product rdf:type bsbm-inst:ProductType%(type)d .
+        ?product bsbm:productFeature bsbm-inst:ProductFeature%(f2)d .
+        ?product bsbm:productPropertyTextual1 ?propertyTextual .
+        ?product bsbm:productPropertyNumeric2 ?p2 .
+        FILTER ( ?p2 > %(y)d )
+    }
+} ORDER BY ?label OFFSET 5 LIMIT 10""",
+    """SELECT DISTINCT ?product ?productLabel WHERE {
+    ?product rdfs:label ?productLabel .
+    FILTER (%(product)s != ?product)
+    %(product)s bsbm:productFeature ?prodFeature .
+    ?product bsbm:productFeature ?prodFeature .
+    %(product)s bsbm:productPropertyNumeric1 ?origProperty1 .
+    ?product bsbm:productPropertyNumeric1 ?simProperty1 .
+    FILTER (?simProperty1 < (?origProperty1 + 120) && ?simProperty1 > (?origProperty1 - 120))
+    %(product)s bsbm:productPropertyNumeric2 ?origProperty2 .
+    ?product bsbm:productPropertyNumeric2 ?simProperty2 .
+    FILTER (?simProperty2 < (?origProperty2 + 170) && ?simProperty2 > (?origProperty2 - 170))
+} ORDER BY ?productLabel LIMIT 5""",
+    """SELECT ?productLabel ?offer ?price ?vendor ?vendorTitle ?review ?revTitle ?reviewer ?revName ?rating1 ?rating2 WHERE {
+    %(product)s rdfs:label ?productLabel .
+    OPTIONAL {
+        ?offer bsbm:product %(product)s .
+        ?offer bsbm:price ?price .
+        ?offer bsbm:vendor ?vendor .
+        ?vendor rdfs:label ?vendorTitle .
+        ?vendor bsbm:country <http://downlode.org/rdf/iso-3166/countries#DE> .
+        ?offer dc:publisher ?vendor .
+        ?offer bsbm:validTo ?date .
+        FILTER (?date > "2008-06-20T00:00:00"^^xsd:dateTime )
+    }
+    OPTIONAL {
+        ?review bsbm:reviewFor %(product)s .
+        ?review rev:reviewer ?reviewer .
+        ?reviewer foaf:name ?revName .
+        ?review dc:title ?revTitle .
+        OPTIONAL { ?review bsbm:rating1 ?rating1 . }
+        OPTIONAL { ?review bsbm:rating2 ?rating2 . }
+    }
+}""",
+    """SELECT ?title ?text ?reviewDate ?reviewer ?reviewerName ?rating1 ?rating2 ?rating3 ?rating4 WHERE {
+    ?review bsbm:reviewFor %(product)s .
+    ?review dc:title ?title .
+    ?review rev:text ?text .
+    FILTER langMatches( lang(?text), "EN" )
+    ?review bsbm:reviewDate ?reviewDate .
+    ?review rev:reviewer ?reviewer .
+    ?reviewer foaf:name ?reviewerName .
+    OPTIONAL { ?review bsbm:rating1 ?rating1 . }
+    OPTIONAL { ?review bsbm:rating2 ?rating2 . }
+    OPTIONAL { ?review bsbm:rating3 ?rating3 . }
+    OPTIONAL { ?review bsbm:rating4 ?rating4 . }
+} ORDER BY DESC(?reviewDate) LIMIT 20""",
+    """DESCRIBE ?x WHERE { %(review)s rev:reviewer ?x }""",
+    """SELECT DISTINCT ?offer ?price WHERE {
+    ?offer bsbm:product %(product)s .
+    ?offer bsbm:vendor ?vendor .
+    ?offer dc:publisher ?vendor .
+    ?vendor bsbm:country <http://downlode.org/rdf/iso-3166/countries#US> .
+    ?offer bsbm:deliveryDays ?deliveryDays .
+    FILTER (?deliveryDays <= %(days)d)
+    ?offer bsbm:price ?price .
+    ?offer bsbm:validTo ?date .
+    FILTER (?date > "2008-06-20T00:00:00"^^xsd:dateTime )
+} ORDER BY xsd:double(str(?price)) LIMIT 10""",
+    """SELECT ?property ?hasValue ?isValueOf WHERE {
+    { %(offer)s ?property ?hasValue }
+    UNION
+    { ?isValueOf ?property %(offer)s }
+}""",
+    """CONSTRUCT {
+    %(offer)s bsbm-export:product ?productURI .
+    %(offer)s bsbm-export:productlabel ?productlabel .
+    %(offer)s bsbm-export:vendor ?vendorname .
+    %(offer)s bsbm-export:price ?price .
+} WHERE {
+    %(offer)s bsbm:product ?productURI .
+    ?productURI rdfs:label ?productlabel .
+    %(offer)s bsbm:vendor ?vendorURI .
+    ?vendorURI rdfs:label ?vendorname .
+    %(offer)s bsbm:price ?price .
+}""",
+]
+
+
+def bsbm_queries(n_queries, seed=0):
+    """
+    n_queries queries of the shapes of the BSBM explore use case, with random parameters
+    """
+    import random
+
+    rng = random.Random(seed)
+    instances = '<http://www4.wiwiss.fu-berlin.de/bizer/bsbm/v01/instances/'
+    prefixes = _BSBM_PREFIXES + 'PREFIX bsbm-export: <http://www4.wiwiss.fu-berlin.de/bizer/bsbm/v01/vocabulary/export/>\n'
+    queries = []
+    for i in range(n_queries):
+        producer = rng.randrange(1, 100)
+        parameters = {'type': rng.randrange(1, 500), 'f1': rng.randrange(1, 5000), 'f2': rng.randrange(1, 5000),
+                      'x': rng.randrange(1, 500), 'y': rng.randrange(1, 500), 'days': rng.randrange(1, 7),
+                      'product': '%sdataFromProducer%d/Product%d>' % (instances, producer, rng.randrange(1, 10000)),
+                      'offer': '%sdataFromVendor%d/Offer%d>' % (instances, producer, rng.randrange(1, 10000)),
+                      'review': '%sdataFromRatingSite%d/Review%d>' % (instances, producer, rng.randrange(1, 10000))}
+        queries.append(prefixes + _BSBM[i % len(_BSBM)] % parameters)
+    return queries
+
+
+_WATDIV_PREFIXES = """PREFIX wsdbm: <http://db.uwaterloo.ca/~galuc/wsdbm/>
+PREFIX sorg: <http://schema.org/>
+PREFIX gr: <http://purl.org/goodrelations/>
+PREFIX rev: <http://purl.org/stuff/rev#>
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+PREFIX dc: <http://purl.org/dc/terms/>
+PREFIX gn: <http://www.geonames.org/ontology#>
+PREFIX og: <http://ogp.me/ns#>
+PREFIX mo: <http://purl.org/ontology/mo/>
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+"""
+
+# WatDiv basic testing templates: linear (L), star (S), snowflake (F) and complex (C) shapes
+_WATDIV = [
+    "SELECT ?v0 ?v2 ?v3 WHERE { ?v0 wsdbm:subscribes wsdbm:Website%(a)d . ?v2 sorg:caption ?v3 . "
+    "?v0 wsdbm:likes ?v2 . }",
+    "SELECT ?v1 ?v2 WHERE { wsdbm:City%(a)d gn:parentCountry ?v1 . ?v2 wsdbm:likes wsdbm:Product%(b)d . "
+    "?v2 sorg:nationality ?v1 . }",
+    "SELECT ?v0 ?v1 ?v3 WHERE { ?v0 dc:Location ?v1 . ?v0 wsdbm:subscribes wsdbm:Website%(a)d . "
+    "?v0 sorg:nationality wsdbm:Country%(b)d . ?v0 wsdbm:follows ?v3 . }",
+    "SELECT ?v0 ?v1 ?v3 ?v4 ?v5 ?v6 ?v7 ?v8 ?v9 WHERE { ?v0 gr:includes ?v1 . wsdbm:Retailer%(a)d gr:offers ?v0 . "
+    "?v0 gr:price ?v3 . ?v0 gr:serialNumber ?v4 . ?v0 gr:validFrom ?v5 . ?v0 gr:validThrough ?v6 . "
+    "?v0 sorg:eligibleQuantity ?v7 . ?v0 sorg:eligibleRegion ?v8 . ?v0 sorg:priceValidUntil ?v9 . }",
+    "SELECT ?v0 ?v2 ?v3 ?v4 WHERE { ?v0 rdf:type wsdbm:ProductCategory%(a)d . ?v0 sorg:caption ?v2 . "
+    "?v0 wsdbm:hasGenre ?v3 . ?v0 sorg:publisher ?v4 . }",
+    "SELECT ?v0 ?v1 ?v2 WHERE { ?v0 sorg:nationality wsdbm:Country%(a)d . ?v0 wsdbm:gender ?v1 . "
+    "?v0 rdf:type wsdbm:Role%(b)d . ?v0 foaf:givenName ?v2 . }",
+    "SELECT ?v0 ?v2 ?v3 ?v4 ?v5 WHERE { ?v0 og:tag wsdbm:Topic%(a)d . ?v0 rdf:type ?v2 . ?v3 sorg:trailer ?v4 . "
+    "?v3 sorg:keywords ?v5 . ?v3 wsdbm:hasGenre ?v0 . ?v3 rdf:type wsdbm:ProductCategory%(b)d . }",
+    "SELECT ?v0 ?v1 ?v2 ?v4 ?v5 ?v6 ?v7 WHERE { ?v0 foaf:homepage ?v1 . ?v0 og:title ?v2 . ?v0 rdf:type ?v3 . "
+    "?v0 sorg:caption ?v4 . ?v0 sorg:description ?v5 . ?v1 sorg:url ?v6 . ?v1 wsdbm:hits ?v7 . "
+    "?v0 wsdbm:hasGenre wsdbm:SubGenre%(a)d . }",
+    "SELECT ?v0 ?v1 ?v2 ?v4 ?v5 ?v6 WHERE { ?v0 mo:conductor ?v1 . ?v0 rdf:type ?v2 . ?v0 rev:hasReview ?v4 . "
+    "?v4 rev:title ?v5 . ?v4 rev:reviewer ?v6 . ?v6 sorg:nationality wsdbm:Country%(a)d . }",
+    "SELECT ?v0 ?v4 ?v6 ?v7 WHERE { ?v0 sorg:caption ?v1 . ?v0 sorg:text ?v2 . ?v0 sorg:contentRating ?v3 . "
+    "?v0 rev:hasReview ?v4 . ?v4 rev:title ?v5 . ?v4 rev:reviewer ?v6 . ?v7 sorg:actor ?v6 . "
+    "?v7 sorg:language ?v8 . }",
+    "SELECT ?v0 ?v1 ?v2 ?v3 ?v4 ?v5 ?v6 WHERE { ?v0 wsdbm:likes ?v1 . ?v0 wsdbm:friendOf ?v2 . "
+    "?v0 dc:Location ?v3 . ?v0 foaf:age ?v4 . ?v0 wsdbm:gender ?v5 . ?v0 foaf:givenName ?v6 . }",
+]
+
+
+def watdiv_queries(n_queries, seed=0):
+    """
+    n_queries queries of the WatDiv basic testing shapes (linear, star, snowflake, complex),
+    with random constants
+    """
+    import random
+
+    rng = random.Random(seed)
+    return [_WATDIV_PREFIXES + _WATDIV[i % len(_WATDIV)] % {'a': rng.randrange(1000), 'b': rng.randrange(100)}
+            for i in range(n_queries)]
+
+
+_FEDBENCH_ENTITIES = ['Barack_Obama', 'Angela_Merkel', 'Berlin', 'Paris', 'Tim_Berners-Lee', 'Semantic_Web',
+                      'Leipzig', 'Ethiopia', 'Aspirin', 'Caffeine']
+
+# FedBench cross-domain and life science shapes: owl:sameAs links between sources, and the
+# same joins written with SERVICE clauses, as a federated engine sends them
+_FEDBENCH = [
+    """SELECT ?predicate ?object WHERE {
+    { <http://dbpedia.org/resource/%(entity)s> ?predicate ?object }
+    UNION
+    { ?subject <http://www.w3.org/2002/07/owl#sameAs> <http://dbpedia.org/resource/%(entity)s> .
+      ?subject ?predicate ?object }
+}""",
+    """SELECT ?party ?page WHERE {
+    <http://dbpedia.org/resource/%(entity)s> <http://dbpedia.org/ontology/party> ?party .
+    ?x <http://data.nytimes.com/elements/topicPage> ?page .
+    ?x <http://www.w3.org/2002/07/owl#sameAs> <http://dbpedia.org/resource/%(entity)s> .
+}""",
+    """SELECT ?film ?director ?genre WHERE {
+    ?film <http://dbpedia.org/ontology/director> ?director .
+    ?director <http://dbpedia.org/ontology/nationality> <http://dbpedia.org/resource/%(entity)s> .
+    ?x <http://www.w3.org/2002/07/owl#sameAs> ?film .
+    ?x <http://data.linkedmdb.org/resource/movie/genre> ?genre .
+}""",
+    """PREFIX drugbank: <http://www4.wiwiss.fu-berlin.de/drugbank/resource/drugbank/>
+PREFIX kegg: <http://bio2rdf.org/ns/kegg#>
+SELECT ?drug ?title ?chebi WHERE {
+    ?drug drugbank:drugCategory <http://www4.wiwiss.fu-berlin.de/drugbank/resource/drugcategories/%(category)s> .
+    ?drug drugbank:casRegistryNumber ?id .
+    ?keggDrug <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> kegg:Drug .
+    ?keggDrug <http://bio2rdf.org/ns/bio2rdf#xRef> ?id .
+    ?keggDrug <http://purl.org/dc/elements/1.1/title> ?title .
+    OPTIONAL { ?drug drugbank:keggCompoundId ?chebi }
+}""",
+    """PREFIX owl: <http://www.w3.org/2002/07/owl#>
+SELECT ?s ?label ?page WHERE {
+    SERVICE <http://dbpedia.org/sparql> {
+        ?s <http://www.w3.org/2000/01/rdf-schema#label> ?label .
+        ?s <http://dbpedia.org/ontology/birthPlace> <http://dbpedia.org/resource/%(entity)s> .
+        FILTER(LANG(?label) = 'en')
+    }
+    SERVICE <http://api.nytimes.com/sparql> {
+        ?x owl:sameAs ?s .
+        ?x <http://data.nytimes.com/elements/topicPage> ?page .
+    }
+} LIMIT %(limit)d""",
+]
+
+
+def fedbench_queries(n_queries, seed=0):
+    """
+    n_queries queries of FedBench-like shapes (joins across sources through owl:sameAs,
+    SERVICE clauses), on random entities
+    """
+    import random
+
+    rng = random.Random(seed)
+    return [_FEDBENCH[i % len(_FEDBENCH)] % {'entity': rng.choice(_FEDBENCH_ENTITIES),
+                                             'category': rng.choice(['micronutrient', 'antibiotics', 'analgesics']),
+                                             'limit': rng.choice((10, 100, 1000))}
+            for i in range(n_queries)]
+
+
+def path_query(length, seed=0):
+    """
+    A query of property paths: sequences of length steps, some with a modifier (* or +) or
+    alternatives, as generated by path exploration tools
+    """
+    import random
+
+    rng = random.Random(seed)
+    steps = []
+    for i in range(length):
+        step = 'ex:p%d' % rng.randrange(50)
+        kind = rng.random()
+        if kind < 0.2:
+            step += rng.choice('*+')
+        elif kind < 0.3:
+            step = '(%s|ex:q%d)' % (step, rng.randrange(50))
+        steps.append(step)
+    patterns = ['?s ex:p%d/ex:p%d* ?o%d' % (i, i + 1, i) for i in range(length // 4)]
+    patterns.append('?s %s ?end' % '/'.join(steps))
+    return 'PREFIX ex: <http://example.org/>\nSELECT * WHERE {\n  %s\n}' % ' .\n  '.join(patterns)
+
+
+def filter_query(n_filters, seed=0):
+    """
+    A query with a few triple patterns and n_filters FILTERs: comparisons, arithmetic,
+    regular expressions, IN lists, bound and language tests
+    """
+    import random
+
+    rng = random.Random(seed)
+    lines = ['PREFIX ex: <http://example.org/>',
+             'SELECT ?s ?v WHERE {',
+             '  ?s ex:value ?v ; ex:label ?l ; ex:date ?d .',
+             '  OPTIONAL { ?s ex:comment ?c }']
+    for i in range(n_filters):
+        kind = i % 5
+        if kind == 0:
+            lines.append('  FILTER(?v > %d && ?v < %d)' % (rng.randrange(100), rng.randrange(100, 1000)))
+        elif kind == 1:
+            lines.append('  FILTER(?v * %d + %d.5 >= (?v - %d) / 2)' % (rng.randrange(1, 9), rng.randrange(100),
+                                                                      rng.randrange(100)))
+        elif kind == 2:
+            lines.append('  FILTER(regex(str(?l), "^%s", "i"))' % rng.choice(['abc', 'foo', 'bar', 'x.*y']))
+        elif kind == 3:
+            lines.append('  FILTER(?v IN (%s))' % ', '.join(str(rng.randrange(1000)) for _ in range(10)))
+        else:
+            lines.append('  FILTER(!bound(?c) && LANG(?l) = "%s")' % rng.choice(['en', 'de', 'fr']))
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def generated_queries(n_queries, seed=0):
+    """
+    n_queries synthetic queries (awudima.sparql.generator) of mixed shapes: joins, nested
+    OPTIONAL/UNION groups, VALUES blocks, property paths, wide projections and FILTERs
+    """
+    from awudima.sparql.generator import QueryGenerator
+
+    generator = QueryGenerator(seed)
+    shapes = [dict(patterns=20, width=10, filters=4),
+              dict(patterns=5, depth=10, group_patterns=2),
+              dict(patterns=10, values=100, values_width=3),
+              dict(patterns=5, paths=5, path_length=10),
+              dict(patterns=100, width=100, distinct=True, limit=100)]
+    return [generator.text(**shapes[i % len(shapes)]) for i in range(n_queries)]
+
+
+# pieces of queries that are easy to get wrong: numbers, strings, IRIs against <, ? alone, ...
+FRAGMENTS = ['1e5', '.5e3', '+1.2e-3', '-.5', '1.', '12', '-3', '+4', '1.5', '"""a"""', "'''b'''", '"a\\"b"',
+             "'it''s'", '"x\ny"', '<http://x/a#b>', '<=', '<', '>', '>=', '?x', '? ', '?', '$y', '@en-US',
+             '( )', '()', '(', ')', '[ ]', '[]', '[', ']', '!=', '!', '&&', '&', '||', '|', '#c\n', 'true',
+             'false', '_:b1', 'rdf:type', ':', 'a', 'isIRI', 'select', 'WHERE', '^^', '^', '{', '}', '.', ';',
+             ',', '*', '/', '=', '+', '-', '\r', '\xa0', 'é', 'x.y', 'x-', 'ab.', '%', '~']
+SEPARATORS = ['', '', ' ', '\n', '\t']
+
+
+def token_soups(n_texts, seed=0):
+    """
+    n_texts random texts made of FRAGMENTS, for comparing the tokenizer with the PLY lexer
+    """
+    import random
+
+    rng = random.Random(seed)
+    return [''.join(rng.choice(FRAGMENTS) + rng.choice(SEPARATORS) for _ in range(rng.randint(1, 30)))
+            for _ in range(n_texts)]
+
+
+def tokens(lexer, text):
+    """
+    All the tokens of text, then ('ERROR', lexpos) if the lexer fails
+    """
+    import contextlib
+    import io
+    from awudima.sparql import parser
+
+    out = []
+    lexer.input(text)
+    lexer.lineno = 1
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            for tok in iter(lexer.token, None):
+                out.append((tok.type, tok.value, tok.lineno, tok.lexpos))
+        except (TypeError, parser.lex.LexError):
+            out.append(('ERROR', lexer.lexpos))
+
+    return out
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Immutable, hashable variants of the query tree nodes.
+
+freeze(node) returns a copy of a subtree made of Frozen* nodes (subclasses of the node
+classes, so they print, traverse and answer get_variables() the same) and FrozenLists.
+Their hash is structural, computed bottom-up once when the node is frozen, and they
+compare by structure, so triple patterns, BGPs, filters and expressions can be used as
+set members and dict keys:
+
+    seen = set()
+    for triple in bgp.triples:
+        seen.add(freeze(triple, memo))
+
+Frozen nodes are hash-consed through memo: equal subtrees frozen with the same memo are
+the same object, which makes comparing them an identity check. The memo is keyed on
+structure only, so it can be kept while the mutable tree changes: a changed node is frozen
+anew. Freezing walks the tree with an explicit stack, at any depth. thaw(node) gives back a
+mutable tree.
+
+Queries are not frozen, nor the subtrees that hold a sub-select (a SelectQuery in a group):
+freeze() raises TypeError for them before freezing anything.
+"""
+
+__author__ = 'Kemele M. Endris'
+
+from awudima.sparql import RDFTerm, TriplePattern, PathTerm, PropertyPath, Expression, Filter, Bind, BGP, GGP, \
+    OptionalGP, UnionGP, MinusGP, GraphGP, ServiceGP, ValuesClause, Query, SharedRDFTerm
+from awudima.sparql.visitor import walk
+
+_SCALARS = frozenset([str, int, float, bool, type(None)])
+
+
+class FrozenList(list):
+    """
+    A list that cannot be changed, with a cached hash. It is still a list, for the code that
+    checks isinstance(x, list).
+    """
+    __slots__ = ('_hash',)
+
+    def __init__(self, items=()):
+        list.__init__(self, items)
+        self._hash = hash(tuple(self))
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, FrozenList) and self._hash != other._hash:
+            return False
+        return list.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('FrozenList cannot be changed')
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+class _Frozen(object):
+    """
+    Base of the frozen node classes: _fields are the attributes of the node class, set once
+    by _make; the hash of the node is the hash of (class, field values). _variables caches the
+    variable sets of the node (see awudima.sparql.variables).
+    """
+    __slots__ = ()
+    _fields = ()
+
+    @classmethod
+    def _make(cls, values, hashed):
+        node = cls.__new__(cls)
+        for name, value in zip(cls._fields, values):
+            object.__setattr__(node, name, value)
+        object.__setattr__(node, '_hash', hashed)
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(self) is not type(other) or self._hash != other._hash:
+            return False
+        return all(getattr(self, name) == getattr(other, name) for name in self._fields)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __reduce__(self):
+        return _rebuild, (type(self), tuple(getattr(self, name) for name in self._fields))
+
+    def expand_syntax_forms(self, prefixes):
+        raise AttributeError('%s is immutable, thaw() it first' % type(self).__name__)
+
+
+def _rebuild(cls, values):
+    return cls._make(values, hash((cls,) + tuple(values)))
+
+
+def _frozen_class(cls):
+    attributes = {'__slots__': ('_hash', '_variables'), '_fields': cls.__slots__, '__module__': __name__}
+    return type('Frozen' + cls.__name__, (_Frozen, cls), attributes)
+
+
+FrozenRDFTerm = _frozen_class(RDFTerm)
+FrozenTriplePattern = _frozen_class(TriplePattern)
+FrozenPathTerm = _frozen_class(PathTerm)
+FrozenPropertyPath = _frozen_class(PropertyPath)
+FrozenExpression = _frozen_class(Expression)
+FrozenFilter = _frozen_class(Filter)
+FrozenBind = _frozen_class(Bind)
+FrozenBGP = _frozen_class(BGP)
+FrozenGGP = _frozen_class(GGP)
+FrozenOptionalGP = _frozen_class(OptionalGP)
+FrozenUnionGP = _frozen_class(UnionGP)
+FrozenMinusGP = _frozen_class(MinusGP)
+FrozenGraphGP = _frozen_class(GraphGP)
+FrozenServiceGP = _frozen_class(ServiceGP)
+
+
+class FrozenValuesClause(_Frozen, ValuesClause):
+    """
+    A ValuesClause over its own copy of the rows; it hashes and compares by variables and
+    serialized rows.
+    """
+    __slots__ = ('_hash', '_variables', '_rows')
+    _fields = ('variables', '_rows')
+
+    @classmethod
+    def _make(cls, values, hashed, table):
+        # the variables are kept in the table (values[0] are its variables)
+        node = cls.__new__(cls)
+        object.__setattr__(node, 'table', table)
+        object.__setattr__(node, '_rows', values[1])
+        object.__setattr__(node, '_hash', hashed)
+        return node
+
+    def append(self, row):
+        raise AttributeError('FrozenValuesClause is immutable')
+
+    def __reduce__(self):
+        return _refreeze_values_clause, (self.variables, list(self.table))
+
+
+def _refreeze_values_clause(variables, rows):
+    return freeze(ValuesClause(variables, rows))
+
+
+_FROZEN = dict((cls.__mro__[2], cls) for cls in (
+    FrozenRDFTerm, FrozenTriplePattern, FrozenPathTerm, FrozenPropertyPath, FrozenExpression, FrozenFilter,
+    FrozenBind, FrozenBGP, FrozenGGP, FrozenOptionalGP, FrozenUnionGP, FrozenMinusGP, FrozenGraphGP,
+    FrozenServiceGP))
+# (the terms of a query parsed with intern_terms)
+_FROZEN[SharedRDFTerm] = FrozenRDFTerm
+
+
+# nodes that cannot hold a sub-select
+_LEAVES = (_Frozen, FrozenList, RDFTerm, TriplePattern, PathTerm, PropertyPath, str)
+
+
+def freeze(node, memo=None):
+    """
+    Immutable, hashable copy of the subtree rooted at node (an RDFTerm, a triple pattern,
+    an expression, a graph pattern, ... or a list of them). Equal subtrees frozen with the
+    same memo (a dict) are the same object. Raises TypeError for a query, or a subtree with a
+    sub-select in it: queries cannot be frozen.
+    """
+    if memo is None:
+        memo = {}
+    if isinstance(node, Query):
+        raise TypeError('Cannot freeze %s: queries cannot be frozen, only their parts' % type(node).__name__)
+    # (a sub-select may be in any group, also in the EXISTS of a filter)
+    if not isinstance(node, _LEAVES) and any(isinstance(child, Query) for child in walk(node)):
+        raise TypeError('Cannot freeze %s: it has a sub-select, and queries cannot be frozen' % type(node).__name__)
+    return _freeze(node, memo)
+
+
+def _freeze(root, memo):
+    """
+    Frozen copy of root, children before their parents, with an explicit stack (no
+    recursion, at any depth). memo maps the structure of a frozen node (its class and its
+    frozen children) to it, and nothing else: a mutable node changed since it was frozen
+    gets a new copy, so the memo may be kept across changes.
+    """
+    frozen_root = []
+    # [node, its frozen children so far, its children not yet frozen, where its copy goes]
+    stack = [[None, frozen_root, iter([root]), None]]
+    while stack:
+        frame = stack[-1]
+        values = frame[1]
+        for child in frame[2]:
+            if type(child) in _SCALARS or isinstance(child, (_Frozen, FrozenList)):
+                values.append(child)
+            elif isinstance(child, dict):
+                # the prefix of an expanded RDFTerm
+                values.append(tuple(sorted(child.items())))
+            else:
+                stack.append([child, [], iter(_children(child)), values])
+                break
+        else:
+            stack.pop()
+            if frame[0] is not None:
+                frame[3].append(_make(frame[0], frame[1], memo))
+
+    return frozen_root[0]
+
+
+def _children(node):
+    if isinstance(node, (list, tuple)):
+        return node
+    if isinstance(node, ValuesClause):
+        return (node.variables,)
+    cls = _FROZEN.get(type(node))
+    if cls is None:
+        raise TypeError('Cannot freeze %s' % type(node).__name__)
+    return map(node.__getattribute__, cls._fields)
+
+
+def _make(node, values, memo):
+    # the frozen copy of node, from the frozen copies of its children
+    if isinstance(node, (list, tuple)):
+        key = (FrozenList,) + tuple(values)
+        frozen = memo.get(key)
+        if frozen is None:
+            frozen = memo[key] = FrozenList(values)
+    elif isinstance(node, ValuesClause):
+        key = (FrozenValuesClause, values[0], tuple(node.table.rows_str()))
+        frozen = memo.get(key)
+        if frozen is None:
+            table = node.table[:]
+            table.variables = values[0]
+            frozen = memo[key] = FrozenValuesClause._make(key[1:], hash(key), table)
+    else:
+        cls = _FROZEN[type(node)]
+        key = (cls,) + tuple(values)
+        frozen = memo.get(key)
+        if frozen is None:
+            frozen = memo[key] = cls._make(key[1:], hash(key))
+
+    return frozen
+
+
+def thaw(node, memo=None):
+    """
+    Mutable copy of a frozen subtree; nodes shared in the frozen tree stay shared
+    """
+    if memo is None:
+        memo = {}
+    thawed_root = []
+    # as in _freeze: [node, its thawed children so far, its children not yet thawed, where
+    # its copy goes]
+    stack = [[None, thawed_root, iter([node]), None]]
+    while stack:
+        frame = stack[-1]
+        values = frame[1]
+        for child in frame[2]:
+            if type(child) in _SCALARS:
+                values.append(child)
+            elif id(child) in memo:
+                values.append(memo[id(child)])
+            elif isinstance(child, FrozenValuesClause):
+                stack.append([child, [], iter((child.variables,)), values])
+                break
+            elif isinstance(child, list):
+                stack.append([child, [], iter(child), values])
+                break
+            elif isinstance(child, _Frozen):
+                stack.append([child, [], map(child.__getattribute__, child._fields), values])
+                break
+            elif isinstance(child, tuple):
+                # see _freeze, dict prefix of an expanded RDFTerm
+                values.append(dict(child))
+            else:
+                values.append(child)
+        else:
+            stack.pop()
+            frozen = frame[0]
+            if frozen is None:
+                continue
+            if isinstance(frozen, FrozenValuesClause):
+                thawed = ValuesClause(frame[1][0], frozen.table[:])
+            elif isinstance(frozen, list):
+                thawed = frame[1]
+            else:
+                cls = type(frozen).__mro__[2]
+                thawed = cls.__new__(cls)
+                for name, value in zip(frozen._fields, frame[1]):
+                    setattr(thawed, name, value)
+            memo[id(frozen)] = thawed
+            frame[3].append(thawed)
+
+    return thawed_root[0]
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic SELECT queries of a controlled size, for stress tests and benchmarks of the parser
+and of query planners:
+
+    generator = QueryGenerator(seed=1)
+    query = generator.query(patterns=200, depth=20, values=1000, paths=2, path_length=30,
+                            width=50, filters=10)
+    text = generator.text(patterns=50, filters=5)
+    parsed, same = round_trip(query)     # parser.sparql(str(query)), and whether it is the same query
+
+The queries are trees of the classes of awudima.sparql (SelectQuery, GGP, BGP, TriplePattern,
+...), built the way the parser builds them, so that str(query) parses back to the same
+tree. Texts are written with awudima.sparql.serializer (the text of str(query), at any
+depth). The same seed and shape give the same queries. The shape of a query:
+
+    patterns        triple patterns of the top-level group, joined on their variables
+    depth           groups nested in it, each in the one before: OPTIONAL, UNION (of the
+                    nested group and a group of one pattern) or, by default, either
+    group_patterns  triple patterns of each nested group
+    values          rows of the VALUES block, over values_width variables (some cells UNDEF)
+    paths           triple patterns with a property path: a sequence of path_length steps,
+                    some of them with * or +
+    width           variables projected (at most all of them), None for SELECT *
+    filters         FILTERs of the top-level group: comparisons, IN lists, regex, bound
+    distinct, limit DISTINCT, LIMIT
+
+    python -m awudima.sparql.generator --count 1000 --patterns 50 --depth 5 > queries.log
+"""
+
+__author__ = 'Kemele M. Endris'
+
+import random
+
+from awudima.sparql import SelectQuery, GGP, ValuesClause, OptionalGP, UnionGP, BGP, Filter, TriplePattern, \
+    PropertyPath, PathTerm, RDFTerm, Expression
+from awudima.sparql.serializer import serialize
+from awudima.sparql.visitor import walk
+
+PREFIXES = {'ex': '<http://example.org/>'}
+NESTING = ('optional', 'union', 'mixed')
+LANGUAGES = ('en', 'de', 'fr-BE')
+
+
+def _iri(name):
+    return RDFTerm('ex:' + name, is_const=True, is_iri=True, prefix='ex')
+
+
+def _number(n):
+    return RDFTerm(str(n), is_const=True)
+
+
+def _string(text, lang_tag=None):
+    return RDFTerm('"' + text + '"', is_const=True, lang_tag=lang_tag)
+
+
+class QueryGenerator(object):
+    """
+    Seeded generator of SelectQuery trees of a given shape. See the module docstring.
+    predicates and constants are the sizes of the vocabularies the IRIs are taken from.
+    """
+    def __init__(self, seed=0, predicates=50, constants=1000):
+        self.random = random.Random(seed)
+        self.predicates = predicates
+        self.constants = constants
+        self._variables = []
+
+    def query(self, patterns=10, depth=0, nesting='mixed', group_patterns=1, values=0, values_width=2, paths=0,
+              path_length=5, width=None, filters=0, distinct=False, limit=None):
+        """
+        A SelectQuery of the given shape
+        """
+        if nesting not in NESTING:
+            raise ValueError('nesting must be one of %s, not %r' % (', '.join(NESTING), nesting))
+
+        self._variables = [RDFTerm('?v0', is_const=False)]
+        triples = [self._triple() for _ in range(patterns)]
+        triples.extend(TriplePattern(self._joined(), self._path(path_length), self._object())
+                       for _ in range(paths))
+        top = GGP([BGP(triples, [self._filter(i) for i in range(filters)])])
+
+        # each nested group goes in the list of groups of the one before, no recursion
+        ggps = top.ggps
+        for _ in range(depth):
+            kind = nesting if nesting != 'mixed' else self.random.choice(('optional', 'union'))
+            inner = GGP([BGP([self._triple() for _ in range(group_patterns)], [])])
+            if kind == 'optional':
+                ggps.append(OptionalGP(inner))
+            else:
+                other = GGP([BGP([self._triple()], [])])
+                ggps.append(UnionGP([inner, other] if self.random.random() < 0.5 else [other, inner]))
+            ggps = inner.ggps
+
+        variables = self._variables
+        projections = ['*'] if width is None else variables[:width]
+        modifiers = {'GROUP BY': [], 'HAVING': [], 'ORDER BY': [], 'LIMIT': str(limit) if limit else -1,
+                     'OFFSET': -1}
+        return SelectQuery(dict(PREFIXES), projections, top, distinct=distinct, solution_modifiers=modifiers,
+                           dataset_clauses=[], values_clause=self._values(values, values_width))
+
+    def text(self, **shape):
+        """
+        The text of a query of the given shape (the arguments of query())
+        """
+        return serialize(self.query(**shape))
+
+    def queries(self, n, **shape):
+        """
+        n queries of the same shape
+        """
+        return [self.query(**shape) for _ in range(n)]
+
+    def _joined(self):
+        """
+        A variable of the query so far
+        """
+        return self.random.choice(self._variables)
+
+    def _object(self):
+        if self.random.random() < 0.8:
+            variable = RDFTerm('?v%d' % len(self._variables), is_const=False)
+            self._variables.append(variable)
+            return variable
+        return self._constant()
+
+    def _constant(self):
+        draw = self.random.random()
+        if draw < 0.45:
+            return _iri('e%d' % self.random.randrange(self.constants))
+        if draw < 0.9:
+            return _number(self.random.randrange(self.constants))
+        return _string('e%d' % self.random.randrange(self.constants), self.random.choice(LANGUAGES))
+
+    def _predicate(self):
+        return _iri('p%d' % self.random.randrange(self.predicates))
+
+    def _triple(self):
+        return TriplePattern(self._joined(), self._predicate(), self._object())
+
+    def _path(self, length):
+        """
+        A sequence path of length steps, nested to the right as the parser nests it
+        """
+        steps = []
+        for _ in range(max(length, 1)):
+            step = self._predicate()
+            if self.random.random() < 0.3:
+                step = PathTerm(step, path_mode=self.random.choice('*+'))
+            steps.append(step)
+        path = steps.pop()
+        while steps:
+            path = PropertyPath(steps.pop(), '/', path)
+        return path
+
+    def _filter(self, i):
+        variable = self._joined()
+        kind = i % 6
+        if kind == 0:
+            expression = Expression(variable, '>', _number(self.random.randrange(self.constants)))
+        elif kind == 1:
+            expression = Expression(variable, '!=', self._constant())
+        elif kind == 2:
+            expression = Expression(Expression(variable, '>=', _number(self.random.randrange(self.constants))), '&&',
+                                    Expression(variable, '<', _number(self.random.randrange(self.constants))))
+        elif kind == 3:
+            expression = Expression(variable, 'IN', [self._constant() for _ in range(self.random.randrange(1, 10))])
+        elif kind == 4:
+            expression = Expression(Expression(variable, 'str'), 'regex',
+                                    _string('^e%d' % self.random.randrange(100)), _string('i'))
+        else:
+            expression = Expression(Expression(variable, 'bound'), '!')
+        return Filter(expression)
+
+    def _values(self, rows, width):
+        if not rows:
+            return ValuesClause([], [])
+
+        variables = self._variables[:width]
+        clause = ValuesClause(variables, [])
+        for _ in range(rows):
+            clause.append([self._constant() if self.random.random() < 0.95 else None for _ in variables])
+        return clause
+
+
+def round_trip(query, sparql_parser=None):
+    """
+    (the query parsed from the text of the query by sparql_parser, or by parser.sparql, whether
+    it is the same query: the same text and the same classes of nodes in the same order)
+    """
+    from awudima.sparql import parser
+
+    text = serialize(query)
+    parsed = sparql_parser.parse(text) if sparql_parser is not None else parser.sparql(text)
+    same = serialize(parsed) == text \
+        and [type(node) for node in walk(parsed)] == [type(node) for node in walk(query)]
+    return parsed, same
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    argparser = argparse.ArgumentParser(prog='python -m awudima.sparql.generator',
+                                        description='Prints synthetic queries of a shape, one per line')
+    argparser.add_argument('--count', type=int, default=1)
+    argparser.add_argument('--seed', type=int, default=0)
+    argparser.add_argument('--patterns', type=int, default=10)
+    argparser.add_argument('--depth', type=int, default=0)
+    argparser.add_argument('--nesting', choices=NESTING, default='mixed')
+    argparser.add_argument('--group-patterns', type=int, default=1)
+    argparser.add_argument('--values', type=int, default=0)
+    argparser.add_argument('--values-width', type=int, default=2)
+    argparser.add_argument('--paths', type=int, default=0)
+    argparser.add_argument('--path-length', type=int, default=5)
+    argparser.add_argument('--width', type=int, default=None, help='variables projected (default: SELECT *)')
+    argparser.add_argument('--filters', type=int, default=0)
+    argparser.add_argument('--distinct', action='store_true')
+    argparser.add_argument('--limit', type=int, default=None)
+    args = argparser.parse_args()
+
+    generator = QueryGenerator(args.seed)
+    for _ in range(args.count):
+        query = generator.query(patterns=args.patterns, depth=args.depth, nesting=args.nesting,
+                                group_patterns=args.group_patterns, values=args.values,
+                                values_width=args.values_width, paths=args.paths, path_length=args.path_length,
+                                width=args.width, filters=args.filters, distinct=args.distinct, limit=args.limit)
+        sys.stdout.write(serialize(query, pretty=False) + '\n')
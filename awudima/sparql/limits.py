@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Bounds on the work of parsing a query, for queries from untrusted sources:
+
+    limits = ParseLimits(max_length=100000, max_tokens=20000, max_depth=64, max_seconds=0.5)
+    sparql_parser = SparqlParser(limits=limits)
+    try:
+        query = sparql_parser.parse(text)
+    except ParseLimitExceeded as e:
+        reject(e.limit, e)      # 'max_length', 'max_tokens', 'max_depth' or 'max_seconds'
+    print(limits.stats())       # parses, and how many of them each limit stopped
+
+The length is checked before anything is done with the text; the other limits are checked
+on each token the parser takes from the lexer, so a parse stops as soon as one is passed,
+before the rest of the text is read:
+
+    max_tokens  tokens of the query; every value of a VALUES block read by the lexer in one
+                go (SparqlParser(scan_values=True)) counts as a token
+    max_depth   brackets ({, ( and [) open at once: nested groups, expressions, collections
+    max_seconds time spent parsing (checked every few hundred tokens)
+
+A limit of None is not checked. The same ParseLimits can be shared by parsers and threads;
+copies of it (e.g., pickled to the workers of awudima.sparql.bulk) count on their own.
+"""
+
+__author__ = 'Kemele M. Endris'
+
+import threading
+import time
+
+from awudima.sparql.parser import SparqlSyntaxError, _shown
+
+LIMITS = ('max_length', 'max_tokens', 'max_depth', 'max_seconds')
+
+_OPENERS = frozenset(['LKEY', 'LPAR', 'LBRC'])
+_CLOSERS = frozenset(['RKEY', 'RPAR', 'RBRC'])
+# The clock is looked at every _CLOCK_MASK + 1 tokens (a power of two, minus one)
+_CLOCK_MASK = 255
+
+
+class ParseLimitExceeded(SparqlSyntaxError):
+    """
+    A query that passes a limit of ParseLimits: limit is the name of the limit ('max_length',
+    'max_tokens', 'max_depth' or 'max_seconds') and maximum its value. offset (and so line
+    and column) is where the parse stopped. A SparqlSyntaxError of category LIMIT.
+    """
+    LIMIT = 'limit'
+
+    def __init__(self, message, limit, maximum, offset=None, token=None, token_type=None):
+        super(ParseLimitExceeded, self).__init__(message, self.LIMIT, offset, token, token_type)
+        self.limit = limit
+        self.maximum = maximum
+
+
+class ParseLimits(object):
+    """
+    Limits on the length of a query text, its tokens, the nesting of its brackets and the
+    time to parse it, with the number of parses each limit stopped. See the module docstring.
+    """
+    def __init__(self, max_length=None, max_tokens=None, max_depth=None, max_seconds=None):
+        self.max_length = max_length
+        self.max_tokens = max_tokens
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+        self.parses = 0
+        self.exceeded = dict.fromkeys(LIMITS, 0)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in LIMITS}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _exceeded(self, limit, message, offset=None, tok=None):
+        with self._lock:
+            self.exceeded[limit] += 1
+        if tok is None:
+            raise ParseLimitExceeded(message, limit, getattr(self, limit), offset)
+        value = tok.value if isinstance(tok.value, str) else tok.type
+        raise ParseLimitExceeded(message, limit, getattr(self, limit), tok.lexpos, _shown(value), tok.type)
+
+    def check_length(self, text):
+        """
+        Counts a parse of text, and raises ParseLimitExceeded if text is longer than max_length
+        """
+        with self._lock:
+            self.parses += 1
+        if self.max_length is not None and len(text) > self.max_length:
+            self._exceeded('max_length', 'Query longer than %d characters' % self.max_length, self.max_length)
+
+    def token_function(self, lexer):
+        """
+        A function giving the next token of lexer (as lexer.token does) that raises
+        ParseLimitExceeded when the tokens so far pass max_tokens, max_depth or max_seconds;
+        for the parse that starts now
+        """
+        max_tokens = self.max_tokens
+        max_depth = self.max_depth
+        deadline = None if self.max_seconds is None else time.perf_counter() + self.max_seconds
+        next_token = lexer.token
+        count = depth = 0
+
+        def token():
+            nonlocal count, depth
+            tok = next_token()
+            if tok is None:
+                return None
+            count += 1
+            type_ = tok.type
+            if type_ in _OPENERS:
+                depth += 1
+                if max_depth is not None and depth > max_depth:
+                    self._exceeded('max_depth', 'Brackets nested deeper than %d' % max_depth, tok=tok)
+            elif type_ in _CLOSERS:
+                depth -= 1
+            elif type_ == 'VALUES_BLOCK':
+                table = tok.value
+                count += len(table) * max(len(table.variables), 1)
+            if max_tokens is not None and count > max_tokens:
+                self._exceeded('max_tokens', 'Query of more than %d tokens' % max_tokens, tok=tok)
+            # (a VALUES block may have taken a while to read: the clock is looked at after it too)
+            if deadline is not None and (not count & _CLOCK_MASK or type_ == 'VALUES_BLOCK') \
+                    and time.perf_counter() > deadline:
+                self._exceeded('max_seconds', 'Query not parsed in %g seconds' % self.max_seconds, tok=tok)
+            return tok
+
+        return token
+
+    def stats(self):
+        with self._lock:
+            stats = {'parses': self.parses}
+            stats.update(self.exceeded)
+        return stats
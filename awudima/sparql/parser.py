@@ -3,11 +3,19 @@
 __version__ = '0.1'
 __author__ = 'Kemele M. Endris'
 
-from ply import lex, yacc
+import copy
+import re
+import sys
+import threading
+
+from ply import lex
+from awudima.sparql import tables
+from awudima.sparql.cache import normalize_query
 from awudima.sparql import RDFTerm, Expression, PathTerm, \
     PropertyPath, TriplePattern, Filter, Bind, BGP, \
     UnionGP, OptionalGP, GGP, MinusGP, GraphGP, \
-    ServiceGP, SelectQuery, ConstructQuery, AskQuery, DescribeQuery, ValuesClause
+    ServiceGP, SelectQuery, ConstructQuery, AskQuery, DescribeQuery, ValuesClause, SharedRDFTerm
+from awudima.sparql.values import ValuesTable
 
 tokens = [
     'IRIREF',
@@ -64,7 +72,9 @@ tokens = [
     'ORSYMB',
     'ART_PLUS',
     'ART_MINUS',
-    'ART_DIV'
+    'ART_DIV',
+
+    'VALUES_BLOCK'
 ]
 
 reserved = {
@@ -213,7 +223,8 @@ PN_CHARS_BASE = r"[A-Z]|[a-z]|[\u00C0-\u00D6]|[\u00D8-\u00F6]|[\u00F8-\u02FF]" \
                 r"|[\uFDF0-\uFFFD]"  # |[\u10000-\uEFFFF]
 PN_CHARS_U = r"" + PN_CHARS_BASE + r"|_"
 PN_CHARS = r"(" + PN_CHARS_U + "|-|[0-9]|\u00B7|[\u0300-\u036F]|[\u203F-\u2040])"
-PN_PREFIX = r"(" + PN_CHARS_BASE + ")((" + PN_CHARS + "|.)*(" + PN_CHARS + "))?"
+# '.' only between name characters, as (\.*PN_CHARS)*: one way to match a name, so no backtracking
+PN_PREFIX = r"(" + PN_CHARS_BASE + r")(\.*" + PN_CHARS + ")*"
 
 PNAME_NS = r"(" + PN_PREFIX + ")?:"
 
@@ -222,16 +233,20 @@ PN_LOCAL_ESC = r"\\(\_|\~|\.|\-|\!|\$|\&|'|\(|\)|\*|\+|\,|\;|\=|/|\?|\#|\@|\%)"
 PERCENT = r"\%" + HEX + " " + HEX
 PLX = r"(" + PERCENT + "|" + PN_LOCAL_ESC + ")"
 
-PN_LOCAL = r"(" + PN_CHARS_U + "|:|[0-9]|" + PLX + ")((" + PN_CHARS + "|.|:|" + PLX + ")*(" + PN_CHARS + "|:|" + PLX + "))?"
+PN_LOCAL = r"(" + PN_CHARS_U + "|:|[0-9]|" + PLX + r")(\.*(" + PN_CHARS + "|:|" + PLX + "))*"
 
 # PNAME_NS = r"(" + PN_PREFIX + ")?:(" + PN_LOCAL + ')*'
 PNAME_LN = PNAME_NS + PN_LOCAL
 
-ECHAR = r"\\[tbnrf\"\']"  # escaped characters
+ECHAR = r"\\[tbnrf\"\'\\]"  # escaped characters
+# As in the SPARQL grammar, a backslash in a string only starts an ECHAR: each text then matches
+# the string rules in a single way, and an unterminated string fails in linear time (when a
+# backslash could also be read as a character, ''' and n backslashes took 2^n steps to fail).
+# PLY tries the longer regexes first, so the long string rules must stay longer than the short ones.
 t_STRING_LITERAL1 = r"'(([^\x27\x5C\x0A\x0D])|(" + ECHAR + "))*'"
 t_STRING_LITERAL2 = r"\"(([^\x22\x5C\x0A\x0D])|(" + ECHAR + "))*\""
-t_STRING_LITERAL_LONG1 = r"\'\'\'((\'|\'\')?([^\']|" + ECHAR + "))*\'\'\'"
-t_STRING_LITERAL_LONG2 = r'\"\"\"((\"|\"\")?([^"]|' + ECHAR + '))*\"\"\"'
+t_STRING_LITERAL_LONG1 = r"\'\'\'((\'|\'\')?([^\'\\]|" + ECHAR + "))*\'\'\'"
+t_STRING_LITERAL_LONG2 = r'\"\"\"((\"|\"\")?([^"\\]|' + ECHAR + '))*\"\"\"'
 
 t_NIL = r"\((\x20|\x09|\x0D|\x0A)*\)"
 t_BLANK_NODE_LABEL = r"\_\:([A-Z]|[a-z]|\_|[0-9])(([A-Z]|[a-z]|\_|\-|[0-9]|\.)*([A-Z]|[a-z]|\_|\-|[0-9]))?"
@@ -278,6 +293,14 @@ def t_ID(t):
     r'[a-zA-Z_]([a-zA-Z_0-9\-\.]*[a-zA-Z_0-9\-])?'
     # '[a-zA-Z_][a-zA-Z_0-9\-]*'
     t.type = reserved.get(t.value.upper(), 'ID')  # Check for reserved words
+    if t.type == 'VALUES' and getattr(t.lexer, 'scan_values', False):
+        # the whole data block is read at once, see awudima.sparql.tokenizer.scan_values_block
+        from awudima.sparql.tokenizer import scan_values_block
+        block = scan_values_block(t.lexer.lexdata, t.lexer.lexpos, getattr(t.lexer, 'max_values', None),
+                                  getattr(t.lexer, 'terms', None))
+        if block is not None:
+            t.type = 'VALUES_BLOCK'
+            t.value, t.lexer.lexpos = block
     return t
 
 
@@ -286,21 +309,170 @@ def t_ID(t):
 #     pass
 #     # No return value. Token discarded
 
+class SparqlSyntaxError(TypeError):
+    """
+    A query text that the parser cannot read. The error tells where and why, without the
+    text of the query:
+
+        category    LEXICAL (no token starts there), UNEXPECTED_TOKEN, UNEXPECTED_END (the
+                    text ends too early) or INVALID (well-formed, but not allowed, e.g., a
+                    VALUES row of the wrong length)
+        line, column    of the offending text, from 1 (None if not known)
+        offset      of the offending text in the query, from 0
+        token, token_type   the offending text (cut short) and its token type
+        expected    the token types the parser would have accepted there (a frozenset,
+                    empty if not known)
+
+    It is a TypeError, the exception the parser raised before, so that code catching those
+    still catches these.
+    """
+    LEXICAL = 'lexical'
+    UNEXPECTED_TOKEN = 'unexpected-token'
+    UNEXPECTED_END = 'unexpected-end'
+    INVALID = 'invalid'
+
+    def __init__(self, message, category, offset=None, token=None, token_type=None, expected=frozenset(), text=None):
+        super(SparqlSyntaxError, self).__init__(message)
+        self.message = message
+        self.category = category
+        self.offset = offset
+        self.token = token
+        self.token_type = token_type
+        self.expected = expected
+        self.line = self.column = None
+        if text is not None:
+            self.locate(text)
+
+    def locate(self, text):
+        """
+        Sets line and column from the offset in text (its end if the offset is not known)
+        """
+        if self.offset is None:
+            self.offset = len(text)
+        self.line = text.count('\n', 0, self.offset) + 1
+        self.column = self.offset - text.rfind('\n', 0, self.offset)
+
+    def __str__(self):
+        if self.line is None:
+            return self.message
+        return '%s at line %d, column %d' % (self.message, self.line, self.column)
+
+
+# Longest offending text kept in a SparqlSyntaxError
+_TOKEN_SHOWN = 40
+
+
+def _shown(text):
+    return text if len(text) <= _TOKEN_SHOWN else text[:_TOKEN_SHOWN - 3] + '...'
+
+
+# The recovering parse of this thread, if any (SparqlParser.parse_with_errors): its parser,
+# text and the errors found so far
+_recovery = threading.local()
+# Tokens put at the end of a query that ends too early, while recovering, to close what is open
+_CLOSERS = ('RKEY', 'RPAR', 'RBRC')
+_MAX_CLOSERS = 100
+
+
+class _TooManyErrors(Exception):
+    pass
+
+
+def _recovered(error):
+    """
+    Records error if the parse is a recovering one (and returns True); raises it if not
+    """
+    errors = getattr(_recovery, 'errors', None)
+    if errors is None:
+        raise error
+    if error.line is None:
+        error.locate(_recovery.text)
+    errors.append(error)
+    if len(errors) >= _recovery.max_errors:
+        raise _TooManyErrors()
+
+    return True
+
+
+# The offending text of a lexical error: the run of characters that start no token there
+# (all but printable ASCII, e.g. a no-break space or \r), or else the word up to SPARQL
+# whitespace (t_ignore: space, tab and newline, not the whitespace of str.split)
+_UNKNOWN = re.compile(r'[^\x21-\x7e \t\n]+')
+_WORD = re.compile(r'[^ \t\n]+')
+
+
 def t_error(t):
-    print(t, repr(xstring))
+    # t.value is the rest of the query, from the offending text
+    match = _UNKNOWN.match(t.value) or _WORD.match(t.value)
+    word = match.group() if match is not None else t.value[:1]
+    _recovered(SparqlSyntaxError("Unknown text '%s'" % _shown(word), SparqlSyntaxError.LEXICAL, t.lexpos,
+                                 _shown(word), text=t.lexer.lexdata))
+    # recovering: the word is left out
+    t.lexer.lexpos += len(word)
+
 
+def p_error(t):
+    # expected is filled in by SparqlParser (or here, when recovering), from the state of the parser
     if t is None:
-        raise TypeError("Unknown text '%s' in line %d " % (t.value, t.lexer.lineno,))
+        error = SparqlSyntaxError('Unexpected end of query', SparqlSyntaxError.UNEXPECTED_END, expected=None)
     else:
-        raise TypeError("Unknown text ", t, repr(xstring))
+        token = _shown(t.value) if isinstance(t.value, str) else t.type
+        error = SparqlSyntaxError("Unexpected '%s'" % token, SparqlSyntaxError.UNEXPECTED_TOKEN, t.lexpos, token,
+                                  t.type, expected=None, text=t.lexer.lexdata)
+    if getattr(_recovery, 'errors', None) is None:
+        raise error
 
+    # recovering: a closing bracket missing before another one, or at the end of the query, is
+    # put in (the token is then read again); otherwise the parser drops states and tokens
+    # until an error rule fits (a triple pattern or a block of a group is left out)
+    parser = _recovery.parser
+    state = parser.statestack[-1] if parser.statestack else 0
+    error.expected = frozenset(parser.action[state])
+    position = len(_recovery.text) if t is None else t.lexpos
+    if position != _recovery.closed_at:
+        _recovered(error)
+    if t is None or t.type in _CLOSERS:
+        for closer in _CLOSERS:
+            if closer in error.expected and _recovery.closers < _MAX_CLOSERS:
+                _recovery.closers += 1
+                _recovery.closed_at = position
+                if t is not None:
+                    t.lexer.lexpos = t.lexpos
+                tok = lex.LexToken()
+                tok.type, tok.value, tok.lineno, tok.lexpos = closer, None, 1, position
+                parser.errok()
+                return tok
+
+
+def _unexpected(p, n):
+    # SparqlSyntaxError for the n-th symbol of a rule that its action rejects (returns when
+    # recovering)
+    _recovered(SparqlSyntaxError("Unexpected '%s'" % _shown(str(p[n])), SparqlSyntaxError.UNEXPECTED_TOKEN,
+                                 p.lexpos(n), _shown(str(p[n])), p.slice[n].type, text=p.lexer.lexdata))
+
+
+def _term(p, value, is_const, is_iri=False, prefix=None, lang_tag=None, xsd_datatype=None):
+    """
+    RDFTerm of a variable, IRI or literal, shared by all its occurrences in the query being
+    parsed when the lexer has a terms table (see SparqlParser, intern_terms)
+    """
+    return _interned(getattr(p.lexer, 'terms', None), value, is_const, is_iri, prefix, lang_tag, xsd_datatype)
 
-def p_error(t):
-    print(t, repr(xstring))
-    if t is not None:
-        raise TypeError("Unknown text '%s' in line %d " % (t.value, t.lexer.lineno,))
-    else:
-        raise TypeError("Unknown text ", t, repr(xstring))
+
+def _interned(terms, value, is_const, is_iri=False, prefix=None, lang_tag=None, xsd_datatype=None):
+    """
+    RDFTerm of a term, the SharedRDFTerm in terms (a dict, added to it if missing) if terms is
+    not None
+    """
+    if terms is None:
+        return RDFTerm(value, is_const, is_iri=is_iri, prefix=prefix, lang_tag=lang_tag, xsd_datatype=xsd_datatype)
+
+    key = (value, is_const, is_iri, prefix, lang_tag, xsd_datatype)
+    term = terms.get(key)
+    if term is None:
+        term = terms[key] = SharedRDFTerm(value, is_const, is_iri=is_iri, prefix=prefix, lang_tag=lang_tag,
+                                          xsd_datatype=xsd_datatype)
+    return term
 
 
 ####################################################
@@ -397,17 +569,18 @@ def p_prefixes_0(p):
 
 def p_prefixes_1(p):
     """
-    prefixes : base_decl prefixes
+    prefixes : prefixes base_decl
     """
-    p[0] = [p[1]] + p[2]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_prefixes_2(p):
     """
-    prefixes : prefix_decl prefixes
+    prefixes : prefixes prefix_decl
     """
-
-    p[0] = [p[1]] + p[2]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 #
@@ -496,6 +669,7 @@ def p_select_clause_0(p):
     """
     select_clause : SELECT distinct var_list
     """
+    p[3].reverse()
     p[0] = p[2], p[3]
 
 
@@ -522,25 +696,31 @@ def p_distinct_1(p):
 
 
 # Var list
+# var_list is right recursive (a left recursive var_list conflicts with expressions that are
+# a single VAR), so the items are appended as the reductions come, i.e., last item first,
+# and select_clause reverses the list once.
 def p_var_list_0(p):
     """
     var_list : VAR var_lists
     """
-    p[0] = [RDFTerm(p[1], is_const=False)] + p[2]
+    p[2].append(_term(p, p[1], is_const=False))
+    p[0] = p[2]
 
 
 def p_var_list_1(p):
     """
     var_list : LPAR expression AS VAR RPAR var_lists
     """
-    p[0] = [Expression(p[2], 'AS', RDFTerm(p[4], is_const=False))] + p[6]
+    p[6].append(Expression(p[2], 'AS', _term(p, p[4], is_const=False)))
+    p[0] = p[6]
 
 
 def p_var_list_2(p):
     """
     var_list :  expression AS VAR var_lists
     """
-    p[0] = [Expression(p[1], 'AS', RDFTerm(p[3], is_const=False))] + p[4]
+    p[4].append(Expression(p[1], 'AS', _term(p, p[3], is_const=False)))
+    p[0] = p[4]
 
 
 def p_var_list_3(p):
@@ -549,7 +729,8 @@ def p_var_list_3(p):
     """
     import random
     varname = '?' + str(p[1]).split('(')[0] + '_' + str(random.randint(0, 100))
-    p[0] = [Expression(p[1], 'AS', RDFTerm(varname.lower(), is_const=False))] + p[2]
+    p[2].append(Expression(p[1], 'AS', _term(p, varname.lower(), is_const=False)))
+    p[0] = p[2]
 
 
 def p_var_lists_0(p):
@@ -743,9 +924,10 @@ def p_object_list(p):
 
 def p_object_list_exp_0(p):
     """
-     object_list_exp :  COMA object object_list_exp
+     object_list_exp :  object_list_exp COMA object
     """
-    p[0] = p[2] + p[3]
+    p[1].extend(p[3])
+    p[0] = p[1]
 
 
 def p_object_list_exp_1(p):
@@ -789,7 +971,7 @@ def p_describe_query_0(p):
     """
     describe_query : DESCRIBE VAR var_or_iris dataset_clauses where_clause solution_modifier
     """
-    iris = [RDFTerm(p[1], is_const=False)] + p[3]
+    iris = [_term(p, p[1], is_const=False)] + p[3]
     p[0] = iris, p[4], p[5], p[6]
 
 
@@ -797,7 +979,7 @@ def p_describe_query_1(p):
     """
     describe_query : DESCRIBE VAR var_or_iris dataset_clauses solution_modifier
     """
-    iris = [RDFTerm(p[1], is_const=False)] + p[3]
+    iris = [_term(p, p[1], is_const=False)] + p[3]
     p[0] = iris, p[4], None, p[5]
 
 
@@ -833,16 +1015,18 @@ def p_describe_query_5(p):
 
 def p_var_or_iris_0(p):
     """
-    var_or_iris : VAR var_or_iris
+    var_or_iris : var_or_iris VAR
     """
-    p[0] = [RDFTerm(p[1], is_const=False)] + p[2]
+    p[1].append(_term(p, p[2], is_const=False))
+    p[0] = p[1]
 
 
 def p_var_or_iris_1(p):
     """
-    var_or_iris : iri var_or_iris
+    var_or_iris : var_or_iris iri
     """
-    p[0] = [p[1]] + p[2]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_var_or_iris_2(p):
@@ -866,16 +1050,18 @@ def p_var_or_iris_2(p):
 
 def p_dataset_clauses_0(p):
     """
-    dataset_clauses : FROM default_graph_clause dataset_clauses
+    dataset_clauses : dataset_clauses FROM default_graph_clause
     """
-    p[0] = [str(p[2])] + p[3]
+    p[1].append(str(p[3]))
+    p[0] = p[1]
 
 
 def p_dataset_clauses_1(p):
     """
-    dataset_clauses : FROM named_graph_clause dataset_clauses
+    dataset_clauses : dataset_clauses FROM named_graph_clause
     """
-    p[0] = [str(p[2])] + p[3]
+    p[1].append(str(p[3]))
+    p[0] = p[1]
 
 
 def p_dataset_clauses_2(p):
@@ -1008,14 +1194,16 @@ def p_group_graph_pattern_sub_0(p):
     if len(p[2]) > 0:
         filters = []
         # if len(p[1]) > 0:
+        blocks = []
         for f in p[2]:
             if isinstance(f, Filter):
                 filters.append(f)
-        [p[2].remove(f) for f in filters]
+            else:
+                blocks.append(f)
         if len(p[1]) > 0 or len(filters) > 0:
-            p[0] = [BGP(p[1], filters)] + p[2]
+            p[0] = [BGP(p[1], filters)] + blocks
         else:
-            p[0] = p[2]
+            p[0] = blocks
     else:
         if len(p[1]) > 0:
             p[0] = [BGP(p[1])]
@@ -1030,65 +1218,78 @@ def p_group_graph_pattern_sub_1(p):
     if len(p[1]) > 0:
         filters = []
         bgps = []
+        blocks = []
         for f in p[1]:
             if isinstance(f, Filter):
                 filters.append(f)
-            if isinstance(f, BGP):
+            elif isinstance(f, BGP):
                 bgps.append(f)
-        [p[1].remove(f) for f in filters]
-        [p[1].remove(f) for f in bgps]
+            else:
+                blocks.append(f)
         if len(bgps) > 0 or len(filters) > 0:
-            p[0] = [BGP(bgps, filters)] + p[1]
+            p[0] = [BGP(bgps, filters)] + blocks
         else:
-            p[0] = p[1]
+            p[0] = blocks
     else:
         p[0] = p[1]
 
 
 def p_pattern_blocks_0(p):
     """
-    pattern_blocks : graph_pattern_not_triples POINT triples_block pattern_blocks
+    pattern_blocks : pattern_blocks graph_pattern_not_triples POINT triples_block
     """
-    if isinstance(p[1], Filter):
-        if len(p[3]) > 0:
-            p[0] = [BGP(p[3], [p[1]])] + p[4]
+    if p[2] is None:
+        # a block left out (see p_graph_pattern_not_triples_error), the triples after it are kept
+        if len(p[4]) > 0:
+            p[1].append(BGP(p[4]))
+    elif isinstance(p[2], Filter):
+        if len(p[4]) > 0:
+            p[1].append(BGP(p[4], [p[2]]))
         else:
-            p[0] = [p[1]] + p[4]
+            p[1].append(p[2])
     else:
-        if len(p[3]) > 0:
-            p[0] = [p[1]] + [BGP(p[3])] + p[4]
-        else:
-            p[0] = [p[1]] + p[4]
+        p[1].append(p[2])
+        if len(p[4]) > 0:
+            p[1].append(BGP(p[4]))
+    p[0] = p[1]
 
 
 def p_pattern_blocks_1(p):
     """
-    pattern_blocks : graph_pattern_not_triples triples_block pattern_blocks
+    pattern_blocks : pattern_blocks graph_pattern_not_triples triples_block
     """
-    if isinstance(p[1], Filter):
-        if len(p[2]) > 0:
-            p[0] = [BGP(p[2], [p[1]])] + p[3]
+    if p[2] is None:
+        # a block left out (see p_graph_pattern_not_triples_error), the triples after it are kept
+        if len(p[3]) > 0:
+            p[1].append(BGP(p[3]))
+    elif isinstance(p[2], Filter):
+        if len(p[3]) > 0:
+            p[1].append(BGP(p[3], [p[2]]))
         else:
-            p[0] = [p[1]] + p[3]
+            p[1].append(p[2])
     else:
-        if len(p[2]) > 0:
-            p[0] = [p[1]] + [BGP(p[2])] + p[3]
-        else:
-            p[0] = [p[1]] + p[3]
+        p[1].append(p[2])
+        if len(p[3]) > 0:
+            p[1].append(BGP(p[3]))
+    p[0] = p[1]
 
 
 def p_pattern_blocks_2(p):
     """
-    pattern_blocks : graph_pattern_not_triples POINT pattern_blocks
+    pattern_blocks : pattern_blocks graph_pattern_not_triples POINT
     """
-    p[0] = [p[1]] + p[3]
+    if p[2] is not None:
+        p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_pattern_blocks_3(p):
     """
-    pattern_blocks : graph_pattern_not_triples pattern_blocks
+    pattern_blocks : pattern_blocks graph_pattern_not_triples
     """
-    p[0] = [p[1]] + p[2]
+    if p[2] is not None:
+        p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_pattern_blocks_4(p):
@@ -1127,6 +1328,14 @@ def p_graph_pattern_not_triples(p):
     p[0] = p[1]
 
 
+def p_graph_pattern_not_triples_error(p):
+    """
+    graph_pattern_not_triples : error
+    """
+    # error rule, see p_triples_same_subject_path_error: None, left out by pattern_blocks
+    p[0] = None
+
+
 ##############################################################
 # UNIONs
 """
@@ -1149,10 +1358,10 @@ def p_group_or_union_graph_pattern(p):
 
 def p_union_patterns_0(p):
     """
-    union_patterns : UNION group_graph_pattern union_patterns
+    union_patterns : union_patterns UNION group_graph_pattern
     """
-    # p[0] = str(p[1]) + ' ' + str(p[2]) + ' ' + str(p[3])
-    p[0] = [p[2]] + p[3]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_union_patterns_1(p):
@@ -1204,7 +1413,7 @@ def p_graph_graph_pattern_0(p):
     """
     graph_graph_pattern : GRAPH VAR group_graph_pattern
     """
-    p[0] = GraphGP(RDFTerm(p[2], is_const=False), p[3])
+    p[0] = GraphGP(_term(p, p[2], is_const=False), p[3])
 
 
 def p_graph_graph_pattern_1(p):
@@ -1226,7 +1435,7 @@ def p_service_graph_pattern_0(p):
     """
     service_graph_pattern : SERVICE silent VAR group_graph_pattern
     """
-    p[0] = ServiceGP(RDFTerm(p[3], is_const=False), p[4], p[2])
+    p[0] = ServiceGP(_term(p, p[3], is_const=False), p[4], p[2])
 
 
 def p_service_graph_pattern_1(p):
@@ -1277,7 +1486,7 @@ def p_bind(p):
     """
     bind : BIND LPAR expression AS VAR RPAR
     """
-    p[0] = Bind(RDFTerm(str(p[3]), is_const=False), p[5])
+    p[0] = Bind(_term(p, str(p[3]), is_const=False), p[5])
 
 
 ###################################
@@ -1293,7 +1502,15 @@ def p_inline_data(p):
     """
     inline_data : VALUES data_block
     """
-    p[0] = ValuesClause(p[2]['vars'], p[2]['values'])
+    p[0] = ValuesClause(p[2].variables, p[2])
+
+
+def p_inline_data_block(p):
+    """
+    inline_data : VALUES_BLOCK
+    """
+    # VALUES and its data block, read by the lexer into a ValuesTable
+    p[0] = ValuesClause(p[1].variables, p[1])
 
 
 ###############################
@@ -1360,10 +1577,10 @@ def p_arg_list_1(p):
 
 def p_more_args_0(p):
     """
-    more_args : COMA expression more_args
+    more_args : more_args COMA expression
     """
-    # p[0] = str(p[1]) + ' ' + str(p[2])
-    p[0] = [p[2]] + p[3]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_more_args_1(p):
@@ -1389,8 +1606,7 @@ def p_values_clause_0(p):
     """
     values_clause :  VALUES data_block
     """
-    # p[0] = p[2]
-    p[0] = ValuesClause(p[2]['vars'], p[2]['values'])
+    p[0] = ValuesClause(p[2].variables, p[2])
 
 
 def p_values_clause_1(p):
@@ -1402,6 +1618,13 @@ def p_values_clause_1(p):
     p[0] = ValuesClause([], [])
 
 
+def p_values_clause_2(p):
+    """
+    values_clause :  VALUES_BLOCK
+    """
+    p[0] = ValuesClause(p[1].variables, p[1])
+
+
 def p_data_block_0(p):
     """
     data_block :  inline_data_one_var
@@ -1421,15 +1644,19 @@ def p_inline_data_one_var(p):
     inline_data_one_var :  VAR LKEY data_block_values RKEY
     """
     # p[0] = str(p[1]) + ' ' + str(p[2]) + ' ' + str(p[3]) + ' ' + str(p[4])
-    p[0] = {'vars': [RDFTerm(p[1], is_const=False)],
-            'values': [[d] for d in p[3]]}
+    table = ValuesTable([_term(p, p[1], is_const=False)])
+    intern = table.dictionary.intern_term
+    table.columns[0].extend(intern(d) for d in p[3])
+    table.size = len(p[3])
+    p[0] = table
 
 
 def p_data_block_values_0(p):
     """
-    data_block_values :  data_block_value data_block_values
+    data_block_values :  data_block_values data_block_value
     """
-    p[0] = [p[1]] + p[2]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_data_block_values_1(p):
@@ -1450,43 +1677,60 @@ def p_data_block_value(p):
     p[0] = p[1]
 
 
+def p_data_block_value_placeholder(p):
+    """
+    data_block_value : VAR
+    """
+    # Only $-variables are accepted here, and only when parsing a query template: they are
+    # its placeholders (see SparqlParser.parse_template), bound to constants before the
+    # query is used. VALUES ?x { $y } is not SPARQL.
+    if p[1][0] != '$' or not getattr(p.lexer, 'placeholders', False):
+        _unexpected(p, 1)
+    p[0] = _term(p, p[1], is_const=False)
+
+
+def _values_table(p, variables, rows):
+    try:
+        return ValuesTable.from_rows(variables, rows)
+    except ValueError as e:
+        _recovered(SparqlSyntaxError(str(e), SparqlSyntaxError.INVALID, p.lexpos(1), text=p.lexer.lexdata))
+        return ValuesTable.from_rows(variables, [])
+
+
 def p_inline_data_full_0(p):
     """
     inline_data_full :  NIL LKEY bracketed_data_block_values RKEY
     """
-    p[0] = {'vars': [],
-            'values': p[3]}
+    p[0] = _values_table(p, [], p[3])
 
 
 def p_inline_data_full_1(p):
     """
     inline_data_full :  NIL LKEY nils RKEY
     """
-    p[0] = {'vars': [],
-            'values': p[3]}
+    p[0] = _values_table(p, [], p[3])
 
 
 def p_inline_data_full_2(p):
     """
     inline_data_full :  LPAR vars RPAR LKEY nils RKEY
     """
-    p[0] = {'vars': p[2],
-            'values': p[5]}
+    p[0] = _values_table(p, p[2], p[5])
 
 
 def p_inline_data_full_3(p):
     """
     inline_data_full :  LPAR vars RPAR LKEY bracketed_data_block_values RKEY
     """
-    p[0] = {'vars': p[2],
-            'values': p[5]}
+    p[0] = _values_table(p, p[2], p[5])
 
 
 def p_vars_0(p):
     """
-    vars : VAR vars
+    vars : vars VAR
     """
-    p[0] = [RDFTerm(p[1], is_const=False)] + p[2]
+    p[1].append(_term(p, p[2], is_const=False))
+    p[0] = p[1]
 
 
 def p_vars_1(p):
@@ -1498,9 +1742,11 @@ def p_vars_1(p):
 
 def p_nils_0(p):
     """
-    nils : NIL nils
+    nils : nils NIL
     """
-    p[0] = [RDFTerm(p[1], is_const=True, is_nil=True)] + p[2]
+    # a NIL row is a row without values
+    p[1].append([])
+    p[0] = p[1]
 
 
 def p_nils_1(p):
@@ -1512,9 +1758,10 @@ def p_nils_1(p):
 
 def p_bracketed_data_block_values_0(p):
     """
-    bracketed_data_block_values : LPAR data_block_values RPAR bracketed_data_block_values
+    bracketed_data_block_values : bracketed_data_block_values LPAR data_block_values RPAR
     """
-    p[0] = [p[2]] + p[4]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_bracketed_data_block_values_1(p):
@@ -1535,22 +1782,29 @@ def p_bracketed_data_block_values_1(p):
 
 def p_triples_block_0(p):
     """
-    triples_block : triples_same_subject_path POINT triples_block
+    triples_block : triples_block_list POINT
     """
-    # p[0] = str(p[1]) + ' ' + str(p[2]) + ' ' + str(p[3])
-    p[0] = p[1] + p[3]
+    p[0] = p[1]
 
 
 def p_triples_block_1(p):
     """
-    triples_block : triples_same_subject_path POINT
+    triples_block : triples_block_list
     """
     p[0] = p[1]
 
 
-def p_triples_block_2(p):
+def p_triples_block_list_0(p):
     """
-    triples_block : triples_same_subject_path
+    triples_block_list : triples_block_list POINT triples_same_subject_path
+    """
+    p[1].extend(p[3])
+    p[0] = p[1]
+
+
+def p_triples_block_list_1(p):
+    """
+    triples_block_list : triples_same_subject_path
     """
     p[0] = p[1]
 
@@ -1564,6 +1818,16 @@ def p_triples_block_2(p):
 
 
 ######################################################
+# Error rules, for recovering parses (SparqlParser.parse_with_errors): what they match is left
+# out. They only add conflicts on the error token, resolved as shift (the smallest part is
+# left out), and do not change how valid queries are parsed.
+def p_triples_same_subject_path_error(p):
+    """
+    triples_same_subject_path : error
+    """
+    p[0] = []
+
+
 def p_triples_same_subject_path_0(p):
     """
     triples_same_subject_path : var_or_term property_list_path_not_empty
@@ -1606,7 +1870,8 @@ def p_property_list_path_not_empty_0(p):
     """
     # print(p[3])
     l1 = [(p[1], obj1) for obj1 in p[2]]
-    p[0] = l1 + p[3]
+    l1.extend(p[3])
+    p[0] = l1
 
 
 def p_property_list_path_not_empty_1(p):
@@ -1614,30 +1879,31 @@ def p_property_list_path_not_empty_1(p):
     property_list_path_not_empty :  verb_simple object_list_path object_list_path_expr
     """
     l1 = [(p[1], obj1) for obj1 in p[2]]
-    p[0] = l1 + p[3]
+    l1.extend(p[3])
+    p[0] = l1
 
 
 def p_object_list_path_expr_0(p):
     """
-    object_list_path_expr :  SEMI_COLON verb_path object_list object_list_path_expr
+    object_list_path_expr :  object_list_path_expr SEMI_COLON verb_path object_list
     """
-    l1 = [(p[2], obj1) for obj1 in p[3]]
-    p[0] = l1 + p[4]
+    p[1].extend((p[3], obj1) for obj1 in p[4])
+    p[0] = p[1]
 
 
 def p_object_list_path_expr_1(p):
     """
-    object_list_path_expr :  SEMI_COLON verb_simple object_list object_list_path_expr
+    object_list_path_expr :  object_list_path_expr SEMI_COLON verb_simple object_list
     """
-    l1 = [(p[2], obj1) for obj1 in p[3]]
-    p[0] = l1 + p[4]
+    p[1].extend((p[3], obj1) for obj1 in p[4])
+    p[0] = p[1]
 
 
 def p_object_list_path_expr_2(p):
     """
-    object_list_path_expr :  SEMI_COLON object_list_path_expr
+    object_list_path_expr :  object_list_path_expr SEMI_COLON
     """
-    p[0] = p[2]
+    p[0] = p[1]
 
 
 def p_object_list_path_expr_3(p):
@@ -1669,7 +1935,7 @@ def p_verb_simple(p):
     """
     verb_simple : VAR
     """
-    p[0] = RDFTerm(str(p[1]), is_const=False)
+    p[0] = _term(p, str(p[1]), is_const=False)
 
 
 def p_object_list_path(p):
@@ -1681,10 +1947,10 @@ def p_object_list_path(p):
 
 def p_object_path_expr_0(p):
     """
-    object_path_expr : COMA object_path object_path_expr
+    object_path_expr : object_path_expr COMA object_path
     """
-    # p[0] = str(p[1]) + ' ' + str(p[2]) + ' ' + str(p[3])
-    p[0] = p[2] + p[3]
+    p[1].extend(p[3])
+    p[0] = p[1]
 
 
 def p_object_path_expr_1(p):
@@ -1760,10 +2026,10 @@ def p_collection_path(p):
 
 def p_graph_node_paths_0(p):
     """
-    graph_node_paths : graph_node_path graph_node_paths
+    graph_node_paths : graph_node_paths graph_node_path
     """
-    # p[0] = str(p[1]) + ' ' + str(p[2])
-    p[0] = p[1] + p[2]
+    p[1].extend(p[2])
+    p[0] = p[1]
 
 
 def p_graph_node_paths_1(p):
@@ -1929,11 +2195,10 @@ def p_path_primary_1(p):
     #  | not_path_negated_property_set # not implemented atm
     if str(p[1]) == 'a':
         value = '<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>'
-        p[0] = RDFTerm(value, is_const=True, is_iri=True)
+        p[0] = _term(p, value, is_const=True, is_iri=True)
     else:
-        print('raising syntax error:')
-        p_error(str(p[1]))
-        raise SyntaxError
+        _unexpected(p, 1)
+        p[0] = _term(p, p[1], is_const=True)
 
 
 def p_path_primary_2(p):
@@ -1973,9 +2238,10 @@ def p_collection(p):
 
 def p_graph_nodes_0(p):
     """
-    graph_nodes :  graph_node graph_nodes
+    graph_nodes :  graph_nodes graph_node
     """
-    p[0] = p[1] + p[2]
+    p[1].extend(p[2])
+    p[0] = p[1]
 
 
 def p_graph_nodes_1(p):
@@ -2020,22 +2286,24 @@ def p_property_list_not_empty_0(p):
     property_list_not_empty :  verb object_list verb_object_list_expr
     """
     # p[0] = str(p[1]) + ' ' + str(p[2]) + ' ' + str(p[3])
-    p[0] = [(p[1], o) for o in p[2]] + p[3]
+    pos = [(p[1], o) for o in p[2]]
+    pos.extend(p[3])
+    p[0] = pos
 
 
 def p_verb_object_list_expr_0(p):
     """
-    verb_object_list_expr :  SEMI_COLON verb_object_list verb_object_list_expr
+    verb_object_list_expr :  verb_object_list_expr SEMI_COLON verb_object_list
     """
-    # p[0] = str(p[1]) + ' ' + str(p[2]) + ' ' + str(p[3])
-    p[0] = p[2] + p[3]
+    p[1].extend(p[3])
+    p[0] = p[1]
 
 
 def p_verb_object_list_expr_1(p):
     """
-    verb_object_list_expr :  SEMI_COLON verb_object_list_expr
+    verb_object_list_expr :  verb_object_list_expr SEMI_COLON
     """
-    p[0] = p[2]
+    p[0] = p[1]
 
 
 def p_verb_object_list_expr_2(p):
@@ -2059,18 +2327,17 @@ def p_verb_0(p):
     """
     if str(p[1]) == 'a':
         value = '<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>'
-        p[0] = RDFTerm(value, is_const=True, is_iri=True)
+        p[0] = _term(p, value, is_const=True, is_iri=True)
     else:
-        print('raising syntax error:')
-        p_error(str(p[1]))
-        raise SyntaxError
+        _unexpected(p, 1)
+        p[0] = _term(p, p[1], is_const=True)
 
 
 def p_verb_1(p):
     """
     verb :  VAR
     """
-    p[0] = RDFTerm(p[1], is_const=False)
+    p[0] = _term(p, p[1], is_const=False)
 
 
 def p_verb_2(p):
@@ -2166,9 +2433,10 @@ def p_group_clause_1(p):
 
 def p_group_condition_0(p):
     """
-     group_condition : group_expr group_condition
+     group_condition : group_condition group_expr
     """
-    p[0] = [p[1]] + p[2]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_group_condition_1(p):
@@ -2196,7 +2464,7 @@ def p_group_expr_2(p):
     """
     group_expr : LPAR expression AS VAR RPAR
     """
-    p[0] = Expression(p[1], "AS", RDFTerm(p[3], is_const=False))
+    p[0] = Expression(p[1], "AS", _term(p, p[3], is_const=False))
 
 
 def p_group_expr_3(p):
@@ -2210,7 +2478,7 @@ def p_group_expr_4(p):
     """
     group_expr : VAR
     """
-    p[0] = RDFTerm(str(p[1]), is_const=False)
+    p[0] = _term(p, str(p[1]), is_const=False)
 
 
 # having clause
@@ -2230,9 +2498,10 @@ def p_having_clause_1(p):
 
 def p_having_condition_0(p):
     """
-     having_condition : constraint having_condition
+     having_condition : having_condition constraint
     """
-    p[0] = [p[1]] + p[2]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_having_condition_1(p):
@@ -2290,7 +2559,7 @@ def p_order_condition_4(p):
     """
     order_condition : VAR  order_condition
     """
-    p[0] = [Expression(RDFTerm(p[1], is_const=False), 'ASC')] + p[2]
+    p[0] = [Expression(_term(p, p[1], is_const=False), 'ASC')] + p[2]
 
 
 def p_order_condition_5(p):
@@ -2326,7 +2595,7 @@ def p_order_condition_9(p):
     """
     order_condition : VAR
     """
-    p[0] = [RDFTerm(p[1], is_const=False)]
+    p[0] = [_term(p, p[1], is_const=False)]
 
 
 # LIMIT OFFSET clauses
@@ -2595,10 +2864,10 @@ def p_expression_list_2(p):
 
 def p_other_expr_list_0(p):
     """
-    other_expr_list : COMA expression other_expr_list
+    other_expr_list : other_expr_list COMA expression
     """
-    # p[0] = str(p[1]) + " " + str(p[2]) + " " + str(p[3])
-    p[0] = [p[2]] + p[3]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_other_expr_list_1(p):
@@ -2700,14 +2969,14 @@ def p_mult_or_div_multiplicative_expr_0(p):
         op, right = p[2]
         if len(p[3]) > 0:
             op2, right2 = p[3]
-            p[0] = str(p[1])[:1], Expression(Expression(RDFTerm(str(p[1])[1:], is_const=True), op, right), op2, right2)
+            p[0] = str(p[1])[:1], Expression(Expression(_term(p, str(p[1])[1:], is_const=True), op, right), op2, right2)
         else:
-            p[0] = str(p[1])[:1], Expression(RDFTerm(str(p[1])[1:], is_const=True), op, right)
+            p[0] = str(p[1])[:1], Expression(_term(p, str(p[1])[1:], is_const=True), op, right)
     elif len(p[3]) > 0:
         op2, right2 = p[3]
-        p[0] = str(p[1])[:1], Expression(RDFTerm(str(p[1])[1:], is_const=True), op2, right2)
+        p[0] = str(p[1])[:1], Expression(_term(p, str(p[1])[1:], is_const=True), op2, right2)
     else:
-        p[0] = str(p[1])[:1], RDFTerm(str(p[1])[1:], is_const=True)
+        p[0] = str(p[1])[:1], _term(p, str(p[1])[1:], is_const=True)
 
 
 def p_mult_or_div_multiplicative_expr_1(p):
@@ -2718,14 +2987,14 @@ def p_mult_or_div_multiplicative_expr_1(p):
         op, right = p[2]
         if len(p[3]) > 0:
             op2, right2 = p[3]
-            p[0] = str(p[1])[:1], Expression(Expression(RDFTerm(str(p[1])[1:], is_const=True), op, right), op2, right2)
+            p[0] = str(p[1])[:1], Expression(Expression(_term(p, str(p[1])[1:], is_const=True), op, right), op2, right2)
         else:
-            p[0] = str(p[1])[:1], Expression(RDFTerm(str(p[1])[1:], is_const=True), op, right)
+            p[0] = str(p[1])[:1], Expression(_term(p, str(p[1])[1:], is_const=True), op, right)
     elif len(p[3]) > 0:
         op2, right2 = p[3]
-        p[0] = str(p[1])[:1], Expression(RDFTerm(str(p[1])[1:], is_const=True), op2, right2)
+        p[0] = str(p[1])[:1], Expression(_term(p, str(p[1])[1:], is_const=True), op2, right2)
     else:
-        p[0] = str(p[1])[:1], RDFTerm(str(p[1])[1:], is_const=True)
+        p[0] = str(p[1])[:1], _term(p, str(p[1])[1:], is_const=True)
 
 
 def p_art_mult_or_art_div_unary_expr_0(p):
@@ -2870,7 +3139,7 @@ def p_primary_expression_1(p):
     """
      primary_expression :  	VAR
     """
-    p[0] = RDFTerm(p[1], is_const=False)
+    p[0] = _term(p, p[1], is_const=False)
 
 
 def p_bracketted_expression(p):
@@ -3047,7 +3316,7 @@ def p_built_in_call_4(p):
     """
      built_in_call : BOUND LPAR VAR RPAR
     """
-    p[0] = Expression(RDFTerm(str(p[3]), is_const=False), str(p[1]))
+    p[0] = Expression(_term(p, str(p[3]), is_const=False), str(p[1]))
 
 
 def p_built_in_call_5(p):
@@ -3248,7 +3517,7 @@ def p_var_or_term_0(p):
     """
     var_or_term : VAR
     """
-    p[0] = RDFTerm(str(p[1]), is_const=False)
+    p[0] = _term(p, str(p[1]), is_const=False)
 
 
 def p_var_or_term_1(p):
@@ -3317,11 +3586,11 @@ def p_rdf_literal(p):
     langtype = str(p[2]).strip()
     if len(langtype) > 0:
         if '@' == langtype[0]:
-            p[0] = RDFTerm(str(p[1]), is_const=True, lang_tag=langtype[1:])
+            p[0] = _term(p, str(p[1]), is_const=True, lang_tag=langtype[1:])
         elif '^' == langtype[0]:
-            p[0] = RDFTerm(str(p[1]), is_const=True, xsd_datatype=langtype[2:])
+            p[0] = _term(p, str(p[1]), is_const=True, xsd_datatype=langtype[2:])
     else:
-        p[0] = RDFTerm(str(p[1]), is_const=True)
+        p[0] = _term(p, str(p[1]), is_const=True)
 
 
 def p_language_or_type_0(p):
@@ -3401,21 +3670,21 @@ def p_numeric_literal_0(p):
     """
     numeric_literal :  numeric_literal_unsigned
     """
-    p[0] = RDFTerm(str(p[1]), is_const=True)
+    p[0] = _term(p, str(p[1]), is_const=True)
 
 
 def p_numeric_literal_1(p):
     """
     numeric_literal :  numeric_literal_positive
     """
-    p[0] = RDFTerm(str(p[1]), is_const=True)
+    p[0] = _term(p, str(p[1]), is_const=True)
 
 
 def p_numeric_literal_2(p):
     """
     numeric_literal : numeric_literal_negative
     """
-    p[0] = RDFTerm(str(p[1]), is_const=True)
+    p[0] = _term(p, str(p[1]), is_const=True)
 
 
 def p_numeric_literal_unsigned_0(p):
@@ -3486,7 +3755,7 @@ def p_boolean_literal_0(p):
     boolean_literal : LTRUE
     """
     # p[0] = str(p[1])
-    p[0] = RDFTerm(str(p[1]), is_const=True)
+    p[0] = _term(p, str(p[1]), is_const=True)
 
 
 def p_boolean_literal_1(p):
@@ -3494,7 +3763,7 @@ def p_boolean_literal_1(p):
     boolean_literal : LFALSE
     """
     # p[0] = str(p[1])
-    p[0] = RDFTerm(str(p[1]), is_const=True)
+    p[0] = _term(p, str(p[1]), is_const=True)
 
 
 #################################################
@@ -3510,7 +3779,7 @@ def p_iri_0(p):
     """
     iri : IRIREF
     """
-    p[0] = RDFTerm(str(p[1]), is_const=True, is_iri=True)
+    p[0] = _term(p, str(p[1]), is_const=True, is_iri=True)
 
 
 #
@@ -3526,7 +3795,7 @@ def p_iri_1(p):
     """
     iri : ID COLON ID
     """
-    p[0] = RDFTerm(str(p[1]) + str(p[2]) + str(p[3]), is_const=True, is_iri=True, prefix=str(p[1]))
+    p[0] = _term(p, str(p[1]) + str(p[2]) + str(p[3]), is_const=True, is_iri=True, prefix=str(p[1]))
 
 
 def p_iri_2(p):
@@ -3534,7 +3803,7 @@ def p_iri_2(p):
     iri : COLON ID
     """
     # p[0] = '<noname> ' + str(p[1]) + ' ' + str(p[2])
-    p[0] = RDFTerm(str(p[1]) + str(p[2]), is_const=True, is_iri=True, prefix='')
+    p[0] = _term(p, str(p[1]) + str(p[2]), is_const=True, is_iri=True, prefix='')
 
 
 def p_iri_3(p):
@@ -3542,7 +3811,7 @@ def p_iri_3(p):
     iri : COLON
     """
     # p[0] = '<noname> ' + str(p[1]) + '<noname> '
-    p[0] = RDFTerm(str(p[1]), is_const=True, is_iri=True, prefix='')
+    p[0] = _term(p, str(p[1]), is_const=True, is_iri=True, prefix='')
 
 
 # ##########################################
@@ -3561,16 +3830,184 @@ def p_iri_3(p):
 #         p[0] = str(p[1])
 
 # Helpers
-xstring = ""
 
+# The LALR tables are generated ahead of time into awudima/sparql/parsetab.pickle
+# (python -m awudima.sparql.tables); here they are only checked against the grammar
+# signature and loaded, nothing is written to disk.
 _lexer = lex.lex()
-_sparql_parser = yacc.yacc(debug=1)
+_sparql_parser = tables.load_parser(sys.modules[__name__])
+
+
+class SparqlParser(object):
+    """
+    Reentrant SPARQL parser.
+
+    The lexer and the LALR parser keep their state (input, position, stacks) on the instance,
+    so each thread gets its own clone of them; the grammar tables are shared.
+    A single SparqlParser can be used from many threads at once.
+
+    If a cache (awudima.sparql.cache.ParseCache) is given, parsed queries are looked up by
+    their normalized text and a fresh copy of the cached tree is returned on a hit.
+
+    tokenizer selects the lexer: 'ply' (the PLY lexer built from the t_* rules above) or
+    'scanner' (awudima.sparql.tokenizer.SparqlTokenizer, same tokens, faster on large queries).
+
+    With scan_values, the lexer reads VALUES data blocks in one go into a columnar
+    ValuesTable (awudima.sparql.values) that becomes the values of the ValuesClause, instead
+    of going through the grammar one value at a time. Blocks it cannot read (e.g., with
+    template placeholders) still go through the grammar.
+
+    With intern_terms (off by default), the variables, IRIs and literals of a query are
+    interned while it is parsed: every occurrence of the same term is the same object, which
+    saves memory on large queries. These terms are SharedRDFTerms, which cannot be changed in
+    place (that would change every occurrence): to rename a variable, put another RDFTerm in
+    the place of each occurrence to change (e.g., with a NodeTransformer).
+    expand_syntax_forms() expands them as usual.
+
+    If limits (awudima.sparql.limits.ParseLimits) are given, a text that is too long, has too
+    many tokens or too deeply nested brackets, or takes too long to parse, raises
+    ParseLimitExceeded (a SparqlSyntaxError) as soon as the limit is passed.
+
+    If a profile (awudima.sparql.profiling.ParseProfile) is given, the time spent lexing and
+    in each grammar production, and the nodes built, are counted in it for every parse.
+    """
+    tokenizers = ('ply', 'scanner')
+
+    def __init__(self, cache=None, tokenizer='ply', scan_values=True, intern_terms=False, limits=None,
+                 profile=None):
+        if tokenizer not in self.tokenizers:
+            raise ValueError("Unknown tokenizer '%s', expected one of: %s" % (tokenizer, ', '.join(self.tokenizers)))
+        self.cache = cache
+        self.tokenizer = tokenizer
+        self.scan_values = scan_values
+        self.intern_terms = intern_terms
+        self.limits = limits
+        self.profile = profile
+        self._local = threading.local()
+
+    def _new_lexer(self):
+        if self.tokenizer == 'scanner':
+            from awudima.sparql.tokenizer import SparqlTokenizer
+            return SparqlTokenizer(scan_values=self.scan_values)
+
+        lexer = _lexer.clone()
+        lexer.scan_values = self.scan_values
+        return lexer
+
+    def _instances(self):
+        local = self._local
+        try:
+            return local.lexer, local.parser
+        except AttributeError:
+            local.lexer = self._new_lexer()
+            local.parser = copy.copy(_sparql_parser)
+            if self.profile is not None:
+                local.record = self.profile.instrument(local.parser)
+            return local.lexer, local.parser
+
+    def _token_function(self, lexer):
+        # (a VALUES block of more values than max_tokens is not read in one go, so that the
+        # parse stops at max_tokens tokens)
+        if self.limits is None:
+            lexer.max_values = None
+            return None
+        lexer.max_values = self.limits.max_tokens
+        return self.limits.token_function(lexer)
+
+    def _run(self, parser, lexer, text):
+        tokenfunc = self._token_function(lexer)
+        if self.profile is None:
+            return parser.parse(text, lexer=lexer, tokenfunc=tokenfunc)
+        return self.profile.run(self._local.record, parser, lexer, text, tokenfunc)
+
+    def _parse(self, text):
+        lexer, parser = self._instances()
+        lexer.lineno = 1
+        lexer.terms = {} if self.intern_terms else None
+        try:
+            return self._run(parser, lexer, text)
+        except SparqlSyntaxError as e:
+            if e.expected is None:
+                # raised by p_error: the parser is in the state that rejected the token
+                e.expected = frozenset(parser.action[parser.statestack[-1]]) if parser.statestack else frozenset()
+            if e.line is None:
+                e.locate(text)
+            raise
+        finally:
+            lexer.terms = None
+
+    def parse_with_errors(self, text, max_errors=20):
+        """
+        Parses text, going on after syntax errors: (query, errors), the SparqlSyntaxErrors of
+        text in the order they were found (none if text is valid) and the query without the
+        parts that could not be read (a triple pattern, or a block of a group: a FILTER, BIND,
+        OPTIONAL, ... with an error in it), or None if nothing could be read. Only errors inside
+        the braces of a group are gone past: one in the SELECT clause, the solution modifiers
+        (GROUP BY, ORDER BY, LIMIT, ...), the VALUES after the query or text after its end stops
+        the parse, and the query is then None with the errors found up to it. The parse also
+        stops at max_errors errors (the query is then None). The cache is not used; a limit
+        passed raises ParseLimitExceeded.
+        """
+        if self.limits is not None:
+            self.limits.check_length(text)
+        lexer, parser = self._instances()
+        lexer.lineno = 1
+        lexer.terms = {} if self.intern_terms else None
+        _recovery.errors = errors = []
+        _recovery.parser = parser
+        _recovery.text = text
+        _recovery.max_errors = max_errors
+        _recovery.closers = 0
+        _recovery.closed_at = None
+        try:
+            query = self._run(parser, lexer, text)
+        except _TooManyErrors:
+            query = None
+        except SparqlSyntaxError as e:
+            # a limit passed
+            e.locate(text)
+            raise
+        finally:
+            lexer.terms = None
+            _recovery.errors = _recovery.parser = _recovery.text = None
+
+        return query, errors
+
+    def parse_template(self, text):
+        """
+        Parses the text of a query template (awudima.sparql.template): as parse(), but $-variables
+        are also read as values of VALUES data blocks, where they are placeholders. The cache is
+        not used.
+        """
+        if self.limits is not None:
+            self.limits.check_length(text)
+        lexer = self._instances()[0]
+        lexer.placeholders = True
+        try:
+            return self._parse(text)
+        finally:
+            lexer.placeholders = False
+
+    def parse(self, text):
+        if self.limits is not None:
+            self.limits.check_length(text)
+        if self.cache is None:
+            return self._parse(text)
+
+        key = normalize_query(text)
+        query = self.cache.get(key)
+        if query is None:
+            query = self._parse(text)
+            self.cache.put(key, query)
+
+        return query
+
+
+_default_parser = SparqlParser()
 
 
 def sparql(string):
-    global xstring
-    xstring = string
-    return _sparql_parser.parse(string, lexer=_lexer)
+    return _default_parser.parse(string)
 
 
 if __name__ == '__main__':
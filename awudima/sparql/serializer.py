@@ -0,0 +1,629 @@
+# -*- coding: utf-8 -*-
+"""
+Serialization of queries and query parts into one buffer.
+
+str(query) builds the text of every node from the texts of its children, concatenated with
++ at every level, and serializes the VALUES clause twice; a large query is copied over and
+over. serialize(node) writes the text of the tree in a single walk (with an explicit stack,
+so any depth) into one list of fragments, joined once at the end; serialize_to(node, write)
+gives the fragments to a writer callback instead (io.StringIO.write, a list's append, ...).
+
+write(node, fp) streams the text to a text or binary file or a socket, and chunks(node)
+yields it piece by piece (e.g., as the body of a chunked HTTP request), in chunks of about
+CHUNK_SIZE characters: the whole text is never in memory, not even for huge VALUES blocks,
+BGPs or UNIONs, whose rows, triple patterns or branches are serialized BATCH_SIZE at a time.
+
+    pretty=True     the text of str(node), character for character
+    pretty=False    compact: the same text on one line, every run of layout whitespace
+                    (outside IRIs and literals) written as one space, and none at the ends
+"""
+
+__author__ = 'Kemele M. Endris'
+
+import io
+
+from awudima.sparql import Query, SelectQuery, ConstructQuery, AskQuery, DescribeQuery, GGP, ValuesClause, GraphGP, \
+    ServiceGP, OptionalGP, UnionGP, MinusGP, BGP, Bind, Filter, TriplePattern, PropertyPath, PathTerm, RDFTerm, \
+    SharedRDFTerm, Expression, unary_operators, unary_expression_list, binary_operators, aggregate_functions, \
+    ternary_operators, quaternary_operators
+
+# Characters written at once by write() and chunks()
+CHUNK_SIZE = 64 * 1024
+# Rows of a VALUES block, triple patterns of a BGP, branches of a UNION, ... serialized at once
+BATCH_SIZE = 1000
+# Texts of terms kept for reuse while serializing (the terms of a query parsed with
+# SparqlParser(intern_terms=True) are shared); the cache is emptied when it grows past this size
+TERM_CACHE_SIZE = 4096
+
+_RDF_TYPE = '<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>'
+
+_NODES = (RDFTerm, TriplePattern, Expression, BGP, Filter, GGP, OptionalGP, UnionGP, MinusGP, GraphGP, ServiceGP, Bind,
+          PropertyPath, PathTerm, ValuesClause, Query)
+
+# Fragments pushed by the node writers are layout (str: keywords, punctuation and
+# whitespace, collapsed in compact mode), text (a 1-tuple: terms, literals and any other
+# text, always written as is) or nodes, written in their turn.
+
+
+def serialize(node, pretty=True):
+    """
+    The SPARQL text of a query or of any part of one
+    """
+    return ''.join(_fragments(node, pretty))
+
+
+def serialize_to(node, write, pretty=True):
+    """
+    Writes the SPARQL text of node with write(str), fragment by fragment
+    """
+    for fragment in _fragments(node, pretty):
+        write(fragment)
+
+
+def chunks(node, pretty=True, size=CHUNK_SIZE, encoding=None):
+    """
+    Yields the SPARQL text of node in chunks of about size characters, encoded if encoding
+    is given (e.g., the body of a chunked HTTP request)
+    """
+    buffered = []
+    length = 0
+    for fragment in _fragments(node, pretty):
+        buffered.append(fragment)
+        length += len(fragment)
+        if length >= size:
+            text = ''.join(buffered)
+            yield text.encode(encoding) if encoding else text
+            buffered = []
+            length = 0
+    if buffered:
+        text = ''.join(buffered)
+        yield text.encode(encoding) if encoding else text
+
+
+def write(node, fp, pretty=True, size=CHUNK_SIZE, encoding='utf-8'):
+    """
+    Writes the SPARQL text of node to fp in chunks of about size characters: a text file, a
+    binary file (encoded) or a socket (encoded, with sendall). The text is never held whole
+    in memory: long lists of rows, triple patterns or groups are written BATCH_SIZE at a
+    time.
+    """
+    mode = getattr(fp, 'mode', None)
+    if hasattr(fp, 'sendall'):
+        send, binary = fp.sendall, True
+    elif isinstance(fp, io.TextIOBase):
+        send, binary = fp.write, False
+    else:
+        send = fp.write
+        binary = isinstance(fp, (io.RawIOBase, io.BufferedIOBase)) or isinstance(mode, str) and 'b' in mode
+
+    for chunk in chunks(node, pretty, size, encoding if binary else None):
+        send(chunk)
+
+
+def _fragments(node, pretty):
+    writers = _WRITERS
+    term_texts = {}
+    compact_layout = _compact_layout
+    # compact mode: a space is due before the next fragment
+    pending = False
+    started = False
+
+    stack = [node]
+    pop = stack.pop
+    while stack:
+        item = pop()
+        kind = type(item)
+        if kind is str:
+            if pretty:
+                yield item
+                continue
+            layout = compact_layout.get(item)
+            if layout is None:
+                layout = compact_layout[item] = _compact(item)
+            text, leading, trailing = layout
+            if not text:
+                pending = pending or leading
+                continue
+            if started and (pending or leading):
+                yield ' '
+            yield text
+            pending = trailing
+            started = True
+            continue
+
+        if kind is tuple:
+            text = item[0]
+        elif kind is RDFTerm or kind is SharedRDFTerm:
+            # a term shared by several nodes (interned) is converted once
+            text = term_texts.get(id(item))
+            if text is None:
+                text = term_texts[id(item)] = item.to_str()
+        else:
+            writer = writers.get(kind, _writer)
+            if writer is _writer:
+                writer = _writer(kind)
+            if writer is not None:
+                if len(term_texts) > TERM_CACHE_SIZE:
+                    term_texts.clear()
+                fragments = writer(item, pretty, term_texts)
+                fragments.reverse()
+                stack.extend(fragments)
+                continue
+            text = str(item)
+
+        if not pretty:
+            if not text:
+                continue
+            if started and pending:
+                yield ' '
+            pending = False
+            started = True
+        yield text
+
+
+# layout -> (collapsed text, whether it starts with whitespace, whether it ends with it)
+_compact_layout = {}
+
+
+def _compact(layout):
+    return ' '.join(layout.split()), layout[:1].isspace(), layout[-1:].isspace()
+
+
+def _writer(cls):
+    """
+    The writer of a node class (subclasses use the writer of their base), None for
+    objects written as their str()
+    """
+    writer = None
+    for base in cls.__mro__:
+        if base in _WRITERS:
+            writer = _WRITERS[base]
+            break
+    _WRITERS[cls] = writer
+
+    return writer
+
+
+def _part(value):
+    # a child: a node, or the text of anything else
+    if isinstance(value, _NODES):
+        return value
+    return (str(value),)
+
+
+def _joined(values, separator, fragments):
+    """
+    Adds the fragments of values, separator between them, to fragments
+    """
+    if len(values) > BATCH_SIZE:
+        fragments.append(_Slice(_joined_items, values, 0, separator))
+        return fragments
+
+    for i, value in enumerate(values):
+        if i:
+            fragments.append(separator)
+        fragments.append(_part(value))
+
+    return fragments
+
+
+class _Slice(object):
+    """
+    items[start:] of a long list of children (triple patterns, rows of a VALUES table, UNION
+    branches, ...), written BATCH_SIZE at a time: write_items(items, start, end, separator,
+    pretty, terms) gives the fragments of items[start:end], preceded by separator unless
+    start is 0, and the rest stays a _Slice on the stack until it is reached
+    """
+    __slots__ = ('write_items', 'items', 'start', 'separator')
+
+    def __init__(self, write_items, items, start, separator):
+        self.write_items = write_items
+        self.items = items
+        self.start = start
+        self.separator = separator
+
+
+def _slice(batch, pretty, terms):
+    end = batch.start + BATCH_SIZE
+    items = batch.items
+    fragments = batch.write_items(items, batch.start, min(end, len(items)), batch.separator, pretty, terms)
+    if end < len(items):
+        fragments.append(_Slice(batch.write_items, items, end, batch.separator))
+
+    return fragments
+
+
+def _batched(write_items, items, separator, pretty, terms):
+    # the fragments of all the items, or of the first BATCH_SIZE and a _Slice for the rest
+    if len(items) > BATCH_SIZE:
+        return [_Slice(write_items, items, 0, separator)]
+    return write_items(items, 0, len(items), separator, pretty, terms)
+
+
+def _joined_items(items, start, end, separator, pretty, terms):
+    fragments = []
+    for i in range(start, end):
+        if i:
+            fragments.append(separator)
+        fragments.append(_part(items[i]))
+
+    return fragments
+
+
+#########################################################
+###############    Queries               #################
+#########################################################
+def _query(query, pretty, terms):
+    lines = []
+    for prefix in query.prefixes:
+        if prefix == '[BASE]':
+            lines.append('BASE : ' + query.prefixes[prefix] + '\n')
+        elif prefix == '<noname>':
+            lines.append('PREFIX : ' + query.prefixes[prefix] + '\n')
+        else:
+            lines.append('PREFIX ' + prefix + ': ' + query.prefixes[prefix] + '\n')
+    # prefix names and IRIs have no whitespace: all of it is layout
+    prefixes = ''.join(lines)
+    fragments = [(prefixes if pretty else ' '.join(prefixes.split()),), '\n']
+
+    form = _QUERY_FORMS.get(type(query))
+    if form is None:
+        fragments.append((query.to_str(),))
+    else:
+        form(query, fragments)
+    fragments.append('\n')
+
+    for keyword, conditions in (('GROUP BY ', query.group_by), ('ORDER BY ', query.order_by),
+                                ('HAVING ', query.having)):
+        if len(conditions) > 0:
+            fragments.append(keyword)
+            _joined(conditions, ' ', fragments).append('\n')
+    if query.limit > 0:
+        fragments.extend(['LIMIT ', (str(query.limit),), '\n'])
+    if query.offset > 0:
+        fragments.extend(['OFFSET ', (str(query.offset),), '\n'])
+
+    values = query.values_clause
+    if values is not None and (len(values.variables) > 0 or len(values.table) > 0):
+        fragments.extend(['\n', values])
+
+    return fragments
+
+
+def _dataset_clauses(query, fragments):
+    if query.dataset_clauses is not None and len(query.dataset_clauses) > 0:
+        _joined([str(d) for d in query.dataset_clauses], "'\n", fragments)
+
+
+def _select(query, fragments):
+    fragments.append('SELECT DISTINCT ' if query.distinct else 'SELECT ')
+    for projection in query.projections:
+        fragments.extend([_part(projection), ' '])
+    _dataset_clauses(query, fragments)
+    fragments.extend(['WHERE { \n', query.ggp, '\n}'])
+
+
+def _construct(query, fragments):
+    fragments.append('CONSTRUCT ')
+    if query.template is not None and isinstance(query.template, BGP):
+        fragments.append(' { \n')
+        _joined(query.template.triples, '. \n', fragments).append('\n}\n')
+    _dataset_clauses(query, fragments)
+    fragments.extend(['WHERE {\n', query.ggp, '\n}'])
+
+
+def _ask(query, fragments):
+    fragments.append('ASK ')
+    _dataset_clauses(query, fragments)
+    fragments.extend(['WHERE { \n', query.ggp, '\n}'])
+
+
+def _describe(query, fragments):
+    fragments.append('DESCRIBE ')
+    if len(query.iris) == 0:
+        fragments.append('* ')
+    else:
+        _joined(query.iris, ' ', fragments).append(' \n')
+    _dataset_clauses(query, fragments)
+    fragments.extend(['WHERE { \n', query.ggp, ' \n}'])
+
+
+_QUERY_FORMS = {
+    SelectQuery: _select,
+    ConstructQuery: _construct,
+    AskQuery: _ask,
+    DescribeQuery: _describe,
+}
+
+
+#########################################################
+###############    Graph patterns        #################
+#########################################################
+def _ggp(ggp, pretty, terms):
+    return _batched(_ggp_items, ggp.ggps, '\n', pretty, terms)
+
+
+def _ggp_items(ggps, start, end, separator, pretty, terms):
+    fragments = []
+    for i in range(start, end):
+        g = ggps[i]
+        if i:
+            fragments.append(separator)
+        if isinstance(g, GGP):
+            fragments.extend(['{', g, '}'])
+        else:
+            fragments.append(_part(g))
+
+    return fragments
+
+
+def _values_clause(clause, pretty, terms):
+    if len(clause.variables) == 0 and len(clause.table) == 0:
+        return []
+
+    fragments = ['VALUES ']
+    if len(clause.variables) > 0:
+        fragments.append('(')
+        _joined(clause.variables, ' ', fragments).append(') ')
+    else:
+        fragments.append('()')
+    if len(clause.table) > 0:
+        fragments.append('{')
+        fragments.extend(_batched(_row_items, clause.table, ' ', pretty, terms))
+        fragments.append('}')
+    else:
+        fragments.append('{}')
+
+    return fragments
+
+
+def _group(keyword, ggps, fragments):
+    fragments.append(keyword)
+    _joined(ggps, ' ', fragments).append(' }')
+    return fragments
+
+
+def _graph(graph, pretty, terms):
+    return _group('{', graph.ggps, ['GRAPH  ', _part(graph.var_or_iri)])
+
+
+def _service(service, pretty, terms):
+    return _group('{', service.ggps, ['SERVICE SILENT ' if service.silent else 'SERVICE ', _part(service.var_or_iri)])
+
+
+def _optional(optional, pretty, terms):
+    return _group('OPTIONAL {', optional.ggps, [])
+
+
+def _minus(minus, pretty, terms):
+    return _group('MINUS {', minus.ggps, [])
+
+
+def _union(union, pretty, terms):
+    fragments = ['\n']
+    fragments.extend(_batched(_union_items, union.ggps, ' \n UNION \n', pretty, terms))
+    fragments.append('\n')
+
+    return fragments
+
+
+def _union_items(ggps, start, end, separator, pretty, terms):
+    fragments = []
+    for i in range(start, end):
+        if i:
+            fragments.append(separator)
+        fragments.extend(['{', _part(ggps[i]), ' } '])
+
+    return fragments
+
+
+def _bgp(bgp, pretty, terms):
+    fragments = _batched(_triple_items, bgp.triples, ' . \n', pretty, terms)
+    fragments.append('\n')
+    _joined(bgp.filters, '\n', fragments).append(' ')
+
+    return fragments
+
+
+def _triple_items(triples, start, end, separator, pretty, terms):
+    texts = _triple_texts(triples[start:end], terms)
+    if texts is None:
+        return _joined_items(triples, start, end, separator, pretty, terms)
+
+    # the common case, triple patterns of terms: one text
+    fragments = [separator] if start else []
+    if texts:
+        fragments.append(((' . \n' if pretty else ' . ').join(texts),))
+    return fragments
+
+
+def _row_items(table, start, end, separator, pretty, terms):
+    fragments = [separator] if start else []
+    fragments.append((' '.join(table[start:end].rows_str()),))
+    return fragments
+
+
+def _flattened(fragments, terms):
+    """
+    The fragments of a node as one text when they are all layout, text or terms (whose
+    layout is single spaces, the same in both modes), else as they are
+    """
+    texts = []
+    for fragment in fragments:
+        kind = type(fragment)
+        if kind is str:
+            texts.append(fragment)
+            continue
+        if kind is tuple:
+            text = fragment[0]
+        elif kind is RDFTerm or kind is SharedRDFTerm:
+            text = terms.get(id(fragment))
+            if text is None:
+                text = terms[id(fragment)] = fragment.to_str()
+        else:
+            return fragments
+        if not text:
+            return fragments
+        texts.append(text)
+
+    return [(''.join(texts),)]
+
+
+def _triple_texts(triples, terms):
+    """
+    The texts of triple patterns made of RDFTerms only (none of them written as ''), or None
+    """
+    texts = []
+    for triple in triples:
+        if type(triple) is not TriplePattern:
+            return None
+        parts = []
+        for term in (triple.subject, triple.property, triple.object):
+            if type(term) is not RDFTerm and type(term) is not SharedRDFTerm:
+                return None
+            text = terms.get(id(term))
+            if text is None:
+                text = terms[id(term)] = term.to_str()
+            if not text:
+                return None
+            parts.append(text)
+        if parts[1] == _RDF_TYPE:
+            parts[1] = 'a'
+        texts.append(' '.join(parts))
+
+    return texts
+
+
+def _bind(bind, pretty, terms):
+    return _flattened(['BIND ('] + _operand(bind.expression, pretty, terms) + [' AS ', (str(bind.as_var),), ')'],
+                      terms)
+
+
+def _filter(node, pretty, terms):
+    return _flattened(['FILTER '] + _operand(node.expression, pretty, terms), terms)
+
+
+#########################################################
+###############    Triples and paths     #################
+#########################################################
+def _triple(triple, pretty, terms):
+    prop = triple.property
+    if type(prop) is RDFTerm or type(prop) is SharedRDFTerm:
+        is_type = prop.to_str() == _RDF_TYPE
+    else:
+        # a path: short, and hardly ever rdf:type alone
+        is_type = serialize(prop) == _RDF_TYPE
+    return _flattened([_part(triple.subject), ' ', ('a',) if is_type else _part(prop), ' ', _part(triple.object)],
+                      terms)
+
+
+def _property_path(path, pretty, terms):
+    if path.oper is None:
+        return _flattened([_part(path.left_path)], terms)
+    return _flattened([_part(path.left_path), (str(path.oper),), _part(path.right_path)], terms)
+
+
+def _path_term(term, pretty, terms):
+    fragments = [_part(term.path_term)]
+    if term.inverse is not None and term.inverse:
+        fragments.insert(0, ('^',))
+    if term.path_mode is not None:
+        fragments.append((str(term.path_mode),))
+
+    return _flattened(fragments, terms)
+
+
+#########################################################
+###############    Expressions           #################
+#########################################################
+UNARY, EXPRESSION_LIST, BINARY, AGGREGATE, TERNARY, QUATERNARY, OTHER = range(7)
+
+# operator -> the branch of Expression.to_str it takes
+_operator_kinds = {}
+
+
+def _operator_kind(oper):
+    upper = oper.upper()
+    if upper in unary_operators or oper in unary_operators:
+        return UNARY
+    if upper in unary_expression_list:
+        return EXPRESSION_LIST
+    if upper in binary_operators:
+        return BINARY
+    if upper in aggregate_functions:
+        return AGGREGATE
+    if upper in ternary_operators:
+        return TERNARY
+    if upper in quaternary_operators:
+        return QUATERNARY
+    return OTHER
+
+
+def _call(oper, arguments):
+    fragments = [(oper,), '(']
+    return _joined(arguments, ',', fragments) + [')']
+
+
+def _expression(expression, pretty, terms):
+    return _flattened(_expression_parts(expression), terms)
+
+
+def _operand(value, pretty, terms):
+    """
+    The fragments of an expression (without walking its operands), or of any other child
+    """
+    if isinstance(value, Expression):
+        return _expression(value, pretty, terms)
+    return [_part(value)]
+
+
+def _expression_parts(expression):
+    oper = expression.oper
+    kind = _operator_kinds.get(oper)
+    if kind is None:
+        kind = _operator_kinds[oper] = _operator_kind(oper)
+    left, right = expression.left_expr, expression.right_expr
+    ternary, quaternary = expression.ternary_expr, expression.quaternary_expr
+
+    if kind == UNARY:
+        return _call(oper, [left])
+    if kind == EXPRESSION_LIST:
+        return _joined(right, ', ', ['(', _part(left), ' ', (oper,), ' (']) + ['))']
+    if kind == BINARY:
+        return _call(oper, [left, right])
+    if kind == AGGREGATE:
+        if right is None:
+            return _call(oper, [left])
+        return [(oper,), '(', ('DISTINCT',) if isinstance(left, bool) else _part(left), ' ', _part(right), ')']
+    if kind == TERNARY:
+        return _call(oper, [left, right] + ([ternary] if ternary is not None else []))
+    if kind == QUATERNARY:
+        return _call(oper, [left, right, ternary, quaternary])
+
+    if ternary is not None:
+        return _call(oper, [left, right, ternary] + ([quaternary] if quaternary is not None else []))
+    if right is not None:
+        if isinstance(right, list):
+            return ['(', _part(left), ' ', (oper,), ' (', (','.join(right),), '))']
+        return ['(', _part(left), ' ', (oper,), ' ', _part(right), ')']
+    return ['(', (oper,), ' ', _part(left), ')']
+
+
+_WRITERS = {
+    Query: _query,
+    GGP: _ggp,
+    ValuesClause: _values_clause,
+    GraphGP: _graph,
+    ServiceGP: _service,
+    OptionalGP: _optional,
+    UnionGP: _union,
+    MinusGP: _minus,
+    BGP: _bgp,
+    Bind: _bind,
+    Filter: _filter,
+    TriplePattern: _triple,
+    PropertyPath: _property_path,
+    PathTerm: _path_term,
+    Expression: _expression,
+    _Slice: _slice,
+}
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Precompiled LALR tables for the SPARQL grammar in awudima.sparql.parser.
+
+The tables are generated once, at build time, into parsetab.pickle next to this file:
+
+    python -m awudima.sparql.tables           # regenerate awudima/sparql/parsetab.pickle
+    python -m awudima.sparql.tables --check   # exit with 1 if parsetab.pickle is stale
+
+Run it after every change to the grammar (the docstrings of the p_* rules, the token
+list or the start symbol). At import time the parser only compares the grammar
+signature against the shipped tables and never writes to disk.
+"""
+
+__author__ = 'Kemele M. Endris'
+
+import os
+import sys
+import warnings
+
+from ply import yacc
+
+TABLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parsetab.pickle')
+
+
+def _parser_module():
+    from awudima.sparql import parser
+    return parser
+
+
+def _module_dict(module):
+    return dict((k, getattr(module, k)) for k in dir(module))
+
+
+def grammar_signature(module):
+    """
+    Signature of the grammar defined in module, as computed by yacc
+    """
+    pinfo = yacc.ParserReflect(_module_dict(module), log=yacc.NullLogger())
+    pinfo.get_all()
+    return pinfo.signature()
+
+
+def _read_tables(tables_file=TABLES_FILE):
+    lr = yacc.LRTable()
+    try:
+        signature = lr.read_pickle(tables_file)
+    except (ImportError, yacc.VersionError):
+        return None, None
+
+    return lr, signature
+
+
+def load_parser(module, tables_file=TABLES_FILE):
+    """
+    Builds the LALR parser for the grammar in module from the precompiled tables.
+    If the tables are missing or stale, they are regenerated in memory (slow) and nothing is written.
+    """
+    lr, signature = _read_tables(tables_file)
+    if lr is not None and signature == grammar_signature(module):
+        pdict = _module_dict(module)
+        lr.bind_callables(pdict)
+        return yacc.LRParser(lr, pdict.get('p_error'))
+
+    warnings.warn("SPARQL parser tables in '%s' are missing or out of date, "
+                  "run: python -m awudima.sparql.tables" % tables_file)
+    return yacc.yacc(module=module, debug=False, write_tables=False, errorlog=yacc.NullLogger())
+
+
+def check_tables(module=None, tables_file=TABLES_FILE):
+    """
+    Returns True if the shipped tables match the current grammar and PLY table version
+    """
+    if module is None:
+        module = _parser_module()
+    lr, signature = _read_tables(tables_file)
+
+    return lr is not None and signature == grammar_signature(module)
+
+
+def build_tables(module=None, tables_file=TABLES_FILE):
+    """
+    (Re)generates the tables file. Returns False, and writes nothing, if it is already up to date.
+    """
+    if module is None:
+        module = _parser_module()
+    if check_tables(module, tables_file):
+        return False
+
+    yacc.yacc(module=module, debug=False, write_tables=False, picklefile=tables_file)
+    return True
+
+
+if __name__ == '__main__':
+    if '--check' in sys.argv[1:]:
+        if check_tables():
+            print(TABLES_FILE + ' is up to date')
+        else:
+            print(TABLES_FILE + ' is stale, run: python -m awudima.sparql.tables')
+            sys.exit(1)
+    else:
+        if build_tables():
+            print(TABLES_FILE + ' regenerated')
+        else:
+            print(TABLES_FILE + ' is up to date')
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Kemele M. Endris'
+
+import copy
+import io
+import math
+import pickle
+import re
+
+from awudima.sparql import RDFTerm, Bind, node_fields
+from awudima.sparql import parser
+from awudima.sparql.tokenizer import scan_values_block
+from awudima.sparql.values import UNDEF
+from awudima.sparql.visitor import walk
+
+_MARKER = '\x01'
+_MARKER_RE = re.compile(_MARKER + r'(\w+)' + _MARKER)
+_BLANK_NODE = re.compile(parser.t_BLANK_NODE_LABEL)
+# what a text that is meant as a term (and is not one) starts with
+_TERM_STARTS = ('<', '"', "'", '?', '$', '_:', '(', '[')
+_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'})
+# fields where a placeholder would be a variable that cannot be a constant: SELECT ?x,
+# VALUES ?x, GROUP BY ?x, ORDER BY ?x
+_VARIABLE_ONLY = ('projections', 'variables', 'GROUP BY', 'ORDER BY', 'group_by', 'order_by')
+
+
+def to_term(value):
+    """
+    Converts a binding value to an RDFTerm constant.
+        RDFTerm             a copy of it, if it is a constant
+        bool, int, float    boolean/numeric literal (finite floats)
+        str                 the term it is the SPARQL text of, if it is exactly one IRI,
+                            prefixed name, blank node, literal ('"chat"@fr', '"1"^^xsd:int'),
+                            number or boolean; otherwise, unless it starts as one of them,
+                            a plain literal of the text, escaped: 'Alice' -> "Alice"
+    Raises ValueError for anything else: a variable, a blank string, or a text that starts
+    as a term and is not exactly one (e.g., '<http://a> . ?x ?y ?z').
+    """
+    if isinstance(value, RDFTerm):
+        if not value.is_constant:
+            raise ValueError('Not a constant: %r' % (value,))
+        return copy.copy(value)
+    if isinstance(value, bool):
+        return RDFTerm('true' if value else 'false', is_const=True)
+    if isinstance(value, int):
+        return RDFTerm(str(value), is_const=True)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError('Not an RDF term: %r' % (value,))
+        return RDFTerm(repr(value), is_const=True)
+
+    value = str(value)
+    text = value.strip()
+    if not text:
+        raise ValueError('Not an RDF term: %r' % (value,))
+    if text in ('true', 'false'):
+        return RDFTerm(text, is_const=True)
+    if _BLANK_NODE.fullmatch(text):
+        return RDFTerm(text, is_const=True, is_bnode=True)
+    term = _scanned_term(text)
+    if term is not None:
+        return term
+    if text.startswith(_TERM_STARTS):
+        raise ValueError('Not an RDF term: %r' % (value,))
+
+    return RDFTerm('"' + value.translate(_ESCAPES) + '"', is_const=True)
+
+
+def _scanned_term(text):
+    """
+    The RDFTerm of text if it is exactly one value of a VALUES block (an IRI, a prefixed name,
+    a literal or a number), read as the parser reads them; None if not
+    """
+    data = ' ?x { ' + text + ' }'
+    try:
+        block = scan_values_block(data, 0)
+    except parser.SparqlSyntaxError:
+        return None
+    if block is None:
+        return None
+    table, end = block
+    if end != len(data) or len(table) != 1 or table.columns[0][0] == UNDEF:
+        return None
+
+    return table.dictionary.term(table.columns[0][0])
+
+
+def _is_placeholder(obj):
+    return isinstance(obj, RDFTerm) and not obj.is_constant and obj.value[:1] == '$'
+
+
+def find_placeholders(node, path=(), found=None):
+    """
+    Returns {name: [path, ...]} for every $name placeholder in the tree rooted at node.
+    A path is the tuple of attribute names and list indexes leading to the RDFTerm slot,
+    e.g., ('ggp', 'ggps', 0, 'triples', 1, 'object').
+    """
+    if found is None:
+        found = {}
+    if _is_placeholder(node):
+        found.setdefault(node.value[1:], []).append(path)
+    elif isinstance(node, (list, tuple)):
+        for i, child in enumerate(node):
+            find_placeholders(child, path + (i,), found)
+    elif isinstance(node, dict):
+        for key, child in node.items():
+            find_placeholders(child, path + (key,), found)
+    elif hasattr(node, '__dict__') or hasattr(node, '__slots__'):
+        for key, child in node_fields(node):
+            find_placeholders(child, path + (key,), found)
+
+    return found
+
+
+class _TemplatePickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if _is_placeholder(obj):
+            return obj.value[1:]
+        return None
+
+
+class QueryTemplate(object):
+    """
+    A query parsed once, with named placeholders, that can be bound to constants many times
+    without going through the lexer and the parser again.
+
+    Placeholders are written as $-variables, e.g.,
+
+        template = QueryTemplate('SELECT ?name WHERE { $person foaf:name ?name . FILTER(?age > $age) }')
+        query = template.bind(person='<http://example.org/alice>', age=30)   # SelectQuery
+        text = template.bind_str(person='<http://example.org/alice>', age=30)
+
+    They can appear wherever a constant can (triple patterns, FILTER expressions, ...) and
+    as the values of VALUES blocks, but not where only a variable can (SELECT $x, AS $x,
+    BIND(... AS $x), VALUES $x, GROUP BY $x, ORDER BY $x): that raises ValueError. The slots
+    they occupy in the parsed tree are listed in self.slots. The values they are bound to go
+    through to_term, so that each is exactly one constant.
+    """
+    def __init__(self, text, sparql_parser=None):
+        if sparql_parser is None:
+            sparql_parser = parser.SparqlParser()
+
+        self.query = sparql_parser.parse_template(text)
+        self.slots = find_placeholders(self.query)
+        self.params = sorted(self.slots)
+        self._check_slots()
+
+        buf = io.BytesIO()
+        _TemplatePickler(buf, pickle.HIGHEST_PROTOCOL).dump(self.query)
+        self._blob = buf.getvalue()
+
+        markers = dict((name, RDFTerm(_MARKER + name + _MARKER, is_const=True)) for name in self.params)
+        parts = _MARKER_RE.split(str(self._load(markers)))
+        self._segments = parts[0::2]
+        self._names = parts[1::2]
+
+    def _check_slots(self):
+        for name, paths in self.slots.items():
+            for path in paths:
+                if len(path) >= 2 and path[-2] in _VARIABLE_ONLY \
+                        or len(path) >= 3 and path[-3] == 'projections' and path[-1] == 'right_expr':
+                    raise ValueError('Placeholder $%s is where only a variable can be (%s)'
+                                     % (name, ' '.join(str(key) for key in path)))
+        for node in walk(self.query):
+            if isinstance(node, Bind) and str(node.as_var)[:1] == '$':
+                raise ValueError('Placeholder %s is where only a variable can be (BIND ... AS)' % node.as_var)
+
+    def _load(self, terms):
+        unpickler = pickle.Unpickler(io.BytesIO(self._blob))
+        unpickler.persistent_load = terms.__getitem__
+        return unpickler.load()
+
+    def _check(self, values):
+        missing = [name for name in self.params if name not in values]
+        if missing:
+            raise KeyError('No value given for placeholder(s): ' + ', '.join('$' + m for m in missing))
+        unknown = [name for name in values if name not in self.slots]
+        if unknown:
+            raise KeyError('Unknown placeholder(s): ' + ', '.join('$' + u for u in unknown))
+
+    @staticmethod
+    def _terms(values):
+        terms = {}
+        for name, value in values.items():
+            try:
+                terms[name] = to_term(value)
+            except ValueError:
+                raise ValueError('Bad value for placeholder $%s: %r' % (name, value))
+        return terms
+
+    def bind(self, values=None, **kwargs):
+        """
+        Returns a new query object with every placeholder replaced by its value (see to_term)
+        """
+        values = dict(values or {}, **kwargs)
+        self._check(values)
+
+        return self._load(self._terms(values))
+
+    def bind_str(self, values=None, **kwargs):
+        """
+        Returns the serialized query with every placeholder replaced by its value (see to_term)
+        """
+        values = dict(values or {}, **kwargs)
+        self._check(values)
+
+        terms = dict((name, str(term)) for name, term in self._terms(values).items())
+        segments = self._segments
+        out = [segments[0]]
+        for i, name in enumerate(self._names):
+            out.append(terms[name])
+            out.append(segments[i + 1])
+
+        return ''.join(out)
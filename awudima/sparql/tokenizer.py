@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Hand-written, single pass tokenizer for the lexer rules (t_*) of awudima.sparql.parser.
+
+PLY joins all t_* rules into one master regex and tries its ~80 alternatives, in order,
+at every position. Here the first character of the token selects the few rules that can
+start with it, kept in the same order as in PLY's master regex (function rules first, then
+string rules by decreasing regex length), so the first one that matches is the one PLY
+would pick and both produce the same token stream. Single character tokens are emitted
+without running any regex.
+
+Note the order makes some rules unreachable, exactly as with PLY: 'true', 'false' and
+'_:label' are matched by t_ID, and '||' by t_PIPE.
+
+scan_values_block reads a whole VALUES data block with the same rules, straight into a
+columnar ValuesTable (see awudima.sparql.values); both lexers use it, when enabled, to
+return the block as a single VALUES_BLOCK token.
+"""
+
+__author__ = 'Kemele M. Endris'
+
+import copy
+import re
+
+from ply import lex
+
+from awudima.sparql import parser
+from awudima.sparql.values import ValuesTable, UNDEF, IRI, PREFIXED_NAME, LITERAL, LANG_LITERAL, TYPED_LITERAL
+
+
+def _rule(name):
+    if name == 'ID':
+        regex = parser.t_ID.__doc__
+    else:
+        regex = getattr(parser, 't_' + name)
+    return name, re.compile(regex, re.VERBOSE)
+
+
+_ID = _rule('ID')[1]
+_COMMENT = re.compile(parser.t_ignore_COMMENT, re.VERBOSE)
+_IGNORE = parser.t_ignore
+_reserved = parser.reserved
+LexToken = lex.LexToken
+
+_SINGLE = {
+    '^': 'CARRET',
+    '|': 'PIPE',
+    ':': 'COLON',
+    '*': 'ALL',
+    ')': 'RPAR',
+    '{': 'LKEY',
+    '}': 'RKEY',
+    ']': 'RBRC',
+    ';': 'SEMI_COLON',
+    ',': 'COMA',
+    '=': 'EQUALSSYM',
+    '/': 'ART_DIV'
+}
+
+# (rules tried in order, single character token used when none of them matches)
+_DISPATCH = {
+    '+': ([_rule('DOUBLE_POSITIVE'), _rule('DECIMAL_POSITIVE'), _rule('INTEGER_POSITIVE')], 'ART_PLUS'),
+    '-': ([_rule('DOUBLE_NEGATIVE'), _rule('DECIMAL_NEGATIVE'), _rule('INTEGER_NEGATIVE')], 'ART_MINUS'),
+    '.': ([_rule('DOUBLE_POSITIVE'), _rule('DOUBLE_NEGATIVE'), _rule('DOUBLE'), _rule('DECIMAL')], 'POINT'),
+    '"': ([_rule('STRING_LITERAL_LONG2'), _rule('STRING_LITERAL2')], None),
+    "'": ([_rule('STRING_LITERAL_LONG1'), _rule('STRING_LITERAL1')], None),
+    '<': ([_rule('IRIREF'), _rule('LESSEQ')], 'LESS'),
+    '>': ([_rule('GREATEREQ')], 'GREATER'),
+    '?': ([_rule('VAR'), _rule('QMARK')], None),
+    '$': ([_rule('VAR')], None),
+    '@': ([_rule('LANGTAG')], None),
+    '(': ([_rule('NIL')], 'LPAR'),
+    '[': ([_rule('ANON')], 'LBRC'),
+    '!': ([_rule('NEQUALSSYM')], 'NEG'),
+    '&': ([_rule('ANDSYMB')], None),
+}
+_NUMBER = ([_rule('DOUBLE_POSITIVE'), _rule('DOUBLE_NEGATIVE'), _rule('DOUBLE'),
+            _rule('DECIMAL'), _rule('INTEGER')], None)
+for _c in '0123456789':
+    _DISPATCH[_c] = _NUMBER
+
+_ID_START = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_')
+
+
+class SparqlTokenizer(object):
+    """
+    Drop-in replacement of the PLY lexer built from awudima.sparql.parser, for yacc:
+    input(), token(), clone() and the lexdata, lexpos and lineno attributes.
+    Syntax errors are reported through parser.t_error, as with PLY.
+    """
+    def __init__(self, scan_values=False):
+        self.lexdata = None
+        self.lexpos = 0
+        self.lexlen = 0
+        self.lineno = 1
+        self.scan_values = scan_values
+        self.max_values = None
+        self.terms = None
+
+    def clone(self):
+        return copy.copy(self)
+
+    def input(self, data):
+        self.lexdata = data
+        self.lexpos = 0
+        self.lexlen = len(data)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.token()
+        if t is None:
+            raise StopIteration
+        return t
+
+    def token(self):
+        data = self.lexdata
+        pos = self.lexpos
+        n = self.lexlen
+        while pos < n:
+            c = data[pos]
+            if c in _IGNORE:
+                pos += 1
+                continue
+
+            tok = LexToken()
+            tok.lineno = self.lineno
+            tok.lexpos = pos
+            if c in _ID_START:
+                tok.value = value = _ID.match(data, pos).group()
+                tok.type = _reserved.get(value.upper(), 'ID')
+                self.lexpos = pos + len(value)
+                if tok.type == 'VALUES' and self.scan_values:
+                    block = scan_values_block(data, self.lexpos, self.max_values, self.terms)
+                    if block is not None:
+                        tok.type = 'VALUES_BLOCK'
+                        tok.value, self.lexpos = block
+                return tok
+
+            single = _SINGLE.get(c)
+            if single is not None:
+                tok.type = single
+                tok.value = c
+                self.lexpos = pos + 1
+                return tok
+
+            if c == '#':
+                pos = _COMMENT.match(data, pos).end()
+                continue
+
+            rules, fallback = _DISPATCH.get(c, ((), None))
+            for name, cre in rules:
+                m = cre.match(data, pos)
+                if m:
+                    tok.type = name
+                    tok.value = value = m.group()
+                    self.lexpos = pos + len(value)
+                    return tok
+            if fallback is not None:
+                tok.type = fallback
+                tok.value = c
+                self.lexpos = pos + 1
+                return tok
+
+            # no rule matches: same error handling as PLY
+            tok.type = 'error'
+            tok.value = data[pos:]
+            tok.lexer = self
+            self.lexpos = pos
+            newtok = parser.t_error(tok)
+            if pos == self.lexpos:
+                raise lex.LexError("Scanning error. Illegal character '%s'" % (data[pos]), data[pos:])
+            pos = self.lexpos
+            if newtok:
+                return newtok
+
+        self.lexpos = pos + 1
+        if self.lexdata is None:
+            raise RuntimeError('No input string given with input()')
+        return None
+
+
+_STRINGS = frozenset(['STRING_LITERAL1', 'STRING_LITERAL2', 'STRING_LITERAL_LONG1', 'STRING_LITERAL_LONG2'])
+_NUMBERS = frozenset(['INTEGER', 'DECIMAL', 'DOUBLE', 'INTEGER_POSITIVE', 'DECIMAL_POSITIVE', 'DOUBLE_POSITIVE',
+                      'INTEGER_NEGATIVE', 'DECIMAL_NEGATIVE', 'DOUBLE_NEGATIVE'])
+
+
+def _next_token(data, pos, n):
+    """
+    (type, value, end) of the first token at or after pos, as SparqlTokenizer.token() reads it;
+    type is None at the end of data or where no rule matches.
+    """
+    while pos < n:
+        c = data[pos]
+        if c in _IGNORE:
+            pos += 1
+            continue
+        if c in _ID_START:
+            value = _ID.match(data, pos).group()
+            return _reserved.get(value.upper(), 'ID'), value, pos + len(value)
+        single = _SINGLE.get(c)
+        if single is not None:
+            return single, c, pos + 1
+        if c == '#':
+            pos = _COMMENT.match(data, pos).end()
+            continue
+        rules, fallback = _DISPATCH.get(c, ((), None))
+        for name, cre in rules:
+            m = cre.match(data, pos)
+            if m:
+                return name, m.group(), m.end()
+        if fallback is not None:
+            return fallback, c, pos + 1
+        break
+
+    return None, None, pos
+
+
+def _scan_iri(data, t, v, pos, n):
+    """
+    Reads an iri (IRIREF, ID COLON ID, COLON ID or COLON) starting with token (t, v).
+    Returns (text, kind, next token type, value, end), text is None if there is no iri.
+    """
+    nt, nv, npos = _next_token(data, pos, n)
+    if t == 'IRIREF':
+        return v, IRI, nt, nv, npos
+    if t == 'ID':
+        if nt != 'COLON':
+            return None, None, nt, nv, npos
+        nt, nv, npos = _next_token(data, npos, n)
+        if nt != 'ID':
+            return None, None, nt, nv, npos
+        text = v + ':' + nv
+    elif t == 'COLON':
+        if nt != 'ID':
+            return ':', PREFIXED_NAME, nt, nv, npos
+        text = ':' + nv
+    else:
+        return None, None, nt, nv, npos
+
+    nt, nv, npos = _next_token(data, npos, n)
+    return text, PREFIXED_NAME, nt, nv, npos
+
+
+def _scan_term(data, t, v, pos, n, intern):
+    """
+    Reads a data block value starting with token (t, v) and interns it.
+    Returns (term id, next token type, value, end), term id is None if there is no value.
+    """
+    if t in _STRINGS:
+        nt, nv, npos = _next_token(data, pos, n)
+        if nt == 'LANGTAG':
+            nt2, nv2, npos2 = _next_token(data, npos, n)
+            return intern(v + nv, LANG_LITERAL), nt2, nv2, npos2
+        if nt == 'CARRET':
+            nt, nv, npos = _next_token(data, npos, n)
+            if nt != 'CARRET':
+                return None, nt, nv, npos
+            nt, nv, npos = _next_token(data, npos, n)
+            datatype, _, nt, nv, npos = _scan_iri(data, nt, nv, npos, n)
+            if datatype is None:
+                return None, nt, nv, npos
+            return intern(v + '^^' + datatype, TYPED_LITERAL), nt, nv, npos
+        return intern(v, LITERAL), nt, nv, npos
+
+    if t in _NUMBERS:
+        nt, nv, npos = _next_token(data, pos, n)
+        return intern(v, LITERAL), nt, nv, npos
+    if t == 'UNDEF':
+        nt, nv, npos = _next_token(data, pos, n)
+        return UNDEF, nt, nv, npos
+
+    text, kind, nt, nv, npos = _scan_iri(data, t, v, pos, n)
+    if text is None:
+        return None, nt, nv, npos
+    return intern(text, kind), nt, nv, npos
+
+
+def scan_values_block(data, pos, max_values=None, terms=None):
+    """
+    Reads the data block of a VALUES clause, from pos (right after the VALUES keyword) to its
+    closing '}', into a ValuesTable, without going through the parser.
+
+    Returns (table, end), or None if the block is not a plain one: placeholders ($var values),
+    NIL rows, rows that do not have one value per variable, or anything that is not valid
+    SPARQL. Those are left to the grammar, which builds (or rejects) them as before. So are
+    blocks of more than max_values values, if given: the reading stops there. The variables
+    are interned in terms, if given (the terms table of the query, see SparqlParser).
+    """
+    n = len(data)
+    t, v, pos = _next_token(data, pos, n)
+    one_var = t == 'VAR'
+    if one_var:
+        variables = [parser._interned(terms, v, False)]
+    elif t == 'NIL':
+        variables = []
+    elif t == 'LPAR':
+        variables = []
+        t, v, pos = _next_token(data, pos, n)
+        while t == 'VAR':
+            variables.append(parser._interned(terms, v, False))
+            t, v, pos = _next_token(data, pos, n)
+        if t != 'RPAR':
+            return None
+    else:
+        return None
+
+    t, v, pos = _next_token(data, pos, n)
+    if t != 'LKEY':
+        return None
+
+    table = ValuesTable(variables)
+    intern = table.dictionary.intern
+    t, v, pos = _next_token(data, pos, n)
+    if one_var:
+        column = table.columns[0]
+        while t != 'RKEY':
+            tid, t, v, pos = _scan_term(data, t, v, pos, n, intern)
+            if tid is None:
+                return None
+            column.append(tid)
+            if max_values is not None and len(column) > max_values:
+                return None
+        table.size = len(column)
+        return table, pos
+
+    columns = table.columns
+    arity = len(columns)
+    while t == 'LPAR':
+        t, v, pos = _next_token(data, pos, n)
+        i = 0
+        while t != 'RPAR':
+            if i == arity:
+                return None
+            tid, t, v, pos = _scan_term(data, t, v, pos, n, intern)
+            if tid is None:
+                return None
+            columns[i].append(tid)
+            i += 1
+        if i != arity:
+            return None
+        table.size += 1
+        if max_values is not None and table.size * arity > max_values:
+            return None
+        t, v, pos = _next_token(data, pos, n)
+    if t != 'RKEY':
+        return None
+
+    return table, pos
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar storage of VALUES data blocks.
+
+A block is kept as one array of term ids per variable; the ids index a dictionary of the
+distinct terms of the block, stored as their SPARQL text. RDFTerm objects are only built
+when rows are read (and then once per distinct term), and the block is serialized from
+the arrays and the term texts, without going through the RDFTerm objects.
+"""
+
+__author__ = 'Kemele M. Endris'
+
+from array import array
+
+from awudima.sparql import RDFTerm
+
+# Term id of UNDEF cells
+UNDEF = -1
+
+# Kinds of terms, they tell how to build the RDFTerm of a term text
+IRI = 0
+PREFIXED_NAME = 1
+LITERAL = 2
+LANG_LITERAL = 3
+TYPED_LITERAL = 4
+# Terms kept as the RDFTerm object they were given as: placeholders of query templates
+# ($-variables, see awudima.sparql.template) and terms that have no plain SPARQL text
+# (blank nodes, expanded prefixed names). Their text is the one of the object.
+VAR = 5
+TERM = 6
+
+
+class TermDictionary(object):
+    """
+    Interned terms: SPARQL text of a term <-> integer id.
+    """
+    __slots__ = ('ids', 'texts', 'kinds', '_terms', '_objects', '_strings')
+
+    def __init__(self):
+        self.ids = {}
+        self.texts = []
+        self.kinds = bytearray()
+        self._terms = []
+        # ids of VAR and TERM terms
+        self._objects = []
+        # see strings()
+        self._strings = ['UNDEF']
+
+    def __len__(self):
+        return len(self.texts)
+
+    def intern(self, text, kind):
+        tid = self.ids.get(text)
+        if tid is None:
+            tid = self.ids[text] = len(self.texts)
+            self.texts.append(text)
+            self.kinds.append(kind)
+            self._terms.append(None)
+
+        return tid
+
+    def intern_term(self, term):
+        """
+        Interns an RDFTerm, 'UNDEF' or None (UNDEF) and returns its id
+        """
+        if not isinstance(term, RDFTerm):
+            if term is None or isinstance(term, str) and term.upper() == 'UNDEF':
+                return UNDEF
+            raise TypeError('VALUES data must be RDFTerm or UNDEF, not %r' % (term,))
+
+        if term._is_expanded or not term.is_constant or term.is_bnode or term.is_nil:
+            return self._intern_object(term)
+        if term.is_iri:
+            if term.prefix is not None:
+                text, kind = term.value, PREFIXED_NAME
+            else:
+                text, kind = '<' + term.value + '>', IRI
+        elif term.lang_tag is not None:
+            text, kind = term.value + '@' + term.lang_tag, LANG_LITERAL
+        elif term.is_typed_literal:
+            text, kind = term.value + '^^' + term.xsd_datatype, TYPED_LITERAL
+        else:
+            text, kind = term.value, LITERAL
+
+        # the RDFTerm is not kept: it is built again from the text when read
+        tid = self.ids.get(text)
+        if tid is None:
+            tid = self.intern(text, kind)
+
+        return tid
+
+    def _intern_object(self, term):
+        if term.is_constant:
+            tid = self.intern('\x00' + term.to_str(), TERM)
+        else:
+            tid = self.intern(term.value, VAR)
+        if self._terms[tid] is None:
+            self._terms[tid] = term
+            self._objects.append(tid)
+
+        return tid
+
+    def text(self, tid):
+        if tid == UNDEF:
+            return 'UNDEF'
+        if self.kinds[tid] >= VAR:
+            return self._terms[tid].to_str()
+        return self.texts[tid]
+
+    def strings(self):
+        """
+        The SPARQL text of every term, by id, followed by 'UNDEF' (so that UNDEF, -1,
+        indexes it as well). The list is kept and extended by later calls: it is not to be modified.
+        """
+        strings = self._strings
+        if len(strings) <= len(self.texts):
+            strings.pop()
+            strings.extend(self.texts[len(strings):])
+            strings.append('UNDEF')
+        for tid in self._objects:
+            strings[tid] = self._terms[tid].to_str()
+
+        return strings
+
+    def term(self, tid):
+        """
+        The RDFTerm of a term id, as the parser builds it ('UNDEF' for UNDEF)
+        """
+        if tid == UNDEF:
+            return 'UNDEF'
+
+        term = self._terms[tid]
+        if term is None:
+            text = self.texts[tid]
+            kind = self.kinds[tid]
+            if kind == IRI:
+                term = RDFTerm(text, is_const=True, is_iri=True)
+            elif kind == PREFIXED_NAME:
+                term = RDFTerm(text, is_const=True, is_iri=True, prefix=text.split(':', 1)[0])
+            elif kind == LANG_LITERAL:
+                i = text.rfind('@')
+                term = RDFTerm(text[:i], is_const=True, lang_tag=text[i + 1:])
+            elif kind == TYPED_LITERAL:
+                i = text.rfind('^^')
+                term = RDFTerm(text[:i], is_const=True, xsd_datatype=text[i + 2:])
+            else:
+                term = RDFTerm(text, is_const=True)
+            self._terms[tid] = term
+
+        return term
+
+    def expand_syntax_forms(self, prefixes):
+        """
+        Expands the prefixed names of the dictionary; their terms are kept as objects from then on
+        """
+        for tid, kind in enumerate(self.kinds):
+            if kind == PREFIXED_NAME:
+                self.term(tid).expand_syntax_forms(prefixes)
+                self.kinds[tid] = TERM
+                self._objects.append(tid)
+
+
+class ValuesRow(list):
+    """
+    A row read from a ValuesTable: a list that cannot be changed, as changing it would not
+    change the table (see ValuesTable.append, ValuesClause.values)
+    """
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('VALUES rows are read-only: append rows or set ValuesClause.values')
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+
+    def __reduce__(self):
+        return ValuesRow, (list(self),)
+
+
+class ValuesTable(object):
+    """
+    Rows of a VALUES data block stored by column: columns[i] holds the term ids of
+    variables[i] for every row, in a TermDictionary that can be shared by several tables
+    (e.g., the batches of a bind join).
+
+    Reads like the list of rows the parser used to build for a data block: len(), iteration
+    and indexing give read-only lists (ValuesRow) of RDFTerm (or 'UNDEF'); slicing gives a
+    table over the same dictionary. A ValuesClause keeps its variables here.
+    """
+    __slots__ = ('variables', 'dictionary', 'columns', 'size')
+
+    def __init__(self, variables, dictionary=None):
+        self.variables = variables
+        self.dictionary = dictionary if dictionary is not None else TermDictionary()
+        self.columns = [array('i') for _ in variables]
+        self.size = 0
+
+    @classmethod
+    def from_rows(cls, variables, rows, dictionary=None):
+        table = cls(variables, dictionary)
+        for row in rows:
+            table.append(row)
+
+        return table
+
+    def __len__(self):
+        return self.size
+
+    def set_variables(self, variables):
+        """
+        Sets the variables of the table: as many as there are columns, unless the table has no
+        rows yet
+        """
+        if len(variables) != len(self.columns):
+            if self.size:
+                raise ValueError('%d VALUES variables for rows of %d values' % (len(variables), len(self.columns)))
+            self.columns = [array('i') for _ in variables]
+        self.variables = variables
+
+    def append(self, row):
+        """
+        Adds a row given as one RDFTerm, 'UNDEF' or None (UNDEF) per variable
+        """
+        if len(row) != len(self.columns):
+            raise ValueError('VALUES row with %d values for %d variables' % (len(row), len(self.columns)))
+        intern = self.dictionary.intern_term
+        for column, term in zip(self.columns, row):
+            column.append(intern(term))
+        self.size += 1
+
+    def append_ids(self, ids):
+        """
+        Adds a row given as one term id per variable
+        """
+        for column, tid in zip(self.columns, ids):
+            column.append(tid)
+        self.size += 1
+
+    def set(self, i, j, term):
+        """
+        Sets the cell of row i for variables[j] to an RDFTerm, 'UNDEF' or None (UNDEF)
+        """
+        self.columns[j][i] = self.dictionary.intern_term(term)
+
+    def row(self, i):
+        term = self.dictionary.term
+        return ValuesRow([term(column[i]) for column in self.columns])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            table = ValuesTable(self.variables, self.dictionary)
+            table.columns = [column[i] for column in self.columns]
+            table.size = len(range(self.size)[i])
+            return table
+
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('row index out of range')
+        return self.row(i)
+
+    def __iter__(self):
+        term = self.dictionary.term
+        if not self.columns:
+            return iter([ValuesRow() for _ in range(self.size)])
+        return (ValuesRow([term(tid) for tid in ids]) for ids in zip(*self.columns))
+
+    def batches(self, size):
+        """
+        Consecutive slices of (at most) size rows
+        """
+        for start in range(0, self.size, size):
+            yield self[start:start + size]
+
+    def rows_str(self):
+        """
+        The rows of the block in SPARQL syntax, '(v1 v2 ...)' each
+        """
+        if not self.columns:
+            return ['()'] * self.size
+
+        strings = self.dictionary.strings()
+        if len(self.columns) == 1:
+            cells = map(strings.__getitem__, self.columns[0])
+        else:
+            cells = map(' '.join, zip(*[map(strings.__getitem__, column) for column in self.columns]))
+
+        return ['(' + cell + ')' for cell in cells]
+
+    def __eq__(self, other):
+        if not isinstance(other, ValuesTable):
+            return NotImplemented
+        if self.size != other.size or [str(v) for v in self.variables] != [str(v) for v in other.variables]:
+            return False
+        text, other_text = self.dictionary.text, other.dictionary.text
+        for column, other_column in zip(self.columns, other.columns):
+            if self.dictionary is other.dictionary:
+                if column != other_column:
+                    return False
+            elif [text(t) for t in column] != [other_text(t) for t in other_column]:
+                return False
+
+        return True
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'ValuesTable(%s, %d rows)' % (' '.join(str(v) for v in self.variables), self.size)
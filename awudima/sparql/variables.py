@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Variables bound by a query or a part of it, as frozensets of names ('?x'):
+
+    certain_variables(node)     bound in every solution of the node
+    possible_variables(node)    bound in some solution (a superset of the certain ones)
+    bound_variables(node)       both, (certain, possible)
+
+They are collected in one pass over the subtree, with an explicit stack (no recursion, at
+any depth). The sets of frozen nodes (awudima.sparql.frozen) are computed once, bottom-up,
+and kept on the node, so asking again for a frozen subtree, for a part of it or for a tree
+that contains it does not walk it again; mutable nodes are walked on every call, as they
+may have changed since.
+
+Triple patterns and GRAPH ?g bind their variables; OPTIONAL, BIND and the UNDEF columns of
+VALUES bind them possibly; UNION binds certainly what all its branches bind; FILTER, MINUS
+and SERVICE ?s bind nothing of their own.
+"""
+
+__author__ = 'Kemele M. Endris'
+
+from awudima.sparql import RDFTerm, SharedRDFTerm, TriplePattern, PathTerm, PropertyPath, Bind, BGP, GGP, OptionalGP, \
+    UnionGP, MinusGP, GraphGP, ServiceGP, ValuesClause, Query, SelectQuery
+from awudima.sparql.frozen import _Frozen
+from awudima.sparql.values import UNDEF
+from awudima.sparql.visitor import walk
+
+# nodes whose sets are kept when they are frozen (the others bind nothing, or are terms)
+_KEPT = (TriplePattern, PathTerm, PropertyPath, Bind, BGP, GGP, OptionalGP, UnionGP, MinusGP, GraphGP, ServiceGP,
+         ValuesClause)
+# marks, on the stack of _collect, the end of the branches of a UNION
+_UNION_END = object()
+
+
+def certain_variables(node):
+    return bound_variables(node)[0]
+
+
+def possible_variables(node):
+    return bound_variables(node)[1]
+
+
+def bound_variables(node):
+    """
+    (certain, possible) variables of node
+    """
+    if not isinstance(node, _Frozen):
+        return _sets(node)
+
+    cached = getattr(node, '_variables', None)
+    if cached is None:
+        # every frozen node under it first, children before their parents (walk is
+        # depth-first, parents first), each from the sets of its children
+        for child in reversed(list(walk(node))):
+            if isinstance(child, _KEPT) and getattr(child, '_variables', None) is None:
+                object.__setattr__(child, '_variables', _sets(child))
+        cached = getattr(node, '_variables', None)
+        if cached is None:
+            cached = _sets(node)
+            object.__setattr__(node, '_variables', cached)
+
+    return cached
+
+
+def _sets(node):
+    certain, possible = set(), set()
+    _collect(node, certain, possible)
+    return frozenset(certain), frozenset(possible | certain)
+
+
+# kinds of nodes in _collect, by class (frozen nodes and subclasses are found by _kind)
+(_TERM, _GROUPS, _TRIPLE, _PATH_TERM, _PATH, _OPTIONAL, _UNION, _GRAPH, _GROUP, _BIND, _VALUES, _QUERY, _FROZEN,
+ _NOTHING) = range(14)
+_KINDS = [(RDFTerm, _TERM), (BGP, _GROUPS), (list, _GROUPS), (TriplePattern, _TRIPLE), (PathTerm, _PATH_TERM),
+          (PropertyPath, _PATH), (OptionalGP, _OPTIONAL), (UnionGP, _UNION), (GraphGP, _GRAPH), (GGP, _GROUP),
+          (ServiceGP, _GROUP), (Bind, _BIND), (ValuesClause, _VALUES), (Query, _QUERY)]
+_KIND_OF = dict((cls, kind) for cls, kind in _KINDS if cls is not Query)
+_KIND_OF[SharedRDFTerm] = _TERM
+
+
+def _kind(node):
+    for cls, kind in _KINDS:
+        if isinstance(node, cls):
+            return kind
+    return _NOTHING
+
+
+def _collect(root, certain, possible):
+    """
+    Adds the variables of root to certain and possible. The stack holds (node, the sets its
+    variables go to); frozen nodes under root are taken from their kept sets.
+    """
+    kind_of = _KIND_OF
+    stack = [(root, certain, possible)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node, certain, possible = pop()
+        kind = kind_of.get(type(node))
+        if kind is None:
+            if node is _UNION_END:
+                branches, (certain, possible) = certain, possible
+                if branches:
+                    certain.update(set.intersection(*branches))
+                    possible.update(*branches)
+                continue
+            kind = _kind(node)
+            if kind != _TERM and node is not root and isinstance(node, _Frozen):
+                kind = _FROZEN
+
+        if kind == _TERM:
+            if not node.is_constant:
+                certain.add(node.value)
+        elif kind == _GROUPS:
+            # filters bind nothing; the terms of (mutable) triple patterns are taken here, as
+            # they are most of the nodes
+            for child in node if type(node) is list or isinstance(node, list) else node.triples:
+                if type(child) is TriplePattern:
+                    for term in (child.subject, child.property, child.object):
+                        if type(term) is RDFTerm or type(term) is SharedRDFTerm:
+                            if not term.is_constant:
+                                certain.add(term.value)
+                        else:
+                            push((term, certain, possible))
+                else:
+                    push((child, certain, possible))
+        elif kind == _GROUP:
+            push((node.ggps, certain, possible))
+        elif kind == _OPTIONAL:
+            push((node.ggps, possible, possible))
+        elif kind == _UNION:
+            # the branches are popped before the end of the union
+            branches = [set() for _ in node.ggps]
+            push((_UNION_END, branches, (certain, possible)))
+            for ggp, branch in zip(node.ggps, branches):
+                push((ggp, branch, possible))
+        elif kind == _FROZEN:
+            if isinstance(node, _KEPT):
+                node_certain, node_possible = bound_variables(node)
+                certain.update(node_certain)
+                possible.update(node_possible)
+        elif kind == _TRIPLE:
+            push((node.subject, certain, possible))
+            push((node.property, certain, possible))
+            push((node.object, certain, possible))
+        elif kind == _PATH_TERM:
+            push((node.path_term, certain, possible))
+        elif kind == _PATH:
+            push((node.left_path, certain, possible))
+            push((node.right_path, certain, possible))
+        elif kind == _GRAPH:
+            push((node.var_or_iri, certain, possible))
+            push((node.ggps, certain, possible))
+        elif kind == _BIND:
+            possible.add(str(node.as_var))
+        elif kind == _VALUES:
+            for variable, column in zip(node.variables, node.table.columns):
+                (possible if UNDEF in column else certain).add(variable.value)
+        elif kind == _QUERY:
+            query_certain, query_possible = _query(node)
+            certain.update(query_certain)
+            possible.update(query_possible)
+
+        # filters, MINUS and expressions bind nothing
+
+
+def _query(query):
+    # (a sub-select is collected here, with a stack of its own)
+    certain, possible = set(), set()
+    _collect(query.ggp, certain, possible)
+    if query.values_clause is not None:
+        _collect(query.values_clause, certain, possible)
+    if not isinstance(query, SelectQuery) or '*' in query.projections:
+        return certain, possible
+
+    projected_certain, projected_possible = set(), set()
+    for projection in query.projections:
+        if isinstance(projection, RDFTerm):
+            if projection.value in certain:
+                projected_certain.add(projection.value)
+            elif projection.value in possible:
+                projected_possible.add(projection.value)
+        else:
+            # (expression AS ?var)
+            projected_possible.update(bound_variables(projection.right_expr)[1])
+
+    return projected_certain, projected_possible
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Walking and rewriting query trees with an explicit stack instead of recursion, so that the
+depth of a tree (hundreds of nested groups, long chains of operators in an Expression) is
+not bounded by the recursion limit and costs no call per level.
+
+    children(node)      the child nodes of a node, in query order
+    walk(node)          every node of the subtree, depth-first, in query order
+    NodeVisitor         calls enter_<Class>(node) before the children of a node and
+                        leave_<Class>(node) after them
+    NodeTransformer     calls transform_<Class>(node) after the children of a node have been
+                        transformed, and puts what it returns in place of the node
+
+The nodes are the query classes of awudima.sparql (SelectQuery, GGP, BGP, TriplePattern,
+Expression, RDFTerm, ...) and their frozen variants; lists of nodes (BGP.triples,
+GGP.ggps, the arguments of an Expression, ...) are walked through, but are not nodes. The
+rows of a VALUES table are walked through too: its cells are RDFTerm children of the
+ValuesClause (UNDEF cells are not nodes), and a NodeTransformer can put another term in a
+cell, or drop it (the cell is then UNDEF). The terms of a table are built from its term
+dictionary and shared by the cells that hold them: a term is to be replaced, not changed
+in place, to change the table.
+Handlers are looked up along the class hierarchy: enter_Query handles every query form,
+enter_BGP handles FrozenBGP too.
+
+    class Predicates(NodeVisitor):
+        def __init__(self):
+            self.found = set()
+
+        def enter_TriplePattern(self, triple):
+            self.found.add(str(triple.property))
+
+    visitor = Predicates()
+    visitor.visit(query)
+"""
+
+__author__ = 'Kemele M. Endris'
+
+from operator import attrgetter
+
+from awudima.sparql import Query, GGP, ValuesClause, GraphGP, ServiceGP, OptionalGP, UnionGP, MinusGP, BGP, Bind, \
+    Filter, TriplePattern, PropertyPath, PathTerm, RDFTerm, Expression
+from awudima.sparql.values import ValuesTable
+
+# Returned by an enter_ method: do not walk the children of the node (nor leave it)
+SKIP = object()
+_LEAVE = object()
+
+# Attributes holding the children of each node class; the solution modifiers of a query
+# are walked through group_by, having and order_by (solution_modifiers holds the same lists)
+_CHILD_FIELDS = {
+    # most common first: _NODE_TYPES is tried in this order
+    RDFTerm: (),
+    TriplePattern: ('subject', 'property', 'object'),
+    Expression: ('left_expr', 'right_expr', 'ternary_expr', 'quaternary_expr'),
+    BGP: ('triples', 'filters'),
+    Filter: ('expression',),
+    GGP: ('ggps',),
+    OptionalGP: ('ggps',),
+    UnionGP: ('ggps',),
+    MinusGP: ('ggps',),
+    GraphGP: ('var_or_iri', 'ggps'),
+    ServiceGP: ('var_or_iri', 'ggps'),
+    Bind: ('expression',),
+    PropertyPath: ('left_path', 'right_path'),
+    PathTerm: ('path_term',),
+    ValuesClause: ('variables', 'values'),
+    Query: ('projections', 'iris', 'template', 'ggp', 'group_by', 'having', 'order_by', 'values_clause'),
+}
+_NODE_TYPES = tuple(_CHILD_FIELDS)
+
+# type -> function giving the children of its nodes
+_children_of = {}
+
+
+def _child_fields(cls):
+    for base in cls.__mro__:
+        if base in _CHILD_FIELDS:
+            return _CHILD_FIELDS[base]
+
+    return ()
+
+
+def is_node(obj):
+    return isinstance(obj, _NODE_TYPES)
+
+
+def _slots(node):
+    """
+    (container, key, child) for every child of node: container is the node (key, the
+    attribute name) or the list holding the child (key, its index)
+    """
+    slots = []
+    for name in _child_fields(type(node)):
+        value = getattr(node, name, None)
+        if isinstance(value, _NODE_TYPES):
+            slots.append((node, name, value))
+        elif isinstance(value, list):
+            lists = [value]
+            while lists:
+                items = lists.pop()
+                for i, item in enumerate(items):
+                    if isinstance(item, _NODE_TYPES):
+                        slots.append((items, i, item))
+                    elif isinstance(item, list):
+                        lists.append(item)
+        elif isinstance(value, ValuesTable):
+            for i, row in enumerate(value):
+                cells = _Cells(value, i)
+                slots.extend((cells, j, term) for j, term in enumerate(row) if isinstance(term, RDFTerm))
+
+    return slots
+
+
+class _Cells(object):
+    """
+    The cells of row i of a ValuesTable, as a container of _slots: a cell set to a term
+    holds that term, a deleted cell is UNDEF
+    """
+    __slots__ = ('table', 'i')
+
+    def __init__(self, table, i):
+        self.table = table
+        self.i = i
+
+    def __setitem__(self, j, term):
+        self.table.set(self.i, j, term)
+
+    def __delitem__(self, j):
+        self.table.set(self.i, j, None)
+
+
+def children(node):
+    """
+    The child nodes of node, in query order
+    """
+    function = _children_of.get(type(node))
+    if function is None:
+        function = _children_of[type(node)] = _children_function(type(node))
+
+    return function(node)
+
+
+def _children_function(cls):
+    fields = _child_fields(cls)
+    if not fields:
+        return _leaf
+    if not issubclass(cls, Query):
+        get = attrgetter(*fields)
+        if len(fields) == 1:
+            return lambda node: _nodes_of((get(node),))
+        return lambda node: _nodes_of(get(node))
+
+    # not every query form has every field
+    return lambda node: _nodes_of([getattr(node, name, None) for name in fields])
+
+
+def _nodes_of(values, found=None):
+    """
+    The nodes among values, and in the lists among them, in order (lists are nested a
+    level or two at most: this recursion does not follow the depth of the tree)
+    """
+    if found is None:
+        found = []
+    for value in values:
+        if isinstance(value, _NODE_TYPES):
+            found.append(value)
+        elif isinstance(value, list):
+            _nodes_of(value, found)
+        elif isinstance(value, ValuesTable):
+            # its rows, lists of RDFTerm and 'UNDEF'
+            _nodes_of(value, found)
+
+    return found
+
+
+def _leaf(node):
+    return ()
+
+
+def walk(node):
+    """
+    Yields node and every node under it, depth-first and in query order (a node shared by
+    several parents, e.g. an interned RDFTerm, is yielded once per occurrence)
+    """
+    children_of = _children_of
+    stack = [node]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        node = pop()
+        yield node
+        function = children_of.get(type(node))
+        if function is None:
+            function = children_of[type(node)] = _children_function(type(node))
+        if function is not _leaf:
+            extend(reversed(function(node)))
+
+
+class _Dispatcher(object):
+    """
+    Finds the <prefix><Class> method of a node, along the class hierarchy of the node
+    """
+    _prefixes = ()
+
+    def _handlers(self, cls):
+        cache = self.__dict__.setdefault('_handler_cache', {})
+        handlers = cache.get(cls)
+        if handlers is None:
+            handlers = []
+            for prefix in self._prefixes:
+                handler = None
+                for base in cls.__mro__:
+                    handler = getattr(self, prefix + base.__name__, None)
+                    if handler is not None:
+                        break
+                handlers.append(handler)
+            handlers = cache[cls] = tuple(handlers)
+
+        return handlers
+
+
+class NodeVisitor(_Dispatcher):
+    """
+    Depth-first walk of a tree that calls, for every node, self.enter_<Class>(node) before
+    walking its children and self.leave_<Class>(node) after them, when the visitor has such
+    methods (a node without handlers is walked through). enter_ can return SKIP to leave the
+    children of the node out. The nodes are not changed by the walk; visitors keep their
+    results as attributes.
+    """
+    _prefixes = ('enter_', 'leave_')
+
+    def visit(self, node):
+        handlers = self._handlers
+        # a node is pushed again, under _LEAVE, to be left after its children
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node is _LEAVE:
+                leaving = stack.pop()
+                handlers(type(leaving))[1](leaving)
+                continue
+
+            enter, leave = handlers(type(node))
+            if enter is not None and enter(node) is SKIP:
+                continue
+            if leave is not None:
+                stack.append(node)
+                stack.append(_LEAVE)
+            nodes = children(node)
+            if nodes:
+                stack.extend(reversed(nodes))
+
+
+class NodeTransformer(_Dispatcher):
+    """
+    Rewrites a tree bottom-up: for every node (children first), self.transform_<Class>(node)
+    returns the node to put in its place, the node itself to keep it, or None to drop it
+    from the list it is in (or to set the attribute holding it to None). Nodes without a
+    transform_ method are kept. The tree is changed in place; frozen trees are to be thawed
+    first (awudima.sparql.frozen.thaw).
+
+    transform(node) returns the new root.
+    """
+    _prefixes = ('transform_',)
+
+    def transform(self, node):
+        handlers = self._handlers
+        # every (container, key, child) of the tree, parents before their children: walked
+        # backwards, every node comes after the nodes under it, and the children of a list
+        # from the last one, so that dropping one does not move those still to come
+        slots = [(None, None, node)]
+        i = 0
+        while i < len(slots):
+            slots.extend(_slots(slots[i][2]))
+            i += 1
+
+        root = node
+        for container, key, child in reversed(slots):
+            transform = handlers(type(child))[0]
+            if transform is None:
+                continue
+            new = transform(child)
+            if new is child:
+                continue
+            if container is None:
+                root = new
+            elif isinstance(key, int):
+                if new is None:
+                    del container[key]
+                else:
+                    container[key] = new
+            else:
+                setattr(container, key, new)
+
+        return root
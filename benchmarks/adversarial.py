@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Hostile inputs: texts made to make the lexer backtrack (unterminated strings full of
+backslashes or quotes, unterminated IRIs, long runs of dots, digits, language tag parts)
+and deeply nested or long queries, parsed with the PLY lexer and with the scanner.
+
+Workloads: every case at --sizes characters (about). Reports the time to parse (or fail to
+parse) each text, and checks that it stays within --budget seconds and grows about linearly
+with the size: no more than --slack times the growth of the size.
+
+    python benchmarks/adversarial.py [--sizes 1000 4000 16000] [--budget 2] [--slack 3]
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.parser import SparqlParser
+
+PATTERN = 'SELECT * WHERE { ?s ?p %s }'
+
+# name -> text of about n characters
+CASES = [
+    ("''' and backslashes", lambda n: PATTERN % ("'''" + '\\n' * (n // 2))),
+    ('""" and backslashes', lambda n: PATTERN % ('"""' + '\\"' * (n // 2))),
+    ("''' and quotes", lambda n: PATTERN % ("'''" + "''a" * (n // 3))),
+    ('unterminated string', lambda n: PATTERN % ('"' + 'a\\t' * (n // 3))),
+    ('unterminated IRI', lambda n: PATTERN % ('<http://example.org/' + 'a' * n)),
+    ('name and dots', lambda n: PATTERN % ('ex:a' + '.' * n + 'a')),
+    ('blank node and dots', lambda n: PATTERN % ('_:a' + '.' * n)),
+    ('digits', lambda n: PATTERN % ('1' * n + '.' + '1' * n + 'e')),
+    ('language tag', lambda n: PATTERN % ('"x"@en' + '-a' * (n // 2) + '-')),
+    ('spaces in ()', lambda n: PATTERN % ('(' + ' ' * n)),
+    ('nested groups', lambda n: 'SELECT * WHERE ' + '{ ' * (n // 4) + '?s ?p ?o' + ' }' * (n // 4)),
+    ('nested brackets', lambda n: PATTERN % ('?o FILTER(' + '(' * (n // 2) + '?o' + ')' * (n // 2) + ')')),
+    ('long sum', lambda n: PATTERN % ('?o FILTER(?o > 0' + ' + 1' * (n // 4) + ')')),
+]
+
+
+class OverBudget(Exception):
+    pass
+
+
+def _over_budget(signum, frame):
+    raise OverBudget()
+
+
+def parse_time(sparql_parser, text, budget):
+    """
+    Seconds to parse text, or None when it takes more than budget seconds (where SIGALRM
+    can stop it; otherwise it runs to the end)
+    """
+    alarm = hasattr(signal, 'setitimer')
+    if alarm:
+        signal.signal(signal.SIGALRM, _over_budget)
+        signal.setitimer(signal.ITIMER_REAL, budget)
+    start = time.perf_counter()
+    try:
+        try:
+            sparql_parser.parse(text)
+        except OverBudget:
+            return None
+        except Exception:
+            pass
+        elapsed = time.perf_counter() - start
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return elapsed if elapsed <= budget else None
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[1000, 4000, 16000])
+    argparser.add_argument('--budget', type=float, default=2.0, help='seconds allowed for a text')
+    argparser.add_argument('--slack', type=float, default=3.0, help='growth of the time allowed over the '
+                                                                    'growth of the size')
+    argparser.add_argument('--repeat', type=int, default=3)
+    args = argparser.parse_args()
+
+    sizes = sorted(args.sizes)
+    failures = []
+    print('%-22s %-8s %s' % ('', '', ' '.join('%12s' % ('%d chars' % n) for n in sizes)))
+    for tokenizer in ('ply', 'scanner'):
+        sparql_parser = SparqlParser(tokenizer=tokenizer)
+        for name, make in CASES:
+            times = []
+            for n in sizes:
+                text = make(n)
+                elapsed = 0.0
+                for _ in range(args.repeat):
+                    t = parse_time(sparql_parser, text, args.budget)
+                    if t is None:
+                        elapsed = None
+                        break
+                    elapsed = t if not elapsed else min(elapsed, t)
+                times.append(elapsed)
+                if elapsed is None:
+                    failures.append('%s (%s): over %.1f s at %d chars' % (name, tokenizer, args.budget, n))
+                    break
+            print('%-22s %-8s %s' % (name, tokenizer, ' '.join('%9.2f ms' % (t * 1000) if t is not None
+                                                               else '%12s' % 'over budget' for t in times)))
+
+            if len(times) == len(sizes) and None not in times and len(sizes) > 1:
+                growth = times[-1] / max(times[0], 1e-4)
+                if growth > args.slack * sizes[-1] / sizes[0]:
+                    failures.append('%s (%s): x%.0f slower for x%.0f the size'
+                                    % (name, tokenizer, growth, sizes[-1] / sizes[0]))
+    if failures:
+        for failure in failures:
+            print('FAIL: %s' % failure)
+        sys.exit(1)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Shipping parsed queries between processes: parsing the text again against pickle and
+awudima.sparql.binary (dumps/loads).
+
+Workloads: the corpus queries, generated queries of --patterns triple patterns, one with a
+VALUES block of --values rows, and one of --depth nested OPTIONAL/UNION groups. Reports the
+size of what is shipped and the time to write it and to read the query back, and checks
+that loads(dumps(query)) serializes to the text of the query.
+
+    python benchmarks/binary.py [--patterns 1000 10000] [--values 10000] [--depth 100]
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.binary import dumps, loads
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.serializer import serialize
+from awudima.sparql.corpus import QUERIES, large_query, nested_query
+
+
+def best(function, items, repeat):
+    elapsed = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(item) for item in items]
+        t = time.perf_counter() - start
+        elapsed = t if elapsed is None else min(elapsed, t)
+
+    return results, elapsed
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--patterns', type=int, nargs='+', default=[1000, 10000])
+    argparser.add_argument('--values', type=int, default=10000, help='rows of the VALUES block')
+    argparser.add_argument('--depth', type=int, default=100, help='nested OPTIONAL/UNION groups')
+    argparser.add_argument('--repeat', type=int, default=5)
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser()
+    workloads = [('corpus', QUERIES)]
+    workloads += [('%d patterns' % n, [large_query(n)]) for n in args.patterns]
+    workloads.append(('%d VALUES rows' % args.values, [large_query(10, args.values)]))
+    workloads.append(('depth %d' % args.depth, [nested_query(args.depth, args.depth)]))
+
+    failed = False
+    print('%-18s %31s %31s %31s' % ('', 'text (str / parse)', 'pickle (dumps / loads)', 'binary (dumps / loads)'))
+    for label, texts in workloads:
+        queries = [sparql_parser.parse(text) for text in texts]
+        printed, str_time = best(str, queries, args.repeat)
+        _, parse_time = best(sparql_parser.parse, texts, 1)
+        pickled, pickle_time = best(lambda q: pickle.dumps(q, pickle.HIGHEST_PROTOCOL), queries, args.repeat)
+        _, unpickle_time = best(pickle.loads, pickled, args.repeat)
+        encoded, dumps_time = best(dumps, queries, args.repeat)
+        decoded, loads_time = best(loads, encoded, args.repeat)
+
+        columns = []
+        for results, write_time, read_time in ((printed, str_time, parse_time), (pickled, pickle_time, unpickle_time),
+                                               (encoded, dumps_time, loads_time)):
+            columns.append('%7.0f KB %9.2f / %8.2f ms' % (sum(len(r) for r in results) / 1024., write_time * 1000,
+                                                          read_time * 1000))
+        print('%-18s %s' % (label, ' '.join(columns)))
+
+        for query, copy in zip(queries, decoded):
+            try:
+                expected = serialize(query)
+            except Exception:
+                continue
+            if serialize(copy) != expected:
+                failed = True
+    if failed:
+        print('FAIL: a decoded query serializes to a different text')
+        sys.exit(1)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing a query log one query at a time (parser.sparql) against awudima.sparql.bulk, with
+a pool of worker processes.
+
+The log is --queries generated queries (awudima.sparql.corpus.query_log: the corpus queries and small
+ones, with a few that do not parse). parser.sparql parses the first --baseline of them;
+BulkParser parses all of them, with 0 (in this process) and each --processes count of
+workers, in order and as completed. Reports queries/second and checks that every query
+parsed or failed as it did with parser.sparql.
+
+    python benchmarks/bulk.py [--queries 1000000] [--baseline 20000] [--processes 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.bulk import BulkParser
+from awudima.sparql.parser import sparql
+from awudima.sparql.corpus import query_log
+
+
+def outcome(function, text):
+    try:
+        return str(function(text))
+    except Exception:
+        return None
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--queries', type=int, default=1000000)
+    argparser.add_argument('--baseline', type=int, default=20000, help='queries parsed with parser.sparql')
+    argparser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    argparser.add_argument('--chunksize', type=int, default=256)
+    args = argparser.parse_args()
+
+    # the outcomes of the first queries, to check the bulk results against
+    expected = {}
+    start = time.perf_counter()
+    for i, text in enumerate(query_log(args.baseline)):
+        expected[i] = outcome(sparql, text)
+    baseline = args.baseline / (time.perf_counter() - start)
+    print('%-28s %10.0f queries/s   (%d queries)' % ('parser.sparql', baseline, args.baseline))
+
+    failed = False
+    runs = [(0, True)] + [(n, ordered) for n in args.processes for ordered in (True, False)]
+    for processes, ordered in runs:
+        with BulkParser(processes, args.chunksize) as bulk:
+            for result in bulk.parse(query_log(args.queries), ordered):
+                if result.index in expected:
+                    got = None if result.error is not None else str(result.query)
+                    if got != expected[result.index]:
+                        failed = True
+            stats = bulk.stats()
+        label = 'BulkParser(%d)%s' % (processes, '' if ordered else ' unordered')
+        print('%-28s %10.0f queries/s   %.2fx   (%d parsed, %d failed, %.1f s)'
+              % (label, stats['per_second'], stats['per_second'] / baseline, stats['parsed'], stats['failed'],
+                 stats['seconds']))
+        if stats['queries'] != args.queries:
+            failed = True
+    if failed:
+        print('FAIL: a bulk result differs from parser.sparql')
+        sys.exit(1)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Deduplication of triple patterns and filters with frozen nodes (awudima.sparql.frozen)
+against keying them by their serialization.
+
+Parses a query of --patterns triple patterns (and a filter every 10 patterns) drawn from
+--distinct different ones, then counts the distinct patterns and filters: with a set of
+frozen nodes, and with a dict keyed by str(node). Both must find the same number.
+
+    python benchmarks/dedup.py [--patterns 100000] [--distinct 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql import BGP
+from awudima.sparql.frozen import freeze
+from awudima.sparql.parser import SparqlParser
+
+
+def repeated_query(n_patterns, n_distinct, rnd):
+    lines = ["PREFIX ex: <http://example.org/ontology/>", "SELECT * WHERE {"]
+    for i in range(n_patterns):
+        k = rnd.randrange(n_distinct)
+        lines.append('  ?s%d ex:p%d ?o%d .' % (k % 97, k, k % 13))
+        if i % 10 == 9:
+            lines.append('  FILTER(?o%d > %d && regex(str(?s%d), "^x%d"))' % (k % 13, k % 50, k % 97, k % 7))
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def by_str(nodes):
+    return len(dict((str(node), node) for node in nodes))
+
+
+def by_frozen(nodes):
+    memo = {}
+    return len(set(freeze(node, memo) for node in nodes))
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--patterns', type=int, default=100000)
+    argparser.add_argument('--distinct', type=int, default=5000)
+    argparser.add_argument('--seed', type=int, default=0)
+    args = argparser.parse_args()
+
+    query = SparqlParser().parse(repeated_query(args.patterns, args.distinct, random.Random(args.seed)))
+    bgps = [g for g in query.ggp.ggps if isinstance(g, BGP)]
+    triples = [t for bgp in bgps for t in bgp.triples]
+    filters = [f for bgp in bgps for f in bgp.filters]
+
+    failed = False
+    for label, nodes in (('triple patterns', triples), ('filters', filters)):
+        (n_str, str_time), (n_frozen, frozen_time) = timed(by_str, nodes), timed(by_frozen, nodes)
+        memo = {}
+        frozen = [freeze(node, memo) for node in nodes]
+        n_set, set_time = timed(lambda: len(set(frozen)))
+        print('%-16s %7d -> %5d distinct: str keys %.3f s, freeze + set %.3f s, set of frozen %.4f s'
+              % (label, len(nodes), n_frozen, str_time, frozen_time, set_time))
+        failed = failed or not n_str == n_frozen == n_set
+    if failed:
+        print('FAIL: str keys and frozen nodes found different numbers of distinct nodes')
+        sys.exit(1)
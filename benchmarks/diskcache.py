@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing queries again against looking them up in a ParseCache (in memory, pickled) and in
+a DiskParseCache (a memory-mapped file, as a later run or another process would find it).
+
+Workloads: the corpus queries and generated queries of --patterns triple patterns. Reports
+the time to get every query of a workload, after the caches have been filled, and checks
+that the queries from the disk cache serialize to the text of the parsed ones.
+
+    python benchmarks/diskcache.py [--patterns 10 100 1000]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.cache import ParseCache, DiskParseCache
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.serializer import serialize
+from awudima.sparql.corpus import QUERIES, large_query
+
+
+def best(function, texts, repeat):
+    elapsed = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        queries = [function(text) for text in texts]
+        t = time.perf_counter() - start
+        elapsed = t if elapsed is None else min(elapsed, t)
+
+    return queries, elapsed
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--patterns', type=int, nargs='+', default=[10, 100, 1000])
+    argparser.add_argument('--repeat', type=int, default=5)
+    args = argparser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    workloads = [('corpus', QUERIES)] + [('%d patterns' % n, [large_query(n)]) for n in args.patterns]
+
+    failed = False
+    try:
+        print('%-16s %14s %14s %14s' % ('', 'parse', 'ParseCache', 'DiskParseCache'))
+        for i, (label, texts) in enumerate(workloads):
+            path = os.path.join(directory, '%d.cache' % i)
+            memory_parser = SparqlParser(cache=ParseCache())
+            with DiskParseCache(path) as cache:
+                disk_parser = SparqlParser(cache=cache)
+                for text in texts:
+                    memory_parser.parse(text)
+                    disk_parser.parse(text)
+
+            sparql_parser = SparqlParser()
+            parsed, parse_time = best(sparql_parser.parse, texts, 1)
+            _, memory_time = best(memory_parser.parse, texts, args.repeat)
+            with DiskParseCache(path) as cache:
+                disk_parser = SparqlParser(cache=cache)
+                cached, disk_time = best(disk_parser.parse, texts, args.repeat)
+            print('%-16s %11.2f ms %11.2f ms %11.2f ms' % (label, parse_time * 1000, memory_time * 1000,
+                                                           disk_time * 1000))
+
+            for query, copy in zip(parsed, cached):
+                try:
+                    expected = serialize(query)
+                except Exception:
+                    continue
+                if serialize(copy) != expected:
+                    failed = True
+    finally:
+        shutil.rmtree(directory)
+    if failed:
+        print('FAIL: a cached query serializes to a different text')
+        sys.exit(1)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic queries of awudima.sparql.generator at growing sizes: the time to generate them
+and to round-trip them (write the text, parse it back and compare), and whether they do.
+
+Workloads: one shape per dimension of the generator (triple patterns, nesting depth, VALUES
+rows, property path steps, projected variables, FILTERs), each at --size and 10 x --size.
+Reports the size of the text, the time to generate the query and to round-trip it; checks
+that the text parses back to the same query (round_trip) and that the same seed gives the
+same text.
+
+    python benchmarks/generator.py [--size 100] [--seed 0]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.generator import QueryGenerator, round_trip
+from awudima.sparql.parser import SparqlParser
+
+
+def shapes(n):
+    return [('%d patterns' % n, dict(patterns=n)),
+            ('depth %d' % n, dict(patterns=2, depth=n)),
+            ('%d VALUES rows' % (10 * n), dict(patterns=5, values=10 * n)),
+            ('path of %d steps' % n, dict(patterns=2, paths=1, path_length=n)),
+            ('%d projected' % n, dict(patterns=n, width=n)),
+            ('%d filters' % n, dict(patterns=10, filters=n))]
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--size', type=int, default=100)
+    argparser.add_argument('--seed', type=int, default=0)
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser()
+    failed = []
+    print('%-22s %9s %13s %13s  %s' % ('', 'KB', 'generate', 'round trip', 'same'))
+    for n in (args.size, 10 * args.size):
+        for label, shape in shapes(n):
+            start = time.perf_counter()
+            query = QueryGenerator(args.seed).query(**shape)
+            generate_time = time.perf_counter() - start
+            text = QueryGenerator(args.seed).text(**shape)
+            start = time.perf_counter()
+            _, same = round_trip(query, sparql_parser)
+            round_trip_time = time.perf_counter() - start
+            deterministic = text == QueryGenerator(args.seed).text(**shape)
+            print('%-22s %9.1f %10.2f ms %10.2f ms  %s' % (label, len(text) / 1024., generate_time * 1000,
+                                                          round_trip_time * 1000, 'ok' if same else 'DIFFERENT'))
+            if not same or not deterministic:
+                failed.append(label)
+    if failed:
+        print('FAIL: not the same query parsed back, or not the same text for the same seed: %s' % ', '.join(failed))
+        sys.exit(1)
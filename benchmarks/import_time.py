@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Cold import budget for awudima.sparql.parser.
+
+Each run imports the parser in a fresh interpreter, from an empty working directory,
+and checks that nothing was written (no parser.out / parsetab.py). Exits with 1 when
+the median import time exceeds the budget.
+
+    python benchmarks/import_time.py [--budget SECONDS] [--runs N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import time
+t = time.perf_counter()
+import awudima.sparql.parser
+print(time.perf_counter() - t)
+"""
+
+
+def _snapshot(path):
+    return set(os.listdir(path))
+
+
+def cold_import_times(runs):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    pkgdir = os.path.join(ROOT, 'awudima', 'sparql')
+    times = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cwd:
+            before = _snapshot(pkgdir)
+            out = subprocess.check_output([sys.executable, '-c', SNIPPET], cwd=cwd, env=env)
+            written = (_snapshot(pkgdir) - before) | _snapshot(cwd)
+            if written:
+                raise RuntimeError('importing the parser wrote files: ' + ', '.join(sorted(written)))
+        times.append(float(out.decode().strip().splitlines()[-1]))
+
+    return times
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--budget', type=float, default=0.25, help='max median import time in seconds')
+    argparser.add_argument('--runs', type=int, default=5)
+    args = argparser.parse_args()
+
+    times = sorted(cold_import_times(args.runs))
+    median = times[len(times) // 2]
+    print('cold import of awudima.sparql.parser: median %.1f ms, min %.1f ms, max %.1f ms (budget %.1f ms)'
+          % (median * 1000, times[0] * 1000, times[-1] * 1000, args.budget * 1000))
+    if median > args.budget:
+        print('FAIL: import time budget exceeded')
+        sys.exit(1)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing with ParseLimits: what checking the limits costs on ordinary queries, and how soon
+a query over a limit is stopped, against parsing it all.
+
+Workloads: the corpus queries, and queries over each limit: --size nested groups (depth),
+an IN list and a VALUES block of --size values (tokens), a long sum parsed with a time
+budget of --seconds, and a text of 64 x --size characters (length). Reports the time to parse (or stop) each workload without and with
+limits, and checks that each query over a limit raises ParseLimitExceeded for that limit
+(and is counted in the stats of the limits) and that the corpus still parses.
+
+    python benchmarks/limits.py [--size 20000] [--seconds 0.01]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.limits import ParseLimits, ParseLimitExceeded
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.corpus import QUERIES
+
+
+def run(sparql_parser, texts, repeat):
+    """
+    (best time to parse texts, name of the limit the last one passed or None)
+    """
+    elapsed = None
+    limit = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            try:
+                sparql_parser.parse(text)
+                limit = None
+            except ParseLimitExceeded as e:
+                limit = e.limit
+        t = time.perf_counter() - start
+        elapsed = t if elapsed is None else min(elapsed, t)
+
+    return elapsed, limit
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--size', type=int, default=20000)
+    argparser.add_argument('--seconds', type=float, default=0.01, help='max_seconds of the limits')
+    argparser.add_argument('--repeat', type=int, default=3)
+    args = argparser.parse_args()
+
+    n = args.size
+    values = {'max_length': 64 * n, 'max_tokens': n // 10, 'max_depth': 64, 'max_seconds': args.seconds}
+    limits = ParseLimits(**values)
+    workloads = [
+        ('corpus', QUERIES, None),
+        ('nested groups', ['SELECT * WHERE ' + '{ ' * n + '?s ?p ?o' + ' }' * n], 'max_depth'),
+        ('IN list', ['SELECT * WHERE { ?s ?p ?o FILTER(?o IN (%s)) }' % ', '.join(map(str, range(n)))],
+         'max_tokens'),
+        ('VALUES block', ['SELECT * WHERE { ?s ?p ?o } VALUES ?o { %s }' % ' '.join(map(str, range(n)))],
+         'max_tokens'),
+        ('long sum', ['SELECT * WHERE { ?s ?p ?o FILTER(?o > 0%s) }' % (' + 1' * n)], 'max_seconds'),
+        ('long text', ['SELECT * WHERE { ?s ?p ?o }' + ' ' * (64 * n)], 'max_length'),
+    ]
+
+    failed = False
+    print('%-16s %14s %14s  %s' % ('', 'no limits', 'limits', 'stopped by'))
+    for label, texts, expected in workloads:
+        free_time, _ = run(SparqlParser(), texts, args.repeat)
+        # each query over a limit is parsed with that limit only, the corpus with all of them
+        if expected is not None:
+            limits = ParseLimits(**{expected: values[expected]})
+        limited_time, limit = run(SparqlParser(limits=limits), texts, args.repeat)
+        print('%-16s %11.2f ms %11.2f ms  %s' % (label, free_time * 1000, limited_time * 1000, limit or '-'))
+        if limit != expected or expected is not None and limits.stats()[expected] != args.repeat:
+            failed = True
+    if failed:
+        print('FAIL: a query was not stopped by the limit it passes, or the corpus did not parse')
+        sys.exit(1)
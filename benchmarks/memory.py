@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Memory held by parsed queries, in bytes per triple pattern.
+
+Parses the corpus queries (--copies times each) and generated queries of --patterns triple
+patterns, keeps the trees, and reports the memory they hold (tracemalloc) divided by the
+number of triple patterns in them. Run it on two checkouts to compare them.
+
+    python benchmarks/memory.py [--patterns 1000 10000] [--copies 200] [--tokenizer ply|scanner]
+                                [--intern-terms]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql import TriplePattern
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.corpus import QUERIES, large_query
+
+
+def count_patterns(node, seen=None):
+    if seen is None:
+        seen = set()
+    if id(node) in seen or isinstance(node, (str, int, float, bool, type(None))):
+        return 0
+    seen.add(id(node))
+
+    count = 1 if isinstance(node, TriplePattern) else 0
+    if isinstance(node, (list, tuple)):
+        children = node
+    elif isinstance(node, dict):
+        children = node.values()
+    else:
+        names = set(getattr(node, '__dict__', ()))
+        for cls in type(node).__mro__:
+            names.update(getattr(cls, '__slots__', ()))
+        children = [getattr(node, name, None) for name in names]
+    for child in children:
+        count += count_patterns(child, seen)
+
+    return count
+
+
+def held_memory(sparql_parser, texts):
+    gc.collect()
+    tracemalloc.start()
+    queries = [sparql_parser.parse(text) for text in texts]
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return held, sum(count_patterns(q) for q in queries)
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--patterns', type=int, nargs='+', default=[1000, 10000])
+    argparser.add_argument('--copies', type=int, default=200, help='times each corpus query is parsed')
+    argparser.add_argument('--tokenizer', default='ply', choices=SparqlParser.tokenizers)
+    argparser.add_argument('--intern-terms', action='store_true', help='one RDFTerm per distinct term of a query')
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser(tokenizer=args.tokenizer, intern_terms=args.intern_terms)
+    sparql_parser.parse(large_query(10))
+
+    workloads = [('corpus x%d' % args.copies, QUERIES * args.copies)]
+    workloads += [('%d patterns' % n, [large_query(n)]) for n in args.patterns]
+    for label, texts in workloads:
+        held, n_patterns = held_memory(sparql_parser, texts)
+        print('%-16s %8d triple patterns %10.1f KB held %8.0f bytes/pattern'
+              % (label, n_patterns, held / 1024., held / float(n_patterns)))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing with a ParseProfile: what profiling costs, and where the time of parsing goes.
+
+Workloads: a generated log of --queries queries (awudima.sparql.corpus.query_log), and
+generated queries of --patterns triple patterns. Reports the time to parse each workload
+without and with a profile, and the share of lexing, reductions and the LALR automaton;
+checks that the profile counts every parse and every token, and that its JSON report adds
+up to the same profile.
+
+    python benchmarks/profiling.py [--queries 2000] [--patterns 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.profiling import ParseProfile, format_report
+from awudima.sparql.corpus import query_log, large_query
+
+
+def parse_all(sparql_parser, texts):
+    start = time.perf_counter()
+    for text in texts:
+        try:
+            sparql_parser.parse(text)
+        except Exception:
+            pass
+    return time.perf_counter() - start
+
+
+def count_tokens(texts):
+    lexer = SparqlParser()._new_lexer()
+    n = 0
+    for text in texts:
+        lexer.input(text)
+        try:
+            while lexer.token() is not None:
+                n += 1
+        except Exception:
+            pass
+    return n
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--queries', type=int, default=2000)
+    argparser.add_argument('--patterns', type=int, nargs='+', default=[1000])
+    argparser.add_argument('--top', type=int, default=0, help='print the report with this many productions')
+    args = argparser.parse_args()
+
+    workloads = [('%d queries' % args.queries, list(query_log(args.queries)))]
+    workloads += [('%d patterns' % n, [large_query(n)]) for n in args.patterns]
+
+    failed = False
+    print('%-16s %12s %12s %9s %9s %9s' % ('', 'no profile', 'profile', 'lexing', 'reduce', 'LALR'))
+    for label, texts in workloads:
+        plain_time = parse_all(SparqlParser(), texts)
+        profile = ParseProfile()
+        profiled_time = parse_all(SparqlParser(profile=profile), texts)
+        report = profile.report()
+        seconds = report['seconds']
+        print('%-16s %9.1f ms %9.1f ms %8.0f%% %8.0f%% %8.0f%%'
+              % (label, plain_time * 1000, profiled_time * 1000, 100 * seconds['lexing'] / seconds['total'],
+                 100 * seconds['reductions'] / seconds['total'], 100 * seconds['parser'] / seconds['total']))
+        if args.top:
+            print(format_report(report, args.top))
+
+        copy = ParseProfile()
+        copy.update(json.loads(json.dumps(report)))
+        # (a failed parse may stop before the lexer has read all of its text)
+        if report['parses'] != len(texts) or copy.report() != report \
+                or not report['failed'] and report['tokens'] != count_tokens(texts):
+            failed = True
+    if failed:
+        print('FAIL: the profile missed parses or tokens, or its JSON report does not add up to it')
+        sys.exit(1)
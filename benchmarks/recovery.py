@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Finding every syntax error of a query: SparqlParser.parse_with_errors, in one pass, against
+parsing again after each error is fixed (what an editor does with parse()).
+
+Workloads: generated queries of --patterns triple patterns with --errors broken triple
+patterns (an object left out) spread over the query. Reports the time to find all the
+errors each way, and checks that parse_with_errors finds one error per broken pattern and
+keeps the other patterns.
+
+    python benchmarks/recovery.py [--patterns 100 1000] [--errors 1 5 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.parser import SparqlParser, SparqlSyntaxError
+
+
+def broken_query(n_patterns, n_errors):
+    """
+    A query of n_patterns triple patterns, n_errors of them without an object, and the
+    same query with every pattern whole
+    """
+    step = max(n_patterns // n_errors, 1)
+    broken = set(range(step // 2, n_patterns, step)[:n_errors])
+    patterns = ['?s%d <http://example.org/p%d> ?o%d' % (i, i % 50, i) for i in range(n_patterns)]
+    text = 'SELECT * WHERE {\n  %s\n}' % ' .\n  '.join(p.rsplit(' ', 1)[0] if i in broken else p
+                                                     for i, p in enumerate(patterns))
+    return text, patterns, broken
+
+
+def fix_one_at_a_time(sparql_parser, text, patterns):
+    # parse, fix the pattern at the error, parse again, until the query parses
+    found = 0
+    while True:
+        try:
+            sparql_parser.parse(text)
+            return found
+        except SparqlSyntaxError as e:
+            found += 1
+            line = e.line - 2
+            lines = text.split('\n')
+            lines[line + 1] = '  ' + patterns[line] + (' .' if lines[line + 1].endswith('.') else '')
+            text = '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--patterns', type=int, nargs='+', default=[100, 1000])
+    argparser.add_argument('--errors', type=int, nargs='+', default=[1, 5, 20])
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser()
+    failed = False
+    print('%-24s %22s %22s' % ('', 'parse, fix, parse ...', 'parse_with_errors'))
+    for n_patterns in args.patterns:
+        for n_errors in args.errors:
+            text, patterns, broken = broken_query(n_patterns, n_errors)
+            start = time.perf_counter()
+            fixed = fix_one_at_a_time(sparql_parser, text, patterns)
+            loop_time = time.perf_counter() - start
+            start = time.perf_counter()
+            query, errors = sparql_parser.parse_with_errors(text, max_errors=n_errors + 1)
+            recovery_time = time.perf_counter() - start
+            print('%-24s %12.1f ms %3d errors %12.1f ms %3d errors'
+                  % ('%d patterns, %d errors' % (n_patterns, len(broken)), loop_time * 1000, fixed,
+                     recovery_time * 1000, len(errors)))
+
+            if fixed != len(broken) or len(errors) != len(broken) or query is None \
+                    or len(query.ggp.ggps[0].triples) != n_patterns - len(broken):
+                failed = True
+    if failed:
+        print('FAIL: parse_with_errors did not find every error, or lost valid triple patterns')
+        sys.exit(1)
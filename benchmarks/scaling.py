@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Parse time against query size, for queries with 1k, 10k and 100k triple patterns (in a
+single triples block) and with VALUES blocks of 1k, 10k and 100k rows.
+
+Parsing must be linear in the number of items: the time per item of the largest query
+may not exceed --max-growth times the time per item of the smallest one.
+
+    python benchmarks/scaling.py [--sizes 1000 10000 100000] [--tokenizer ply|scanner]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.corpus import large_query
+
+
+def parse_time(sparql_parser, text, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        sparql_parser.parse(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def run(sparql_parser, label, make_query, sizes, repeat):
+    per_item = []
+    for n in sizes:
+        text = make_query(n)
+        elapsed = parse_time(sparql_parser, text, repeat)
+        per_item.append(elapsed / n)
+        print('%-16s %7d items %8d KB  %8.3f s  %6.2f us/item'
+              % (label, n, len(text) // 1024, elapsed, 1e6 * elapsed / n))
+
+    return per_item[-1] / per_item[0]
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    argparser.add_argument('--tokenizer', default='ply', choices=SparqlParser.tokenizers)
+    argparser.add_argument('--repeat', type=int, default=1)
+    argparser.add_argument('--max-growth', type=float, default=2.0,
+                           help='largest allowed ratio between the time per item of the largest and smallest query')
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser(tokenizer=args.tokenizer)
+    sparql_parser.parse(large_query(10, 10))
+    growth = {
+        'triple patterns': run(sparql_parser, 'triple patterns', lambda n: large_query(n, filter_every=0),
+                               args.sizes, args.repeat),
+        'VALUES rows': run(sparql_parser, 'VALUES rows', lambda n: large_query(1, n), args.sizes, args.repeat),
+    }
+
+    failed = False
+    for label, ratio in growth.items():
+        print('%s: time per item x%.2f from %d to %d items' % (label, ratio, args.sizes[0], args.sizes[-1]))
+        failed = failed or ratio > args.max_growth
+    if failed:
+        print('FAIL: parse time grows faster than linearly (--max-growth %.1f)' % args.max_growth)
+        sys.exit(1)
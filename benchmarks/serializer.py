@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Serialization of parsed queries: str(query) against awudima.sparql.serializer, in pretty
+mode (the text of str(query)) and in compact mode.
+
+Workloads: the corpus queries, generated queries of --patterns triple patterns, one with a
+VALUES block of --values rows, and queries of --depth nested OPTIONAL/UNION groups. Checks
+that the pretty text is the text of str(query).
+
+    python benchmarks/serializer.py [--patterns 1000 10000] [--values 100000] [--depth 200 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.serializer import serialize
+from awudima.sparql.corpus import QUERIES, large_query, nested_query
+
+
+def timed(function, queries, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            texts = [function(q) for q in queries]
+        except RecursionError:
+            return RecursionError, None
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return texts, best
+
+
+def seconds(texts, elapsed):
+    return ' RecursionError' if texts is RecursionError else '%13.4f s' % elapsed
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--patterns', type=int, nargs='+', default=[1000, 10000])
+    argparser.add_argument('--values', type=int, default=100000, help='rows of the VALUES block')
+    argparser.add_argument('--depth', type=int, nargs='+', default=[200, 10000])
+    argparser.add_argument('--copies', type=int, default=100, help='times each corpus query is serialized')
+    argparser.add_argument('--repeat', type=int, default=3)
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser()
+    workloads = [('corpus x%d' % args.copies, [sparql_parser.parse(q) for q in QUERIES] * args.copies)]
+    workloads += [('%d patterns' % n, [sparql_parser.parse(large_query(n))]) for n in args.patterns]
+    workloads.append(('%d VALUES rows' % args.values, [sparql_parser.parse(large_query(10, args.values))]))
+    workloads += [('depth %d' % d, [sparql_parser.parse(nested_query(d))]) for d in args.depth]
+
+    failed = False
+    print('%-20s %10s %15s %15s %15s' % ('', 'KB', 'str(query)', 'pretty', 'compact'))
+    for label, queries in workloads:
+        expected, str_time = timed(str, queries, args.repeat)
+        pretty, pretty_time = timed(serialize, queries, args.repeat)
+        compact, compact_time = timed(lambda q: serialize(q, pretty=False), queries, args.repeat)
+        print('%-20s %10.1f %s %s %s' % (label, sum(len(t) for t in pretty) / 1024., seconds(expected, str_time),
+                                         seconds(pretty, pretty_time), seconds(compact, compact_time)))
+        if expected is not RecursionError and expected != pretty:
+            failed = True
+    if failed:
+        print('FAIL: the pretty text differs from str(query)')
+        sys.exit(1)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Memory used to send a large query: str(query).encode() against streaming it with
+awudima.sparql.serializer.write(query, fp).
+
+Workloads: a query with a VALUES block of --values rows, one with a UNION of --branches
+branches and one with a BGP of --patterns triple patterns. Reports the peak of memory
+allocated while serializing (tracemalloc, the parsed query excluded) and the time taken, and
+checks that the bytes written are those of str(query).
+
+    python benchmarks/streaming.py [--values 200000] [--branches 10000] [--patterns 100000]
+"""
+import argparse
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.serializer import write
+from awudima.sparql.corpus import large_query
+
+
+def union_query(n_branches):
+    branches = ['{ ?s <http://example.org/p%d> ?o%d }' % (i, i % 10) for i in range(n_branches)]
+    return 'SELECT * WHERE { %s }' % ' UNION '.join(branches)
+
+
+class Sink(io.RawIOBase):
+    """
+    A binary file that keeps only the number of bytes written to it (and, if asked, a
+    digest of them)
+    """
+    def __init__(self):
+        self.written = 0
+        self.parts = None
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.written += len(data)
+        if self.parts is not None:
+            self.parts.append(bytes(data))
+        return len(data)
+
+
+def peak(function):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak_bytes, elapsed
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--values', type=int, default=200000, help='rows of the VALUES block')
+    argparser.add_argument('--branches', type=int, default=10000, help='branches of the UNION')
+    argparser.add_argument('--patterns', type=int, default=100000, help='triple patterns of the BGP')
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser()
+    workloads = [('%d VALUES rows' % args.values, large_query(10, args.values)),
+                 ('%d UNION branches' % args.branches, union_query(args.branches)),
+                 ('%d patterns' % args.patterns, large_query(args.patterns))]
+
+    failed = False
+    print('%-22s %10s %24s %24s' % ('', 'KB', 'str(query).encode()', 'write(query, fp)'))
+    for label, text in workloads:
+        query = sparql_parser.parse(text)
+        sink = Sink()
+        str_peak, str_time = peak(lambda: sink.write(str(query).encode('utf-8')))
+        size = sink.written
+        stream_peak, stream_time = peak(lambda: write(query, Sink()))
+        print('%-22s %10.1f %11.1f KB %8.3f s %11.1f KB %8.3f s'
+              % (label, size / 1024., str_peak / 1024., str_time, stream_peak / 1024., stream_time))
+
+        sink.parts = []
+        write(query, sink)
+        if b''.join(sink.parts) != str(query).encode('utf-8'):
+            failed = True
+    if failed:
+        print('FAIL: the streamed text differs from str(query)')
+        sys.exit(1)
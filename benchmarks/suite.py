@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+The parser benchmark suite: fixed, seeded workloads measured the same way from run to run,
+with the results kept as JSON to compare runs (e.g., before and after a change).
+
+Workloads (awudima.sparql.corpus): the corpus queries, BSBM explore, WatDiv and FedBench
+shapes, property paths, FILTER-heavy queries, deep OPTIONAL/UNION nesting, a huge VALUES
+block, a large BGP, a query log and synthetic queries of mixed shapes
+(awudima.sparql.generator). For each one: parse throughput (queries/s, KB/s),
+parse latency percentiles per query, peak memory while parsing it (tracemalloc), and
+serialization time.
+
+    python benchmarks/suite.py run [--output results.json] [--scale 1] [--repeat 5] [--workloads bsbm ...]
+    python benchmarks/suite.py compare base.json new.json [--threshold 0.1]
+
+compare prints the change of every metric and fails (exit status 1) if one is worse by
+more than --threshold (a fraction) in the new results.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.parser import SparqlParser, SparqlSyntaxError
+from awudima.sparql.serializer import serialize
+from awudima.sparql.corpus import QUERIES, large_query, nested_query, query_log, bsbm_queries, watdiv_queries, \
+    fedbench_queries, path_query, filter_query, generated_queries
+
+FORMAT = 1
+
+# metric -> True if higher is better
+METRICS = {
+    'parse_per_second': True,
+    'parse_kb_per_second': True,
+    'parse_p50_ms': False,
+    'parse_p90_ms': False,
+    'parse_p99_ms': False,
+    'peak_memory_kb': False,
+    'serialize_per_second': True,
+}
+
+
+def workloads(scale=1.0, seed=0):
+    """
+    name -> list of query texts, the same for the same scale and seed
+    """
+    def scaled(n):
+        return max(int(n * scale), 1)
+
+    return {
+        'corpus': list(QUERIES),
+        'bsbm': bsbm_queries(scaled(220), seed),
+        'watdiv': watdiv_queries(scaled(220), seed),
+        'fedbench': fedbench_queries(scaled(100), seed),
+        'paths': [path_query(40, seed + i) for i in range(scaled(50))],
+        'filters': [filter_query(100, seed + i) for i in range(scaled(20))],
+        'nested': [nested_query(scaled(200), scaled(100))],
+        'values': [large_query(10, scaled(20000))],
+        'large-bgp': [large_query(scaled(2000))],
+        'log': list(query_log(scaled(2000), seed)),
+        'generated': generated_queries(scaled(200), seed),
+    }
+
+
+def percentile(values, fraction):
+    """
+    The value of sorted values below which lies the fraction of them (nearest rank)
+    """
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def parse(sparql_parser, text):
+    try:
+        return sparql_parser.parse(text)
+    except SparqlSyntaxError:
+        return None
+
+
+def measure(texts, repeat):
+    """
+    The metrics of a workload (a query that does not parse is timed until it fails)
+    """
+    sparql_parser = SparqlParser()
+    # (also a first pass, that the timed ones do not pay for first uses)
+    gc.collect()
+    tracemalloc.start()
+    kept = [parse(sparql_parser, text) for text in texts]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del kept
+
+    best = [None] * len(texts)
+    queries = []
+    total = None
+    for _ in range(repeat):
+        queries = []
+        gc.collect()
+        started = time.perf_counter()
+        for i, text in enumerate(texts):
+            start = time.perf_counter()
+            queries.append(parse(sparql_parser, text))
+            t = time.perf_counter() - start
+            if best[i] is None or t < best[i]:
+                best[i] = t
+        elapsed = time.perf_counter() - started
+        total = elapsed if total is None else min(total, elapsed)
+
+    queries = [query for query in queries if query is not None]
+    serialize_time = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            serialize(query)
+        t = time.perf_counter() - start
+        serialize_time = t if serialize_time is None else min(serialize_time, t)
+
+    latencies = sorted(best)
+    size = sum(len(text.encode('utf-8')) for text in texts)
+    return {'queries': len(texts),
+            'bytes': size,
+            'failed': len(texts) - len(queries),
+            'parse_seconds': total,
+            'parse_per_second': len(texts) / total,
+            'parse_kb_per_second': size / 1024. / total,
+            'parse_p50_ms': percentile(latencies, 0.5) * 1000,
+            'parse_p90_ms': percentile(latencies, 0.9) * 1000,
+            'parse_p99_ms': percentile(latencies, 0.99) * 1000,
+            'peak_memory_kb': peak / 1024.,
+            'serialize_seconds': serialize_time,
+            'serialize_per_second': len(queries) / serialize_time}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    all_workloads = workloads(args.scale, args.seed)
+    names = args.workloads or list(all_workloads)
+    unknown = [name for name in names if name not in all_workloads]
+    if unknown:
+        sys.exit('Unknown workloads: %s (expected: %s)' % (', '.join(unknown), ', '.join(all_workloads)))
+
+    results = {'format': FORMAT,
+               'meta': {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                        'commit': git_commit(),
+                        'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'scale': args.scale,
+                        'seed': args.seed,
+                        'repeat': args.repeat},
+               'workloads': {}}
+    print('%-10s %7s %9s %11s %10s %9s %9s %9s %11s %11s' % ('', 'queries', 'KB', 'queries/s', 'KB/s', 'p50 ms',
+                                                             'p90 ms', 'p99 ms', 'peak KB', 'serialize/s'))
+    for name in names:
+        m = results['workloads'][name] = measure(all_workloads[name], args.repeat)
+        print('%-10s %7d %9.0f %11.0f %10.0f %9.3f %9.3f %9.3f %11.0f %11.0f'
+              % (name, m['queries'], m['bytes'] / 1024., m['parse_per_second'], m['parse_kb_per_second'],
+                 m['parse_p50_ms'], m['parse_p90_ms'], m['parse_p99_ms'], m['peak_memory_kb'],
+                 m['serialize_per_second']))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+    print('results written to %s' % args.output)
+
+
+def compare(args):
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    for results in (base, new):
+        if results.get('format') != FORMAT:
+            sys.exit('Not results of this suite (format %s)' % results.get('format'))
+    if (base['meta']['scale'], base['meta']['seed']) != (new['meta']['scale'], new['meta']['seed']):
+        print('warning: the runs have different workloads (scale, seed)')
+
+    regressions = []
+    print('%-10s %-22s %14s %14s %9s' % ('', '', base['meta']['commit'] or 'base', new['meta']['commit'] or 'new',
+                                          'change'))
+    for name, metrics in base['workloads'].items():
+        if name not in new['workloads']:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = metrics[metric], new['workloads'][name][metric]
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > args.threshold:
+                flag = '  REGRESSION'
+                regressions.append('%s %s' % (name, metric))
+            elif -worse > args.threshold:
+                flag = '  improved'
+            print('%-10s %-22s %14.3f %14.3f %+8.1f%%%s' % (name, metric, before, after, change * 100, flag))
+
+    if regressions:
+        print('FAIL: %d regressions over %.0f%%: %s' % (len(regressions), args.threshold * 100,
+                                                        ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = argparser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='runs the workloads and writes the results')
+    run_parser.add_argument('--output', default='suite-results.json', help='JSON file for the results')
+    run_parser.add_argument('--workloads', nargs='+', help='the workloads to run (default: all)')
+    run_parser.add_argument('--scale', type=float, default=1.0, help='size of the generated workloads')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=5)
+    compare_parser = commands.add_parser('compare', help='compares two results files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='worse by this fraction is a regression')
+    args = argparser.parse_args()
+
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Thread stress benchmark for SparqlParser.
+
+Parses a mix of queries from 1 to N threads sharing one SparqlParser, checks that every
+result matches the single-threaded one and reports parses/second per thread count.
+
+    python benchmarks/threads.py [--threads N] [--parses-per-thread K]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.parser import SparqlParser
+
+QUERIES = [
+    "SELECT DISTINCT * WHERE {?s ?p ?o} ORDER BY ?s LIMIT 10 ",
+    """PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    SELECT ?s ?label WHERE {
+        ?s a <http://xmlns.com/foaf/0.1/Person> ;
+           rdfs:label ?label .
+        OPTIONAL { ?s rdfs:comment ?c }
+        FILTER(LANG(?label) = 'en' && ?s != ?label)
+    } LIMIT 100""",
+    """PREFIX owl: <http://www.w3.org/2002/07/owl#>
+    SELECT ?a ?b WHERE {
+        { ?a owl:sameAs ?b } UNION { ?b owl:sameAs ?a }
+        FILTER ( ?a != ?b )
+    }""",
+    "ASK { ?s ?p 42 }",
+]
+
+
+def run(sparql_parser, nthreads, parses_per_thread, expected):
+    errors = []
+
+    def worker(offset):
+        for i in range(parses_per_thread):
+            k = (i + offset) % len(QUERIES)
+            result = str(sparql_parser.parse(QUERIES[k]))
+            if result != expected[k]:
+                errors.append((k, result))
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(nthreads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return nthreads * parses_per_thread / elapsed, errors
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--threads', type=int, default=8)
+    argparser.add_argument('--parses-per-thread', type=int, default=200)
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser()
+    expected = [str(sparql_parser.parse(q)) for q in QUERIES]
+
+    failed = False
+    for n in range(1, args.threads + 1):
+        rate, errors = run(sparql_parser, n, args.parses_per_thread, expected)
+        print('%2d threads: %8.1f parses/s %s' % (n, rate, '' if not errors else '(%d wrong results)' % len(errors)))
+        failed = failed or len(errors) > 0
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Differential check and throughput of the hand-written tokenizer against the PLY lexer.
+
+Both lexers must produce the same tokens (type, value, lineno, lexpos) and fail at the
+same position on the corpus, on generated queries and on random token soup.
+Reports tokens/second for both on generated queries of 50-200 KB.
+
+    python benchmarks/tokenizer.py [--fuzz N] [--seed S]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql import parser
+from awudima.sparql.tokenizer import SparqlTokenizer
+from awudima.sparql.corpus import QUERIES, large_query, token_soups, tokens
+
+
+def differential(texts):
+    ply_lexer = parser._lexer.clone()
+    scanner = SparqlTokenizer()
+    mismatches = 0
+    for text in texts:
+        expected = tokens(ply_lexer, text)
+        got = tokens(scanner, text)
+        if expected != got:
+            mismatches += 1
+            if mismatches <= 5:
+                print('MISMATCH on %r' % text[:200])
+                for e, g in zip(expected, got):
+                    if e != g:
+                        print('  ply: %r\n  scanner: %r' % (e, g))
+                        break
+                else:
+                    print('  ply: %d tokens, scanner: %d tokens' % (len(expected), len(got)))
+
+    return mismatches
+
+
+def throughput(lexer, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        lexer.input(text)
+        start = time.perf_counter()
+        count = 0
+        for _ in iter(lexer.token, None):
+            count += 1
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return count, count / best
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--fuzz', type=int, default=20000, help='number of random token soups')
+    argparser.add_argument('--seed', type=int, default=0)
+    args = argparser.parse_args()
+
+    texts = list(QUERIES) + [large_query(n, n // 10) for n in (10, 100, 1000)] + token_soups(args.fuzz, args.seed)
+    mismatches = differential(texts)
+    print('differential: %d texts, %d mismatches' % (len(texts), mismatches))
+
+    for n in (1200, 2500, 4500):
+        text = large_query(n)
+        n_tokens, ply_rate = throughput(parser._lexer.clone(), text)
+        _, scanner_rate = throughput(SparqlTokenizer(), text)
+        print('%4d KB, %6d tokens: ply %9.0f tokens/s, scanner %9.0f tokens/s (x%.1f)'
+              % (len(text) // 1024, n_tokens, ply_rate, scanner_rate, scanner_rate / ply_rate))
+
+    if mismatches:
+        sys.exit(1)
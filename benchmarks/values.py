@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+VALUES blocks read by the lexer into a columnar table (scan_values=True) against the
+grammar (scan_values=False).
+
+Checks that both give the same query on generated and random VALUES blocks, then reports
+parse time, peak memory while parsing and memory held by the parsed query for a block of
+--rows rows (100k by default), and the time to build and serialize VALUES batches of
+--batch rows, as a bind join does, against lists of rows of RDFTerm.
+
+    python benchmarks/values.py [--rows N] [--fuzz N] [--tokenizer ply|scanner]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql import RDFTerm, ValuesClause
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.corpus import large_query
+
+CELLS = ['<http://example.org/a>', 'ex:b', ':c', ':', 'ex : d', '"x"', "'y'", '"z"@en', '"w"@en-US', '"1"^^xsd:int',
+         '"2"^^<http://www.w3.org/2001/XMLSchema#int>', '"3" ^^ :t', '12', '-3', '+4.5', '1e3', '.5', 'UNDEF', 'undef',
+         'true', 'false', '$p', '?v', '()', '( )', '_:b', '"""q"""', "'''r'''", '"a\\"b"', 'ex:select', 'ex:', '1.',
+         '#c\n', '@en', '^^', '<', '"', ',']
+
+
+def values_block(rnd):
+    n_vars = rnd.randint(0, 3)
+    variables = ['?v%d' % i for i in range(n_vars)]
+    if n_vars == 1 and rnd.random() < 0.5:
+        head = variables[0]
+        body = ' '.join(rnd.choice(CELLS) for _ in range(rnd.randint(0, 6)))
+    else:
+        head = '(' + ' '.join(variables) + ')'
+        rows = []
+        for _ in range(rnd.randint(0, 4)):
+            arity = n_vars if rnd.random() < 0.8 else rnd.randint(0, 4)
+            rows.append('(' + ' '.join(rnd.choice(CELLS) for _ in range(arity)) + ')')
+        body = ' '.join(rows)
+    return 'PREFIX ex: <http://example.org/> SELECT * WHERE { ?s ?p ?o VALUES %s { %s } }' % (head, body)
+
+
+def parse(sparql_parser, text):
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            query = sparql_parser.parse(text)
+            rows = [[list(map(str, row)) if isinstance(row, list) else str(row) for row in g.values]
+                    for g in query.ggp.ggps if isinstance(g, ValuesClause)]
+            return str(query), rows
+        except Exception as e:
+            return 'ERROR %s: %s' % (type(e).__name__, e)
+
+
+def differential(fast, slow, texts):
+    mismatches = 0
+    for text in texts:
+        expected = parse(slow, text)
+        got = parse(fast, text)
+        if expected != got:
+            mismatches += 1
+            if mismatches <= 5:
+                print('MISMATCH on %r\n  grammar: %r\n  scanner: %r' % (text, expected, got))
+
+    return mismatches
+
+
+def measure(sparql_parser, text):
+    gc.collect()
+    start = time.perf_counter()
+    sparql_parser.parse(text)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    query = sparql_parser.parse(text)
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del query
+
+    return elapsed, held, peak
+
+
+def rows_str(variables, rows):
+    # what ValuesClause.to_str did on lists of rows
+    return "VALUES (" + ' '.join([str(v) for v in variables]) + ") " + \
+           "{(" + ") (".join([" ".join([str(v) for v in d]) for d in rows]) + ")}"
+
+
+def batches(rows, size):
+    variables = [RDFTerm('?s', is_const=False), RDFTerm('?o', is_const=False)]
+    bindings = [[RDFTerm('<http://example.org/s%d>' % (i % 1000), is_const=True, is_iri=True),
+                 RDFTerm('"%d"' % i, is_const=True) if i % 7 else 'UNDEF'] for i in range(rows)]
+
+    start = time.perf_counter()
+    lists = [rows_str(variables, bindings[i:i + size]) for i in range(0, rows, size)]
+    as_lists = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clause = ValuesClause(variables, [])
+    for row in bindings:
+        clause.append(row)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tables = [str(batch) for batch in clause.batches(size)]
+    as_tables = time.perf_counter() - start
+
+    return as_lists, build, as_tables, lists == tables
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--rows', type=int, default=100000)
+    argparser.add_argument('--fuzz', type=int, default=5000, help='number of random VALUES blocks')
+    argparser.add_argument('--seed', type=int, default=0)
+    argparser.add_argument('--batch', type=int, default=100, help='rows per VALUES batch')
+    argparser.add_argument('--tokenizer', default='ply', choices=SparqlParser.tokenizers)
+    args = argparser.parse_args()
+
+    fast = SparqlParser(tokenizer=args.tokenizer, scan_values=True)
+    slow = SparqlParser(tokenizer=args.tokenizer, scan_values=False)
+
+    rnd = random.Random(args.seed)
+    texts = [large_query(5, n) for n in (0, 1, 10, 100)] + [values_block(rnd) for _ in range(args.fuzz)]
+    mismatches = differential(fast, slow, texts)
+    print('differential: %d queries, %d mismatches' % (len(texts), mismatches))
+
+    text = large_query(1, args.rows)
+    print('%d rows, %d KB' % (args.rows, len(text) // 1024))
+    results = {}
+    for label, sparql_parser in (('grammar', slow), ('scanner', fast)):
+        results[label] = elapsed, held, peak = measure(sparql_parser, text)
+        print('  %-8s %7.3f s  %8.1f MB peak  %8.1f MB held by the query'
+              % (label, elapsed, peak / 2 ** 20, held / 2 ** 20))
+    print('  speedup x%.1f, peak memory x%.1f less'
+          % (results['grammar'][0] / results['scanner'][0], results['grammar'][2] / float(results['scanner'][2])))
+
+    as_lists, build, as_tables, same = batches(args.rows, args.batch)
+    print('%d rows in batches of %d%s:' % (args.rows, args.batch, '' if same else ', DIFFERENT TEXT'))
+    print('  lists of rows: serialize %.3f s' % as_lists)
+    print('  ValuesClause:  append %.3f s, serialize %.3f s (x%.1f)' % (build, as_tables, as_lists / as_tables))
+    mismatches += not same
+
+    if mismatches:
+        sys.exit(1)
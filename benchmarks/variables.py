@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Variable collection on deeply nested graph patterns, as a planner does it: asking for the
+variables of every subtree of a query with --depth nested OPTIONAL/UNION groups.
+
+get_variables() builds new lists over the whole subtree at every call (quadratic in the
+depth); bound_variables() walks a mutable subtree once per call and a frozen one once in
+all (awudima.sparql.variables). Checks that they find the same variables.
+
+    python benchmarks/variables.py [--depth 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql.frozen import freeze
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.variables import bound_variables
+from awudima.sparql.corpus import nested_query
+
+
+def subtrees(node):
+    found = [node]
+    stack = [node]
+    while stack:
+        for child in getattr(stack.pop(), 'ggps', ()):
+            if hasattr(child, 'ggps'):
+                found.append(child)
+                stack.append(child)
+
+    return found
+
+
+def timed(function, nodes):
+    start = time.perf_counter()
+    result = [function(node) for node in nodes]
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--depth', type=int, default=200)
+    args = argparser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * args.depth))
+    ggp = SparqlParser().parse(nested_query(args.depth)).ggp
+    nodes = subtrees(ggp)
+    frozen_nodes = subtrees(freeze(ggp))
+
+    lists, lists_time = timed(lambda node: node.get_variables(), nodes)
+    sets, sets_time = timed(bound_variables, nodes)
+    frozen_sets, frozen_time = timed(bound_variables, frozen_nodes)
+    print('%d subtrees, depth %d' % (len(nodes), args.depth))
+    print('  get_variables()             %8.4f s' % lists_time)
+    print('  bound_variables(), mutable  %8.4f s' % sets_time)
+    print('  bound_variables(), frozen   %8.4f s' % frozen_time)
+
+    same = [set(names) for names in lists] == [possible for _, possible in sets] == \
+        [possible for _, possible in frozen_sets]
+    if not same:
+        print('FAIL: get_variables() and bound_variables() differ')
+        sys.exit(1)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Traversal of deeply nested queries: the recursive methods of the nodes against the
+explicit-stack walk of awudima.sparql.visitor.
+
+For every --depth, parses a query of that many nested OPTIONAL/UNION groups with a filter on
+a sum of --chain terms, then collects its variables with get_variables() (recursive, at the
+default recursion limit), with walk(), and with a NodeVisitor, and renames a variable with a
+NodeTransformer. Checks that the walk finds the variables get_variables() finds.
+
+    python benchmarks/visitor.py [--depth 100 1000 10000] [--chain 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awudima.sparql import RDFTerm
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.visitor import NodeVisitor, NodeTransformer, walk
+from awudima.sparql.corpus import nested_query
+
+
+class VariableNames(NodeVisitor):
+    def __init__(self):
+        self.names = set()
+
+    def enter_RDFTerm(self, term):
+        if not term.is_constant:
+            self.names.add(term.value)
+
+
+class Rename(NodeTransformer):
+    def __init__(self, old, new):
+        self.old = old
+        self.new = RDFTerm(new, is_const=False)
+
+    def transform_RDFTerm(self, term):
+        return self.new if term.value == self.old else term
+
+
+def walked_names(node):
+    return set(n.value for n in walk(node) if isinstance(n, RDFTerm) and not n.is_constant)
+
+
+def visited_names(node):
+    visitor = VariableNames()
+    visitor.visit(node)
+    return visitor.names
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    try:
+        result = function(*args)
+    except RecursionError:
+        result = RecursionError
+    return result, time.perf_counter() - start
+
+
+def seconds(result, elapsed):
+    return ' RecursionError' if result is RecursionError else '%13.4f s' % elapsed
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--depth', type=int, nargs='+', default=[100, 1000, 10000])
+    argparser.add_argument('--chain', type=int, default=10000, help='terms of the sum in the filter')
+    args = argparser.parse_args()
+
+    sparql_parser = SparqlParser()
+    failed = False
+    print('%-22s %15s %15s %15s %15s' % ('', 'get_variables()', 'walk()', 'NodeVisitor', 'NodeTransformer'))
+    for depth in args.depth:
+        ggp = sparql_parser.parse(nested_query(depth, args.chain)).ggp
+        recursive, recursive_time = timed(lambda: set(v for v in ggp.get_variables() if isinstance(v, str)))
+        walked, walk_time = timed(walked_names, ggp)
+        visited, visit_time = timed(visited_names, ggp)
+        renamed, rename_time = timed(Rename('?o0', '?renamed').transform, ggp)
+        print('depth %-6d chain %-6d %s %s %s %s' % (depth, args.chain, seconds(recursive, recursive_time),
+                                                    seconds(walked, walk_time), seconds(visited, visit_time),
+                                                    seconds(renamed, rename_time)))
+
+        if walked != visited or '?o0' in visited_names(renamed) or '?renamed' not in visited_names(renamed):
+            failed = True
+        if recursive is not RecursionError and not recursive <= walked:
+            failed = True
+    if failed:
+        print('FAIL: the walks found different variables')
+        sys.exit(1)
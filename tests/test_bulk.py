@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from awudima.sparql.bulk import parse_all
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.serializer import serialize
+from awudima.sparql.corpus import QUERIES, nested_query
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+@pytest.mark.parametrize('ordered', [True, False])
+def test_results_of_every_query(processes, ordered):
+    # a query too deeply nested to pickle, and one that does not parse, among others
+    texts = QUERIES + [nested_query(3000), 'SELECT WHERE'] + QUERIES
+    results = sorted(parse_all(texts, processes=processes, ordered=ordered), key=lambda result: result.index)
+
+    assert [result.index for result in results] == list(range(len(texts)))
+    assert [result.error is not None for result in results] == [i == len(QUERIES) + 1 for i in range(len(texts))]
+    sparql_parser = SparqlParser()
+    for result in results:
+        if result.error is None:
+            assert serialize(result.query) == serialize(sparql_parser.parse(result.text))
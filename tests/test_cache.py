@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from awudima.sparql.cache import ParseCache, DiskParseCache, normalize_query
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.serializer import serialize
+from awudima.sparql.corpus import QUERIES, large_query
+
+
+def test_normalize_query_collapses_layout_only():
+    assert normalize_query('  SELECT *\tWHERE  {\n\n ?s ?p "a  b" }  ') == 'SELECT * WHERE {\n?s ?p "a  b" }'
+
+
+def test_quote_in_iri_does_not_start_a_literal():
+    text = "SELECT * WHERE { ?s <http://ex.org/it's> ?o . ?s <http://ex.org/p> '%s' }"
+    assert normalize_query(text % 'a  b') != normalize_query(text % 'a b')
+
+    sparql_parser = SparqlParser(cache=ParseCache())
+    sparql_parser.parse(text % 'a b')
+    query = sparql_parser.parse(text % 'a  b')
+    assert str(query.ggp.ggps[0].triples[1].object) == "'a  b'"
+
+
+def test_quote_in_comment_does_not_start_a_literal():
+    text = "SELECT * WHERE { # it's\n ?s <http://ex.org/p> '%s' }"
+    assert normalize_query(text % 'a  b') != normalize_query(text % 'a b')
+
+
+def test_less_than_is_not_an_iri():
+    assert normalize_query('SELECT * WHERE { ?s ?p ?o FILTER(?o <   3) }') \
+        == normalize_query('SELECT * WHERE { ?s ?p ?o FILTER(?o < 3) }')
+
+
+def test_disk_cache_outlives_the_process(tmp_path):
+    path = str(tmp_path / 'queries.cache')
+    with DiskParseCache(path) as cache:
+        SparqlParser(cache=cache).parse(QUERIES[0])
+
+    with DiskParseCache(path) as cache:
+        assert normalize_query(QUERIES[0]) in cache
+        query = cache.get(normalize_query(QUERIES[0]))
+    assert serialize(query) == serialize(SparqlParser().parse(QUERIES[0]))
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    with DiskParseCache(str(tmp_path / 'queries.cache'), max_entries=4) as cache:
+        texts = [large_query(n) for n in range(1, 6)]
+        for text in texts[:4]:
+            cache.put(text, SparqlParser().parse(text))
+        cache.get(texts[0])
+        cache.put(texts[4], SparqlParser().parse(texts[4]))
+
+        # down to half of max_entries, the most recently used ones, then the new one
+        assert [text in cache for text in texts] == [True, False, False, True, True]
+        assert len(cache) == 3 and cache.evictions == 2
+
+
+def test_disk_cache_close_releases_its_files(tmp_path):
+    cache = DiskParseCache(str(tmp_path / 'queries.cache'))
+    files = [cache._file] + ([cache._lock_file] if cache._lock_file is not None else [])
+    cache.close()
+
+    assert all(f.closed for f in files)
+    with pytest.raises(ValueError):
+        cache.get('SELECT * WHERE { ?s ?p ?o }')
+
+
+def test_disk_cache_lookups_while_other_threads_evict(tmp_path):
+    texts = [large_query(n) for n in range(1, 41)]
+    queries = dict((text, SparqlParser().parse(text)) for text in texts)
+    errors = []
+
+    def work(cache, offset):
+        try:
+            for i in range(200):
+                text = texts[(offset + i) % len(texts)]
+                query = cache.get(text)
+                if query is None:
+                    cache.put(text, queries[text])
+                elif serialize(query) != serialize(queries[text]):
+                    errors.append(text)
+        except Exception as e:
+            errors.append(e)
+
+    with DiskParseCache(str(tmp_path / 'queries.cache'), max_entries=8) as cache:
+        threads = [threading.Thread(target=work, args=(cache, 7 * i)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert cache.evictions > 0
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from awudima.sparql.parser import SparqlParser, SparqlSyntaxError
+
+
+@pytest.mark.parametrize('tokenizer', SparqlParser.tokenizers)
+def test_unknown_character_is_the_offending_text(tokenizer):
+    # a no-break space is not SPARQL whitespace: the error is on it, and the pattern after it is kept
+    text = 'SELECT * WHERE {\xa0?subject ?p ?o }'
+    query, errors = SparqlParser(tokenizer=tokenizer).parse_with_errors(text)
+
+    assert [(e.category, e.offset, e.token) for e in errors] == [(SparqlSyntaxError.LEXICAL, 16, '\xa0')]
+    assert str(query.ggp.ggps[0].triples[0].subject) == '?subject'
+
+
+@pytest.mark.parametrize('tokenizer', SparqlParser.tokenizers)
+def test_unknown_word_is_left_out(tokenizer):
+    text = 'SELECT * WHERE {\r\n?s ?p ?o ~foo }'
+    query, errors = SparqlParser(tokenizer=tokenizer).parse_with_errors(text)
+
+    assert [(e.offset, e.token) for e in errors] == [(16, '\r'), (27, '~foo')]
+    assert len(query.ggp.ggps[0].triples) == 1
+
+
+def test_first_error_is_raised():
+    with pytest.raises(SparqlSyntaxError) as info:
+        SparqlParser().parse('SELECT * WHERE {\xa0?subject ?p ?o }')
+    assert (info.value.line, info.value.column, info.value.token) == (1, 17, '\xa0')
+
+
+@pytest.mark.parametrize('tokenizer', SparqlParser.tokenizers)
+@pytest.mark.parametrize('block', ['FILTER(?o >)', 'FILTER(?o > (1 +))', 'FILTER regex(str(?o), (1 +))',
+                                   'BIND((1 +) AS ?x) .'])
+def test_block_with_an_error_is_left_out(tokenizer, block):
+    query, errors = SparqlParser(tokenizer=tokenizer).parse_with_errors('SELECT * WHERE { ?s ?p ?o %s ?a ?b ?c }' % block)
+
+    assert [e.token for e in errors] == [')']
+    assert ' '.join(str(query).split()) == 'SELECT * WHERE { ?s ?p ?o ?a ?b ?c }'
+    assert set(query.ggp.get_variables()) == {'?s', '?p', '?o', '?a', '?b', '?c'}
+
+
+@pytest.mark.parametrize('text', ['SELECT ?x , ?y WHERE { ?x ?p ?y }', 'SELECT * WHERE { ?s ?p ?o } ORDER BY (?o +)',
+                                  'SELECT * WHERE { ?s ?p ?o } LIMIT ?x', 'SELECT * WHERE { ?s ?p ?o } SELECT'])
+def test_error_outside_the_groups_stops_the_parse(text):
+    query, errors = SparqlParser().parse_with_errors(text)
+
+    assert query is None
+    assert len(errors) == 1
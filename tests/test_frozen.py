@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+import pytest
+
+from awudima.sparql import parser
+from awudima.sparql.frozen import FrozenList, freeze, thaw
+from awudima.sparql.variables import bound_variables
+from awudima.sparql.corpus import QUERIES, nested_query
+
+TEXT = 'PREFIX ex: <http://example.org/> SELECT * WHERE { ?s ex:p ?o . ?s ex:q "x"@en . ?s ex:p ?o ' \
+       'OPTIONAL { ?o ex:r ?z FILTER(?z > 3 && regex(str(?z), "^a")) } } VALUES ?s { ex:a UNDEF }'
+
+
+def test_equal_subtrees_are_the_same_object():
+    memo = {}
+    triples = parser.sparql(TEXT).ggp.ggps[0].triples
+    frozen = [freeze(triple, memo) for triple in triples]
+
+    assert frozen[0] is frozen[2]
+    assert frozen[0] != frozen[1]
+    assert len(set(frozen)) == len(set(str(triple) for triple in triples)) == 2
+
+
+def test_equal_subtrees_are_equal_across_memos():
+    first, second = parser.sparql(TEXT), parser.sparql(TEXT)
+
+    assert freeze(first.ggp) == freeze(second.ggp)
+    assert hash(freeze(first.ggp)) == hash(freeze(second.ggp))
+
+
+@pytest.mark.parametrize('text', QUERIES)
+def test_freeze_and_thaw_keep_the_text(text):
+    query = parser.sparql(text)
+    frozen = freeze(query.ggp)
+
+    assert str(frozen) == str(query.ggp) == str(thaw(frozen))
+    assert pickle.loads(pickle.dumps(frozen)) == frozen
+
+
+def test_frozen_nodes_cannot_be_changed():
+    frozen = freeze(parser.sparql(TEXT).ggp)
+
+    with pytest.raises(AttributeError):
+        frozen.ggps = []
+    with pytest.raises(TypeError):
+        frozen.ggps.append(None)
+    assert isinstance(frozen.ggps, FrozenList)
+
+
+def test_queries_and_sub_selects_are_not_frozen():
+    query = parser.sparql('SELECT * WHERE { ?s ?p ?o FILTER EXISTS { { SELECT ?s WHERE { ?s ?q ?z } } } }')
+
+    with pytest.raises(TypeError, match='SelectQuery: queries cannot be frozen'):
+        freeze(query)
+    with pytest.raises(TypeError, match='GGP: it has a sub-select'):
+        freeze(query.ggp)
+    assert str(freeze(query.ggp.ggps[0].triples[0])) == '?s ?p ?o'
+
+
+def test_a_kept_memo_sees_changes():
+    memo = {}
+    triple = parser.sparql(TEXT).ggp.ggps[0].triples[0]
+    before = freeze(triple, memo)
+    triple.object.value = '?changed'
+
+    after = freeze(triple, memo)
+    assert str(before) == '?s ex:p ?o'
+    assert str(after) == '?s ex:p ?changed'
+
+
+def test_deep_nesting():
+    ggp = parser.sparql(nested_query(300)).ggp
+    frozen = freeze(ggp)
+
+    assert bound_variables(frozen) == bound_variables(ggp) == bound_variables(thaw(frozen))
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from awudima.sparql import parser
+from awudima.sparql.generator import QueryGenerator, round_trip
+
+SHAPES = [dict(patterns=20, width=10, filters=6),
+          dict(patterns=2, depth=30, nesting='optional'),
+          dict(patterns=2, depth=30, nesting='union', group_patterns=3),
+          dict(patterns=2, depth=30),
+          dict(patterns=5, values=200, values_width=3),
+          dict(patterns=2, paths=3, path_length=20),
+          dict(patterns=50, width=50, distinct=True, limit=10)]
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_round_trip(shape):
+    query = QueryGenerator(1).query(**shape)
+    parsed, same = round_trip(query)
+
+    assert same
+    assert str(parser.sparql(str(query))) == str(query) == str(parsed)
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_same_seed_same_text(shape):
+    assert QueryGenerator(7).text(**shape) == QueryGenerator(7).text(**shape)
+    assert QueryGenerator(7).text(**shape) != QueryGenerator(8).text(**shape)
+
+
+def test_unknown_nesting():
+    with pytest.raises(ValueError):
+        QueryGenerator().query(nesting='minus')
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+import pytest
+
+from awudima.sparql import RDFTerm, parser
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.visitor import NodeTransformer
+
+TEXT = 'SELECT ?x WHERE { ?x <http://ex.org/p> ?y . ?x <http://ex.org/q> ?z } VALUES (?x ?y) { (<http://ex.org/a> 1) }'
+
+
+def test_terms_are_not_shared_by_default():
+    query = parser.sparql(TEXT)
+    query.ggp.ggps[0].triples[0].subject.value = '?renamed'
+
+    assert str(query.projections[0]) == '?x'
+    assert str(query.ggp.ggps[0].triples[1].subject) == '?x'
+    assert str(query.values_clause.variables[0]) == '?x'
+
+
+@pytest.mark.parametrize('tokenizer', SparqlParser.tokenizers)
+def test_interned_terms_are_shared_by_values_variables(tokenizer):
+    query = SparqlParser(tokenizer=tokenizer, intern_terms=True).parse(TEXT)
+    triple = query.ggp.ggps[0].triples[0]
+
+    assert query.projections[0] is triple.subject is query.values_clause.variables[0]
+    assert query.values_clause.variables[1] is triple.object
+
+
+def test_interned_terms_cannot_be_changed_in_place():
+    class Rename(NodeTransformer):
+        def transform_RDFTerm(self, term):
+            return RDFTerm('?renamed', False) if term is triple.subject else term
+
+    query = SparqlParser(intern_terms=True).parse(TEXT)
+    triple = query.ggp.ggps[0].triples[0]
+    with pytest.raises(AttributeError, match='shared'):
+        triple.subject.value = '?renamed'
+
+    Rename().transform(triple)
+    assert str(triple.subject) == '?renamed' and str(query.ggp.ggps[0].triples[1].subject) == '?x'
+    assert str(pickle.loads(pickle.dumps(query))) == str(query)
+
+
+@pytest.mark.parametrize('tokenizer', SparqlParser.tokenizers)
+def test_language_tags_are_written_back(tokenizer):
+    text = 'SELECT * WHERE { ?s ?p "x"@en . ?s ?q "y"^^<http://ex.org/t> FILTER(?o != "z"@fr-BE) } VALUES ?o { "v"@de }'
+    query = SparqlParser(tokenizer=tokenizer).parse(text)
+    triples = query.ggp.ggps[0].triples
+
+    assert str(triples[0].object) == '"x"@en'
+    assert str(triples[1].object) == '"y"^^<http://ex.org/t>'
+    assert '"z"@fr-BE' in str(query.ggp) and '"v"@de' in str(query.values_clause)
+    assert str(SparqlParser(tokenizer=tokenizer).parse(str(query))) == str(query)
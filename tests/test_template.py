@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from awudima.sparql import RDFTerm
+from awudima.sparql import parser
+from awudima.sparql.template import QueryTemplate, to_term
+
+TEMPLATE = 'PREFIX foaf: <http://xmlns.com/foaf/0.1/> SELECT ?name WHERE { $person foaf:name ?name . ' \
+           '?person foaf:age ?age FILTER(?age > $age) } VALUES ?name { $name "Bob" }'
+VALUES = dict(person='<http://example.org/alice>', age=30, name='"Alice"@en')
+
+
+def test_bind_as_parsing_the_text():
+    template = QueryTemplate(TEMPLATE)
+    text = TEMPLATE.replace('$person', '<http://example.org/alice>').replace('$age', '30') \
+        .replace('$name', '"Alice"@en')
+
+    assert template.params == ['age', 'name', 'person']
+    assert str(template.bind(VALUES)) == template.bind_str(**VALUES) == str(parser.sparql(text))
+
+
+def test_bound_queries_are_copies():
+    template = QueryTemplate(TEMPLATE)
+    first = template.bind(VALUES)
+    second = template.bind(VALUES, age=40)
+
+    assert first.ggp.ggps[0].triples[0].subject is not second.ggp.ggps[0].triples[0].subject
+    assert '?age > 30' in str(first) and '?age > 40' in str(second)
+
+
+def test_missing_and_unknown_placeholders():
+    template = QueryTemplate(TEMPLATE)
+    with pytest.raises(KeyError, match=r'\$name'):
+        template.bind(person='<http://example.org/alice>', age=30)
+    with pytest.raises(KeyError, match=r'\$city'):
+        template.bind(VALUES, city='"Paris"')
+
+
+@pytest.mark.parametrize('value', ['', '   '])
+def test_blank_value(value):
+    template = QueryTemplate(TEMPLATE)
+    for bind in (template.bind, template.bind_str):
+        with pytest.raises(ValueError, match=r"\$person: '%s'" % value):
+            bind(VALUES, person=value)
+
+
+@pytest.mark.parametrize('value, expected', [(True, 'true'), (1.5, '1.5'), ('<http://x/a>', '<http://x/a>'),
+                                             ('rdf:type', 'rdf:type'), ('_:b0', '_:b0'), ('"1"^^xsd:int', '"1"^^xsd:int'),
+                                             (RDFTerm('42', is_const=True), '42')])
+def test_to_term(value, expected):
+    assert str(to_term(value)) == expected
+
+
+@pytest.mark.parametrize('value', ['"a") } } ; SELECT * WHERE { ?s ?p ?o FILTER("x"', '<http://a> . ?x ?y ?z',
+                                   '<http://a', '?x', '$y', '"x" "y"', float('nan'), RDFTerm('?x', is_const=False)])
+def test_values_that_are_not_one_term(value):
+    template = QueryTemplate(TEMPLATE)
+    with pytest.raises(ValueError, match=r'\$person'):
+        template.bind_str(VALUES, person=value)
+
+
+@pytest.mark.parametrize('value, expected', [('Alice', '"Alice"'), ('say "hi"\n', '"say \\"hi\\"\\n"'),
+                                             ('1 2', '"1 2"'), ('UNDEF', '"UNDEF"')])
+def test_plain_strings_are_literals(value, expected):
+    term = to_term(value)
+
+    assert str(term) == expected
+    assert str(parser.sparql('SELECT * WHERE { ?s ?p %s }' % term).ggp.ggps[0].triples[0].object) == expected
+
+
+def test_terms_are_read_as_the_parser_reads_them():
+    assert to_term('"chat"@fr').lang_tag == 'fr'
+    assert to_term('"1"^^xsd:int').xsd_datatype == 'xsd:int'
+    assert to_term('ex:a').prefix == 'ex'
+    assert to_term('_:b0').is_bnode
+
+
+@pytest.mark.parametrize('text', ['SELECT $x WHERE { $x ?p ?o }', 'SELECT (str(?y) AS $z) WHERE { ?y ?p ?o }',
+                                  'SELECT * WHERE { ?s ?p ?o BIND(1 AS $b) }', 'SELECT * WHERE { ?s ?p ?o } VALUES $v { 1 }',
+                                  'SELECT * WHERE { ?s ?p ?o } ORDER BY $x'])
+def test_placeholders_where_only_a_variable_can_be(text):
+    with pytest.raises(ValueError, match='only a variable'):
+        QueryTemplate(text)
+
+
+@pytest.mark.parametrize('tokenizer', parser.SparqlParser.tokenizers)
+def test_placeholder_values_only_in_templates(tokenizer):
+    text = 'SELECT * WHERE { ?s ?p ?o } VALUES ?s { $x }'
+    with pytest.raises(parser.SparqlSyntaxError):
+        parser.SparqlParser(tokenizer=tokenizer).parse(text)
+
+    template = QueryTemplate(text, parser.SparqlParser(tokenizer=tokenizer))
+    assert '(<http://a>)' in template.bind_str(x='<http://a>')
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from awudima.sparql import parser
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.tokenizer import SparqlTokenizer
+from awudima.sparql.corpus import QUERIES, large_query, generated_queries, token_soups, tokens
+
+
+@pytest.mark.parametrize('text', QUERIES + [large_query(n, n // 10) for n in (10, 100)] + generated_queries(50))
+def test_same_tokens_as_ply(text):
+    assert tokens(SparqlTokenizer(), text) == tokens(parser._lexer.clone(), text)
+
+
+def test_same_tokens_and_errors_as_ply_on_token_soup():
+    ply_lexer = parser._lexer.clone()
+    scanner = SparqlTokenizer()
+    different = [text for text in token_soups(3000) if tokens(scanner, text) != tokens(ply_lexer, text)]
+
+    assert different == []
+
+
+@pytest.mark.parametrize('text', QUERIES)
+def test_same_query_with_either_tokenizer(text):
+    expected = SparqlParser(tokenizer='ply').parse(text)
+    got = SparqlParser(tokenizer='scanner').parse(text)
+
+    assert str(got) == str(expected)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+import random
+
+import pytest
+
+from awudima.sparql import RDFTerm, ValuesClause
+from awudima.sparql.parser import SparqlParser
+from awudima.sparql.visitor import NodeTransformer, walk
+from awudima.sparql.corpus import large_query
+
+# cells of every kind of term, and some that are not terms
+CELLS = ['<http://example.org/a>', 'ex:b', ':c', ':', 'ex : d', '"x"', "'y'", '"z"@en', '"w"@en-US', '"1"^^xsd:int',
+         '"2"^^<http://www.w3.org/2001/XMLSchema#int>', '"3" ^^ :t', '12', '-3', '+4.5', '1e3', '.5', 'UNDEF', 'undef',
+         'true', 'false', '$p', '?v', '()', '( )', '_:b', '"""q"""', "'''r'''", '"a\\"b"', 'ex:select', 'ex:', '1.',
+         '#c\n', '@en', '^^', '<', '"', ',']
+
+
+def values_block(rnd):
+    n_vars = rnd.randint(0, 3)
+    variables = ['?v%d' % i for i in range(n_vars)]
+    if n_vars == 1 and rnd.random() < 0.5:
+        head = variables[0]
+        body = ' '.join(rnd.choice(CELLS) for _ in range(rnd.randint(0, 6)))
+    else:
+        head = '(' + ' '.join(variables) + ')'
+        rows = []
+        for _ in range(rnd.randint(0, 4)):
+            arity = n_vars if rnd.random() < 0.8 else rnd.randint(0, 4)
+            rows.append('(' + ' '.join(rnd.choice(CELLS) for _ in range(arity)) + ')')
+        body = ' '.join(rows)
+    return 'PREFIX ex: <http://example.org/> SELECT * WHERE { ?s ?p ?o VALUES %s { %s } }' % (head, body)
+
+
+def parse(sparql_parser, text):
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            query = sparql_parser.parse(text)
+        except Exception as e:
+            return 'ERROR %s' % type(e).__name__
+    rows = [[list(map(str, row)) for row in g.values] for g in query.ggp.ggps if isinstance(g, ValuesClause)]
+    return str(query), rows
+
+
+@pytest.mark.parametrize('tokenizer', SparqlParser.tokenizers)
+def test_scanned_values_as_parsed_by_the_grammar(tokenizer):
+    fast = SparqlParser(tokenizer=tokenizer, scan_values=True)
+    slow = SparqlParser(tokenizer=tokenizer, scan_values=False)
+    rnd = random.Random(0)
+    texts = [large_query(5, n) for n in (0, 1, 10, 100)] + [values_block(rnd) for _ in range(1000)]
+
+    assert [parse(fast, text) for text in texts] == [parse(slow, text) for text in texts]
+
+
+def test_batches():
+    variables = [RDFTerm('?s', is_const=False), RDFTerm('?o', is_const=False)]
+    rows = [[RDFTerm('<http://example.org/s%d>' % i, is_const=True, is_iri=True),
+             RDFTerm('"%d"' % i, is_const=True) if i % 3 else 'UNDEF'] for i in range(10)]
+    clause = ValuesClause(variables, [])
+    for row in rows:
+        clause.append(row)
+
+    batches = [str(batch) for batch in clause.batches(4)]
+    assert len(batches) == 3
+    assert batches[0] == 'VALUES (?s ?o) {(<http://example.org/s0> UNDEF) (<http://example.org/s1> "1") ' \
+                         '(<http://example.org/s2> "2") (<http://example.org/s3> UNDEF)}'
+    assert batches[2] == 'VALUES (?s ?o) {(<http://example.org/s8> "8") (<http://example.org/s9> UNDEF)}'
+
+
+def test_rows_are_read_only():
+    clause = SparqlParser().parse('SELECT * WHERE { ?s ?p ?o } VALUES (?s ?o) { (<http://a> 1) }').values_clause
+    row = clause.values[0]
+
+    with pytest.raises(TypeError, match='read-only'):
+        row[1] = RDFTerm('2', is_const=True)
+    with pytest.raises(TypeError, match='read-only'):
+        next(iter(clause.values)).append(None)
+    assert row == [RDFTerm('<http://a>', is_const=True, is_iri=True), RDFTerm('1', is_const=True)]
+    assert str(clause) == 'VALUES (?s ?o) {(<http://a> 1)}'
+
+
+def test_variables_are_kept_in_the_table():
+    clause = SparqlParser().parse('SELECT * WHERE { ?s ?p ?o } VALUES (?s ?o) { (<http://a> 1) }').values_clause
+    variables = [RDFTerm('?x', is_const=False), RDFTerm('?y', is_const=False)]
+
+    clause.variables = variables
+    assert clause.table.variables is variables
+    assert str(clause) == 'VALUES (?x ?y) {(<http://a> 1)}'
+    with pytest.raises(ValueError):
+        clause.variables = variables[:1]
+
+    clause.values = clause.values[:0]
+    assert clause.variables is variables
+
+
+def test_cells_are_walked_and_transformed():
+    class Rewrite(NodeTransformer):
+        def transform_RDFTerm(self, term):
+            if term.value == 'http://a':
+                return RDFTerm('<http://b>', is_const=True, is_iri=True)
+            return None if term.value == '1' else term
+
+    query = SparqlParser().parse('SELECT * WHERE { ?s ?p ?o } VALUES (?s ?o) { (<http://a> 1) (<http://c> UNDEF) }')
+    assert [str(node) for node in walk(query.values_clause)] == \
+        ['VALUES (?s ?o) {(<http://a> 1) (<http://c> UNDEF)}', '?s', '?o', '<http://a>', '1', '<http://c>']
+
+    Rewrite().transform(query)
+    assert str(query.values_clause) == 'VALUES (?s ?o) {(<http://b> UNDEF) (<http://c> UNDEF)}'
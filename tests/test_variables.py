@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from awudima.sparql import RDFTerm, TriplePattern
+from awudima.sparql import parser
+from awudima.sparql.frozen import freeze
+from awudima.sparql.visitor import NodeTransformer
+from awudima.sparql.variables import bound_variables, certain_variables, possible_variables
+from awudima.sparql.corpus import nested_query
+
+TEXT = 'SELECT * WHERE { ?x <http://ex.org/p> ?y OPTIONAL { ?y <http://ex.org/q> ?z } } VALUES ?w { 1 UNDEF }'
+
+
+def test_sets():
+    query = parser.sparql(TEXT)
+
+    assert certain_variables(query) == {'?x', '?y'}
+    assert possible_variables(query) == {'?x', '?y', '?z', '?w'}
+    assert bound_variables(query.ggp) == bound_variables(freeze(query.ggp))
+
+
+def test_changes_in_place_are_seen():
+    query = parser.sparql('SELECT * WHERE { ?s ?p ?o VALUES ?x { <http://a> } }')
+    values = query.ggp.ggps[-1]
+    assert certain_variables(query.ggp) == {'?s', '?p', '?o', '?x'}
+
+    values.append(['UNDEF'])
+    query.ggp.ggps[0].triples.append(TriplePattern(RDFTerm('?v', False), RDFTerm('<http://ex.org/r>', True, True),
+                                                   RDFTerm('?u', False)))
+    assert certain_variables(query.ggp) == {'?s', '?p', '?o', '?v', '?u'}
+    assert possible_variables(values) == {'?x'}
+
+
+def test_transformer_changes_are_seen():
+    class Rename(NodeTransformer):
+        def transform_RDFTerm(self, term):
+            return RDFTerm('?renamed', False) if term.value == '?z' else term
+
+    query = parser.sparql(TEXT)
+    assert '?z' in possible_variables(query.ggp)
+
+    Rename().transform(query)
+    assert possible_variables(query.ggp) == {'?x', '?y', '?renamed'}
+
+
+def test_sets_are_kept_on_frozen_nodes():
+    frozen = freeze(parser.sparql(TEXT).ggp)
+    sets = bound_variables(frozen)
+
+    assert bound_variables(frozen) is sets
+    assert frozen.ggps[1]._variables == (set(), {'?y', '?z'})
+
+
+def test_deep_nesting():
+    ggp = parser.SparqlParser().parse(nested_query(300)).ggp
+
+    assert possible_variables(ggp) == set('?%s%d' % (name, i) for name in 'so' for i in range(301))
+    assert certain_variables(ggp) == set()